@@ -0,0 +1,85 @@
+{% macro categorical_domains() %}
+    {#- Raw columns each categorical domain is observed in. Columns sharing a domain get the same ENUM type, so they compare and join without casts. -#}
+    {{ return({
+        'prodotto': [('polizze', 'Prodotto'), ('sinistri', 'Prodotto'), ('reclami', 'Prodotto')],
+        'area_bisogno': [('polizze', 'Area di Bisogno'), ('sinistri', 'Area di Bisogno'), ('reclami', 'Area di Bisogno')],
+        'stato_polizza': [('polizze', 'Stato_Polizza')],
+        'canale_acquisizione': [('polizze', 'Canale_Acquisizione')],
+        'tipo_interazione': [('interazioni_clienti', 'Tipo_Interazione')],
+        'esito': [('interazioni_clienti', 'Esito')],
+        'motivo': [('interazioni_clienti', 'Motivo')],
+        'stato_liquidazione': [('sinistri', 'Stato_Liquidazione')],
+        'cluster_risposta': [('clienti', 'Cluster_Risposta')],
+    }) }}
+{% endmacro %}
+
+
+{% macro categorical(column, domain) %}
+    {#- Cast a low-cardinality column to an ENUM of the values observed in the raw data.
+        The domain is read again every time the model is compiled, so values added to the
+        raw data are part of it from the next dbt run. A value missing from the domain
+        fails the cast instead of silently turning into NULL. -#}
+    {%- set selects = [] -%}
+    {%- for table, source_column in categorical_domains()[domain] -%}
+        {%- do selects.append('select "' ~ source_column ~ '" as v from ' ~ source('raw', table)) -%}
+    {%- endfor -%}
+    {%- set values = [] -%}
+    {%- if execute -%}
+        {%- set query = 'select distinct v from (' ~ selects | join(' union all ') ~ ') where v is not null order by v' -%}
+        {%- set values = run_query(query).columns[0].values() -%}
+    {%- endif -%}
+    {%- if values -%}
+        cast({{ column }} as enum(
+            {%- for value in values %}'{{ value | replace("'", "''") }}'{{ ", " if not loop.last }}{% endfor -%}
+        ))
+    {%- else -%}
+        {{ column }}
+    {%- endif -%}
+{%- endmacro %}
+
+
+{% macro without_enums(relation, exclude=[]) %}
+    {#- Star select list of a relation with its ENUM columns cast back to VARCHAR. Rows
+        stored by incremental models and snapshots keep the ENUM of the run that wrote
+        them, which cannot hold values added to the domain later, so those models store
+        categoricals as VARCHAR. -#}
+    {%- set casts = [] -%}
+    {%- if execute -%}
+        {%- for column in adapter.get_columns_in_relation(relation) if column.name not in exclude -%}
+            {%- if column.data_type.startswith('ENUM(') -%}
+                {%- set type = 'varchar[]' if column.data_type.endswith('[]') else 'varchar' -%}
+                {%- do casts.append(adapter.quote(column.name) ~ '::' ~ type ~ ' as ' ~ adapter.quote(column.name)) -%}
+            {%- endif -%}
+        {%- endfor -%}
+    {%- endif -%}
+    *
+    {%- if exclude %} exclude ({{ exclude | join(', ') }}){% endif -%}
+    {%- if casts %} replace ({{ casts | join(', ') }}){% endif -%}
+{%- endmacro %}
+
+
+{% macro varchar_stored_enums() %}
+    {#- on-run-start: convert ENUM columns stored by incremental models and snapshots to
+        VARCHAR, for tables written before those models cast them (see without_enums).
+        Only run_query is used: it autocommits, while the transaction the adapter's
+        introspection opens is rolled back at the end of the hook. -#}
+    {% if execute %}
+        {% set tables = [] %}
+        {% for node in graph.nodes.values()
+            if node.resource_type == 'snapshot' or node.config.materialized == 'incremental' %}
+            {% do tables.append("'" ~ node.schema ~ "." ~ node.alias ~ "'") %}
+        {% endfor %}
+        {% set columns = run_query(
+            "select table_schema, table_name, column_name, data_type"
+            ~ " from information_schema.columns"
+            ~ " where table_catalog = current_database() and data_type like 'ENUM(%'"
+            ~ " and table_schema || '.' || table_name in (" ~ tables | join(', ') ~ ")"
+        ) %}
+        {% for row in columns %}
+            {% do run_query(
+                'alter table "' ~ row[0] ~ '"."' ~ row[1] ~ '" alter column "' ~ row[2] ~ '"'
+                ~ ' type ' ~ ('varchar[]' if row[3].endswith('[]') else 'varchar')
+            ) %}
+        {% endfor %}
+    {% endif %}
+{% endmacro %}
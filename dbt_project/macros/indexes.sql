@@ -0,0 +1,38 @@
+{% macro drop_model_indexes() %}
+    {#- on-run-start: drop the indexes of the database before any model runs.
+        dbt-duckdb swaps every table model in after listing its indexes through
+        duckdb_indexes(), which fails while an indexed table is swapped by another
+        thread; with no indexes in place the models can build in parallel. -#}
+    {% if execute %}
+        {% set indexes = run_query(
+            "select schema_name, index_name from duckdb_indexes()"
+            ~ " where database_name = current_database()"
+        ) %}
+        {% for row in indexes %}
+            {% do run_query('drop index if exists "' ~ row[0] ~ '"."' ~ row[1] ~ '"') %}
+        {% endfor %}
+    {% endif %}
+{% endmacro %}
+
+{% macro create_model_indexes() %}
+    {#- on-run-end: create the ART indexes declared in meta.indexes of the table models,
+        e.g. meta={'indexes': [{'columns': ['codice_cliente'], 'unique': true}]}. Only
+        run_query is used, as it autocommits. -#}
+    {% if execute %}
+        {% set tables = run_query(
+            "select table_schema || '.' || table_name from information_schema.tables"
+            ~ " where table_catalog = current_database() and table_type = 'BASE TABLE'"
+        ).columns[0].values() %}
+        {% for node in graph.nodes.values()
+            if node.resource_type == 'model' and node.schema ~ '.' ~ node.alias in tables %}
+            {% for index in node.config.meta.get('indexes', []) %}
+                {% do run_query(
+                    'create ' ~ ('unique ' if index.get('unique')) ~ 'index if not exists'
+                    ~ ' idx_' ~ node.alias ~ '_' ~ index['columns'] | join('_')
+                    ~ ' on "' ~ node.schema ~ '"."' ~ node.alias ~ '"'
+                    ~ ' (' ~ index['columns'] | join(', ') ~ ')'
+                ) %}
+            {% endfor %}
+        {% endfor %}
+    {% endif %}
+{% endmacro %}
@@ -0,0 +1,7 @@
+{% macro tokenize_text(column) %}
+    {#- Lowercase, accent-free alphanumeric tokens. Mirrored by aida_challenge.complaint_search. -#}
+    list_filter(
+        regexp_split_to_array(lower(strip_accents({{ column }})), '[^a-z0-9]+'),
+        lambda t: t <> ''
+    )
+{%- endmacro %}
@@ -0,0 +1,28 @@
+{{
+    config(
+        materialized='view'
+    )
+}}
+
+-- Competitor reference points per product type, weighted by market share (equal weights
+-- when no share is known), with the premium charged per euro of coverage.
+
+with competitors as (
+    select * from {{ ref('stg_competitor_prodotti') }}
+),
+
+weighted as (
+    select
+        competitor,
+        tipo_prodotto,
+        premio_medio,
+        massimale_medio,
+        premio_medio / nullif(massimale_medio, 0) as tasso_premio,
+        coalesce(
+            quota_mercato_perc / nullif(sum(quota_mercato_perc) over (partition by tipo_prodotto), 0),
+            1.0 / count(*) over (partition by tipo_prodotto)
+        ) as peso
+    from competitors
+)
+
+select * from weighted
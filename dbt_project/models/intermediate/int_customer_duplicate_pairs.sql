@@ -0,0 +1,103 @@
+{{
+    config(
+        materialized='table'
+    )
+}}
+
+-- Candidate duplicate customers: pairs of codice_cliente that likely belong to the same
+-- person despite spelling differences in the names or birthplace.
+-- Comparing every customer with every other grows with the square of the customers, so
+-- only customers sharing a blocking key are compared. Each pass blocks on a different
+-- combination of name prefixes, birthplace prefix and age, so a typo in one field still
+-- leaves the pair in a common block of another pass. Blocks larger than
+-- var dedup_max_block_size are skipped, which keeps the number of comparisons close to
+-- linear in the number of customers. DuckDB runs the block joins on all threads.
+-- A pair is kept when its weighted Jaro-Winkler similarity reaches var
+-- dedup_match_threshold (default 0.9).
+{% set max_block_size = var('dedup_max_block_size', 1000) %}
+{% set threshold = var('dedup_match_threshold', 0.9) %}
+{% set blocking_keys = [
+    "concat_ws('|', left(cognome, 3), eta, left(luogo_nascita, 2))",
+    "concat_ws('|', left(nome, 3), eta, left(luogo_nascita, 2))",
+    "concat_ws('|', left(nome, 2), left(cognome, 2), left(luogo_nascita, 3))",
+] %}
+
+with clienti as (
+    select
+        codice_cliente,
+        -- Compared without case, accents, spaces and punctuation
+        regexp_replace(lower(strip_accents(nome)), '[^a-z]', '', 'g') as nome,
+        regexp_replace(lower(strip_accents(cognome)), '[^a-z]', '', 'g') as cognome,
+        regexp_replace(lower(strip_accents(luogo_nascita)), '[^a-z]', '', 'g') as luogo_nascita,
+        regexp_replace(lower(strip_accents(luogo_residenza)), '[^a-z]', '', 'g')
+            as luogo_residenza,
+        lower(professione) as professione,
+        lower(stato_civile) as stato_civile,
+        eta
+    from {{ ref('stg_clienti') }}
+),
+
+blocks as (
+    {% for key in blocking_keys %}
+    select
+        {{ loop.index }} as passaggio,
+        {{ key }} as chiave_blocco,
+        codice_cliente
+    from clienti
+    {% if not loop.last %}union all{% endif %}
+    {% endfor %}
+),
+
+sized_blocks as (
+    select
+        *,
+        count(*) over (partition by passaggio, chiave_blocco) as dimensione_blocco
+    from blocks
+),
+
+candidates as (
+    select distinct
+        a.codice_cliente as codice_cliente_a,
+        b.codice_cliente as codice_cliente_b
+    from sized_blocks as a
+    inner join sized_blocks as b
+        on a.passaggio = b.passaggio
+        and a.chiave_blocco = b.chiave_blocco
+        and a.codice_cliente < b.codice_cliente
+    where a.dimensione_blocco <= {{ max_block_size }}
+),
+
+scored as (
+    select
+        c.codice_cliente_a,
+        c.codice_cliente_b,
+        jaro_winkler_similarity(a.cognome, b.cognome) as similarita_cognome,
+        jaro_winkler_similarity(a.nome, b.nome) as similarita_nome,
+        jaro_winkler_similarity(a.luogo_nascita, b.luogo_nascita) as similarita_luogo_nascita,
+        abs(a.eta - b.eta) as differenza_eta,
+        0.25 * similarita_cognome
+        + 0.20 * similarita_nome
+        + 0.15 * similarita_luogo_nascita
+        + 0.15 * case abs(a.eta - b.eta) when 0 then 1.0 when 1 then 0.5 else 0.0 end
+        + 0.10 * jaro_winkler_similarity(a.luogo_residenza, b.luogo_residenza)
+        + 0.10 * (a.professione is not distinct from b.professione)::int
+        + 0.05 * (a.stato_civile is not distinct from b.stato_civile)::int
+            as punteggio_match
+    from candidates as c
+    inner join clienti as a on c.codice_cliente_a = a.codice_cliente
+    inner join clienti as b on c.codice_cliente_b = b.codice_cliente
+    -- The age is recorded at extraction time, so records of one person differ by a year at most
+    where abs(a.eta - b.eta) <= 1
+)
+
+select
+    codice_cliente_a,
+    codice_cliente_b,
+    round(similarita_cognome, 4) as similarita_cognome,
+    round(similarita_nome, 4) as similarita_nome,
+    round(similarita_luogo_nascita, 4) as similarita_luogo_nascita,
+    differenza_eta,
+    round(punteggio_match, 4) as punteggio_match
+from scored
+where punteggio_match >= {{ threshold }}
+order by codice_cliente_a, codice_cliente_b
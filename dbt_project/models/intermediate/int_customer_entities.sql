@@ -0,0 +1,45 @@
+{{
+    config(
+        materialized='table'
+    )
+}}
+
+-- Entity resolution: every customer record is assigned to the person it belongs to.
+-- Records linked by a chain of duplicate pairs form one entity, whose id is the smallest
+-- codice_cliente among its records. The id does not depend on the order of the data or
+-- on the run, and only changes when a record joins or leaves the entity.
+
+with recursive pairs as (
+    select codice_cliente_a as da, codice_cliente_b as a
+    from {{ ref('int_customer_duplicate_pairs') }}
+    union all
+    select codice_cliente_b as da, codice_cliente_a as a
+    from {{ ref('int_customer_duplicate_pairs') }}
+),
+
+-- Connected components by min-label propagation: every record starts from the smallest
+-- codice_cliente among itself and its neighbours, and each iteration passes only the labels
+-- that changed to their neighbours, keeping a label when it is smaller than the current one.
+-- USING KEY keeps one label per record (recurring.labels holds the current labels), so the
+-- work grows with the number of pairs times the component diameter, instead of the
+-- squared size of every component a transitive closure would materialize.
+labels(codice_cliente, id_entita) using key (codice_cliente) as (
+    select da, least(da, min(a))
+    from pairs
+    group by da
+    union
+    select p.a, min(l.id_entita)
+    from labels as l
+    inner join pairs as p on l.codice_cliente = p.da
+    inner join recurring.labels as r on p.a = r.codice_cliente
+    group by p.a
+    having min(l.id_entita) < any_value(r.id_entita)
+)
+
+select
+    c.codice_cliente,
+    coalesce(e.id_entita, c.codice_cliente) as id_entita,
+    count(*) over (partition by coalesce(e.id_entita, c.codice_cliente)) as num_record_entita
+from {{ ref('stg_clienti') }} as c
+left join labels as e on c.codice_cliente = e.codice_cliente
+order by id_entita, c.codice_cliente
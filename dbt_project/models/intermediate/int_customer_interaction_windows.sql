@@ -0,0 +1,50 @@
+{{
+    config(
+        materialized='view'
+    )
+}}
+
+-- Rolling-window interaction features derived from the daily rollups. Windows end at the
+-- latest interaction date (the data is a periodic snapshot), or at the date given in
+-- var interactions_reference_date.
+{% set windows = [30, 90, 365] %}
+{% set reference_date = var('interactions_reference_date', none) %}
+
+with reference as (
+    select
+        {% if reference_date %}
+            '{{ reference_date }}'::date as data_riferimento
+        {% else %}
+            max(data_interazione) as data_riferimento
+        {% endif %}
+    from {{ ref('int_interactions_daily') }}
+),
+
+daily as (
+    select
+        d.*,
+        datediff('day', d.data_interazione, r.data_riferimento) as giorni_fa
+    from {{ ref('int_interactions_daily') }} as d
+    cross join reference as r
+    where d.data_interazione > r.data_riferimento - interval '{{ windows | max }} days'
+        and d.data_interazione <= r.data_riferimento
+),
+
+aggregated as (
+    select
+        codice_cliente,
+        {% for days in windows %}
+            sum(case when giorni_fa < {{ days }} then num_interazioni else 0 end)::bigint
+                as num_interazioni_{{ days }}g,
+            sum(case when giorni_fa < {{ days }} then num_conversioni else 0 end)::bigint
+                as num_conversioni_{{ days }}g,
+            sum(case when giorni_fa < {{ days }} then num_esiti_negativi else 0 end)::bigint
+                as num_esiti_negativi_{{ days }}g,
+            sum(case when giorni_fa < {{ days }} then num_reclami_interazioni else 0 end)::bigint
+                as num_reclami_interazioni_{{ days }}g{{ "," if not loop.last }}
+        {% endfor %}
+    from daily
+    group by codice_cliente
+)
+
+select * from aggregated
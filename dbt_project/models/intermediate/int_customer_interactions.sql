@@ -4,8 +4,10 @@
     )
 }}
 
-with interazioni as (
-    select * from {{ ref('stg_interazioni_clienti') }}
+-- Lifetime interaction metrics, rolled up from the daily aggregates instead of raw events.
+
+with daily as (
+    select * from {{ ref('int_interactions_daily') }}
 ),
 
 aggregated as (
@@ -13,42 +15,42 @@ aggregated as (
         codice_cliente,
 
         -- Interaction counts
-        count(*) as num_interazioni_totali,
-        count(distinct tipo_interazione) as num_tipi_interazione,
+        sum(num_interazioni)::bigint as num_interazioni_totali,
+        len(list_distinct(flatten(list(tipi_interazione)))) as num_tipi_interazione,
 
         -- By type
-        count(case when tipo_interazione = 'Visita Agente' then 1 end) as num_visite_agente,
-        count(case when tipo_interazione = 'Chat Online' then 1 end) as num_chat_online,
-        count(case when tipo_interazione = 'Telefono' then 1 end) as num_telefonate,
-        count(case when tipo_interazione = 'App Mobile' then 1 end) as num_app_mobile,
-        count(case when tipo_interazione = 'Email' then 1 end) as num_email,
+        sum(num_visite_agente)::bigint as num_visite_agente,
+        sum(num_chat_online)::bigint as num_chat_online,
+        sum(num_telefonate)::bigint as num_telefonate,
+        sum(num_app_mobile)::bigint as num_app_mobile,
+        sum(num_email)::bigint as num_email,
 
         -- By outcome
-        count(case when esito = 'Positivo' then 1 end) as num_esiti_positivi,
-        count(case when esito = 'Negativo' then 1 end) as num_esiti_negativi,
-        count(case when esito = 'Neutrale' then 1 end) as num_esiti_neutrali,
+        sum(num_esiti_positivi)::bigint as num_esiti_positivi,
+        sum(num_esiti_negativi)::bigint as num_esiti_negativi,
+        sum(num_esiti_neutrali)::bigint as num_esiti_neutrali,
 
         -- Conversion metrics
-        count(case when conversione = true then 1 end) as num_conversioni,
-        count(case when conversione = true then 1 end)::float / count(*)::float as tasso_conversione,
+        sum(num_conversioni)::bigint as num_conversioni,
+        sum(num_conversioni)::float / sum(num_interazioni)::float as tasso_conversione,
 
         -- By reason
-        count(case when motivo = 'Consulenza' then 1 end) as num_consulenza,
-        count(case when motivo = 'Reclamo' then 1 end) as num_reclami_interazioni,
-        count(case when motivo = 'Pagamento Premio' then 1 end) as num_pagamenti,
-        count(case when motivo = 'Informazioni Prodotto' then 1 end) as num_info_prodotto,
+        sum(num_consulenza)::bigint as num_consulenza,
+        sum(num_reclami_interazioni)::bigint as num_reclami_interazioni,
+        sum(num_pagamenti)::bigint as num_pagamenti,
+        sum(num_info_prodotto)::bigint as num_info_prodotto,
 
         -- Duration metrics
-        avg(durata_minuti) as durata_media_minuti,
-        sum(durata_minuti) as durata_totale_minuti,
-        max(durata_minuti) as durata_max_minuti,
+        sum(durata_totale_minuti) / nullif(sum(num_durate), 0) as durata_media_minuti,
+        sum(durata_totale_minuti) as durata_totale_minuti,
+        max(durata_max_minuti) as durata_max_minuti,
 
         -- Dates
         min(data_interazione) as prima_interazione,
         max(data_interazione) as ultima_interazione,
         datediff('day', min(data_interazione), max(data_interazione)) as giorni_tra_prima_ultima
 
-    from interazioni
+    from daily
     group by codice_cliente
 )
 
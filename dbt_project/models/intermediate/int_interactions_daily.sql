@@ -0,0 +1,105 @@
+{{
+    config(
+        materialized='incremental',
+        incremental_strategy='delete+insert',
+        unique_key='data_interazione',
+        on_schema_change='append_new_columns',
+        post_hook="
+            delete from {{ this }}
+            where data_interazione not in (
+                select data_interazione from {{ ref('stg_interazioni_clienti') }}
+                where data_interazione is not null
+            )
+        "
+    )
+}}
+
+-- Daily per-customer interaction rollups: the base for lifetime and rolling-window
+-- interaction features, so they never rescan the raw event history. Rows are stored in
+-- date order, which lets date-range filters skip whole row groups. Every row carries a
+-- fingerprint of all the events of its day (_hash_giorno). Incremental runs only rebuild
+-- the days whose fingerprint differs from the source, i.e. the days with new, late,
+-- corrected or deleted events, however old; the post-hook removes days left without
+-- events. The fingerprint only hashes the source, which is much cheaper than rolling it up.
+{% set event_hash -%}
+    hash(
+        codice_cliente, data_interazione, tipo_interazione::varchar, motivo::varchar,
+        durata_minuti, esito::varchar, conversione
+    )
+{%- endset %}
+{% set stored_columns = adapter.get_columns_in_relation(this) | map(attribute='name') | list
+    if is_incremental() else [] %}
+
+with giorni as (
+    select
+        data_interazione,
+        sum({{ event_hash }}) as _hash_giorno
+    from {{ ref('stg_interazioni_clienti') }}
+    group by data_interazione
+),
+
+{% if is_incremental() %}
+giorni_modificati as (
+    select g.data_interazione
+    from giorni as g
+    {% if '_hash_giorno' in stored_columns %}
+        left join (
+            select distinct data_interazione, _hash_giorno from {{ this }}
+        ) as t on g.data_interazione = t.data_interazione
+        where t._hash_giorno is distinct from g._hash_giorno
+    {% endif %}
+),
+{% endif %}
+
+interazioni as (
+    select * from {{ ref('stg_interazioni_clienti') }}
+    {% if is_incremental() %}
+        where data_interazione in (select data_interazione from giorni_modificati)
+    {% endif %}
+),
+
+daily as (
+    select
+        data_interazione,
+        codice_cliente,
+
+        -- Interaction counts
+        count(*) as num_interazioni,
+        list(distinct tipo_interazione::varchar) as tipi_interazione,
+
+        -- By type
+        count(case when tipo_interazione = 'Visita Agente' then 1 end) as num_visite_agente,
+        count(case when tipo_interazione = 'Chat Online' then 1 end) as num_chat_online,
+        count(case when tipo_interazione = 'Telefono' then 1 end) as num_telefonate,
+        count(case when tipo_interazione = 'App Mobile' then 1 end) as num_app_mobile,
+        count(case when tipo_interazione = 'Email' then 1 end) as num_email,
+
+        -- By outcome
+        count(case when esito = 'Positivo' then 1 end) as num_esiti_positivi,
+        count(case when esito = 'Negativo' then 1 end) as num_esiti_negativi,
+        count(case when esito = 'Neutrale' then 1 end) as num_esiti_neutrali,
+
+        -- Conversions
+        count(case when conversione = true then 1 end) as num_conversioni,
+
+        -- By reason
+        count(case when motivo = 'Consulenza' then 1 end) as num_consulenza,
+        count(case when motivo = 'Reclamo' then 1 end) as num_reclami_interazioni,
+        count(case when motivo = 'Pagamento Premio' then 1 end) as num_pagamenti,
+        count(case when motivo = 'Informazioni Prodotto' then 1 end) as num_info_prodotto,
+
+        -- Duration (count kept so averages can be rebuilt exactly)
+        count(durata_minuti) as num_durate,
+        sum(durata_minuti) as durata_totale_minuti,
+        max(durata_minuti) as durata_max_minuti
+
+    from interazioni
+    group by data_interazione, codice_cliente
+)
+
+select
+    d.*,
+    g._hash_giorno
+from daily as d
+inner join giorni as g on d.data_interazione = g.data_interazione
+order by d.data_interazione, d.codice_cliente
@@ -0,0 +1,62 @@
+{{
+    config(
+        materialized='table'
+    )
+}}
+
+-- Product co-holding statistics over active policies: for every ordered pair of
+-- products, how many customers hold both and how likely the second is given the first.
+
+with holdings as (
+    select distinct
+        codice_cliente,
+        prodotto
+    from {{ ref('stg_polizze') }}
+    where stato_polizza = 'Attiva'
+),
+
+product_holders as (
+    select
+        prodotto,
+        count(*) as num_clienti
+    from holdings
+    group by prodotto
+),
+
+totals as (
+    select count(distinct codice_cliente) as num_clienti_totali
+    from holdings
+),
+
+pairs as (
+    select
+        a.prodotto as prodotto_posseduto,
+        b.prodotto as prodotto_candidato,
+        count(*) as num_clienti_entrambi
+    from holdings as a
+    inner join holdings as b
+        on a.codice_cliente = b.codice_cliente and a.prodotto <> b.prodotto
+    group by a.prodotto, b.prodotto
+),
+
+final as (
+    select
+        p.prodotto_posseduto,
+        p.prodotto_candidato,
+        p.num_clienti_entrambi,
+        ha.num_clienti as num_clienti_posseduto,
+
+        -- P(candidate | held)
+        p.num_clienti_entrambi::float / ha.num_clienti as confidenza,
+
+        -- Confidence relative to the candidate's overall holding rate
+        (p.num_clienti_entrambi::float / ha.num_clienti)
+        / (hb.num_clienti::float / t.num_clienti_totali) as lift
+
+    from pairs as p
+    inner join product_holders as ha on p.prodotto_posseduto = ha.prodotto
+    inner join product_holders as hb on p.prodotto_candidato = hb.prodotto
+    cross join totals as t
+)
+
+select * from final
@@ -0,0 +1,37 @@
+{{
+    config(
+        materialized='incremental',
+        incremental_strategy='delete+insert',
+        unique_key='id_reclamo'
+    )
+}}
+
+-- Complaints with their text tokenized once. Complaints have no identifier in the source,
+-- so id_reclamo is derived from their content (numbering identical duplicates).
+-- Incremental runs only tokenize complaints not seen before.
+
+with reclami as (
+    select
+        *,
+        row_number() over (
+            partition by codice_cliente, prodotto, area_bisogno, reclami_e_info
+        ) as occorrenza
+    from {{ ref('stg_reclami') }}
+),
+
+documenti as (
+    select
+        md5(concat_ws('|', codice_cliente, prodotto, area_bisogno, reclami_e_info, occorrenza))
+            as id_reclamo,
+        codice_cliente,
+        prodotto::varchar as prodotto,
+        area_bisogno::varchar as area_bisogno,
+        reclami_e_info,
+        {{ tokenize_text('reclami_e_info') }} as termini
+    from reclami
+)
+
+select * from documenti
+{% if is_incremental() %}
+    where id_reclamo not in (select id_reclamo from {{ this }})
+{% endif %}
@@ -0,0 +1,29 @@
+{{
+    config(
+        materialized='incremental',
+        incremental_strategy='delete+insert',
+        unique_key='id_reclamo'
+    )
+}}
+
+-- Inverted index over the complaint text: one posting per token occurrence, with its
+-- position so phrases can be matched. Stored in term order, so a term lookup only reads
+-- the row groups holding that term. Incremental runs only index new complaints.
+
+with documenti as (
+    select id_reclamo, termini from {{ ref('int_reclami_documenti') }}
+    {% if is_incremental() %}
+        where id_reclamo not in (select id_reclamo from {{ this }})
+    {% endif %}
+),
+
+postings as (
+    select
+        id_reclamo,
+        unnest(termini) as termine,
+        generate_subscripts(termini, 1) as posizione
+    from documenti
+)
+
+select * from postings
+order by termine, id_reclamo, posizione
@@ -4,6 +4,9 @@
     )
 }}
 
+-- Stored in agency order (clustering), so agency-scoped reads only touch that agency's
+-- row groups.
+
 with customer_base as (
     select * from {{ ref('int_customer_policies') }}
 ),
@@ -12,14 +15,28 @@ interactions as (
     select * from {{ ref('int_customer_interactions') }}
 ),
 
+interaction_windows as (
+    select * from {{ ref('int_customer_interaction_windows') }}
+),
+
 claims as (
     select * from {{ ref('int_customer_claims') }}
 ),
 
+clienti as (
+    select * from {{ ref('stg_clienti') }}
+),
+
+entities as (
+    select * from {{ ref('int_customer_entities') }}
+),
+
 final as (
     select
         -- Customer identifiers
         cb.codice_cliente,
+        e.id_entita,
+        e.num_record_entita,
         cb.nome,
         cb.cognome,
         cb.eta,
@@ -28,6 +45,13 @@ final as (
         cb.stato_civile,
         cb.agenzia,
         cb.zona_residenza,
+        s.luogo_residenza,
+        s.latitudine,
+        s.longitudine,
+        s.cluster_risposta,
+        s.anzianita_compagnia,
+        s.visite_ultimo_anno,
+        s.num_polizze,
 
         -- Policy metrics
         cb.num_prodotti_distinti,
@@ -53,6 +77,11 @@ final as (
         coalesce(i.num_interazioni_totali, 0) as num_interazioni_totali,
         coalesce(i.num_conversioni, 0) as num_conversioni,
         coalesce(i.tasso_conversione, 0) as tasso_conversione,
+        coalesce(iw.num_interazioni_30g, 0) as num_interazioni_30g,
+        coalesce(iw.num_interazioni_90g, 0) as num_interazioni_90g,
+        coalesce(iw.num_interazioni_365g, 0) as num_interazioni_365g,
+        coalesce(iw.num_conversioni_90g, 0) as num_conversioni_90g,
+        coalesce(iw.num_reclami_interazioni_365g, 0) as num_reclami_interazioni_365g,
 
         -- Customer scores
         coalesce(i.num_esiti_positivi, 0) as num_esiti_positivi,
@@ -92,7 +121,11 @@ final as (
 
     from customer_base as cb
     left join interactions as i on cb.codice_cliente = i.codice_cliente
+    left join interaction_windows as iw on cb.codice_cliente = iw.codice_cliente
     left join claims as cl on cb.codice_cliente = cl.codice_cliente
+    left join clienti as s on cb.codice_cliente = s.codice_cliente
+    left join entities as e on cb.codice_cliente = e.codice_cliente
 )
 
 select * from final
+order by agenzia, codice_cliente
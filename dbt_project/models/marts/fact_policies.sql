@@ -4,6 +4,9 @@
     )
 }}
 
+-- Stored in agency order (clustering), so agency-scoped reads only touch that agency's
+-- row groups.
+
 with polizze as (
     select * from {{ ref('stg_polizze') }}
 ),
@@ -77,3 +80,4 @@ final as (
 )
 
 select * from final
+order by agenzia, codice_cliente
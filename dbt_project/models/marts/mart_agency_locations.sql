@@ -0,0 +1,28 @@
+{{
+    config(
+        materialized='table'
+    )
+}}
+
+-- Agency locations from the agency_locations seed, with the number of customers of each
+-- agency. Agencies of the same city share the city-centre coordinates until agency
+-- addresses are available, so nearest-agency lookups resolve the city, not the branch.
+
+with clienti as (
+    select
+        agenzia,
+        count(*) as num_clienti
+    from {{ ref('stg_clienti') }}
+    where agenzia is not null
+    group by agenzia
+)
+
+select
+    a.agenzia,
+    a.citta,
+    a.latitudine,
+    a.longitudine,
+    coalesce(c.num_clienti, 0) as num_clienti
+from {{ ref('agency_locations') }} as a
+left join clienti as c on a.agenzia = c.agenzia
+order by a.agenzia
@@ -0,0 +1,57 @@
+{{
+    config(
+        materialized='table'
+    )
+}}
+
+-- Distribution of the per-policy price gaps in mart_policy_benchmark by product, agency
+-- and residence zone, computed in a single grouping-sets pass. dimensione tells which
+-- breakdown a row belongs to and valore holds the product, agency or zone. Rows with
+-- agenzia set break down the policies of that agency only (by product and by zone), for
+-- dashboards showing one agency; company-wide rows have a null agenzia. Rows are stored
+-- in agenzia order, so reading one agency's rows skips the others.
+
+with benchmark as (
+    select * from {{ ref('mart_policy_benchmark') }}
+    where gap_premio_perc is not null
+)
+
+select
+    case
+        when grouping(agenzia) = 0 and (grouping(prodotto) = 0 or grouping(zona_residenza) = 0)
+            then agenzia
+    end as agenzia,
+    case
+        when grouping(prodotto) = 0 then 'Prodotto'
+        when grouping(zona_residenza) = 0 then 'Zona'
+        else 'Agenzia'
+    end as dimensione,
+    case
+        when grouping(prodotto) = 0 then prodotto
+        when grouping(zona_residenza) = 0 then zona_residenza
+        else agenzia
+    end as valore,
+
+    count(*) as num_polizze,
+    sum(premio_totale_annuo) as premio_totale,
+    sum(gap_premio) as gap_premio_totale,
+
+    -- Price gap distribution (share of the expected market premium)
+    avg(gap_premio_perc) as gap_premio_perc_medio,
+    quantile_cont(gap_premio_perc, 0.10) as gap_premio_perc_p10,
+    quantile_cont(gap_premio_perc, 0.25) as gap_premio_perc_p25,
+    quantile_cont(gap_premio_perc, 0.50) as gap_premio_perc_mediano,
+    quantile_cont(gap_premio_perc, 0.75) as gap_premio_perc_p75,
+    quantile_cont(gap_premio_perc, 0.90) as gap_premio_perc_p90,
+
+    -- Positioning
+    avg(percentile_premio_mercato) as percentile_premio_medio,
+    avg(percentile_massimale_mercato) as percentile_massimale_medio,
+    avg(case when posizionamento_prezzo = 'Sopra mercato' then 1.0 else 0.0 end) as quota_sopra_mercato,
+    avg(case when posizionamento_prezzo = 'Sotto mercato' then 1.0 else 0.0 end) as quota_sotto_mercato
+
+from benchmark
+group by grouping sets (
+    (prodotto), (agenzia), (zona_residenza), (agenzia, prodotto), (agenzia, zona_residenza)
+)
+order by agenzia nulls first, dimensione, valore
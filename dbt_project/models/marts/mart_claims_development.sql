@@ -0,0 +1,68 @@
+{{
+    config(
+        materialized='incremental',
+        incremental_strategy='delete+insert',
+        unique_key='data_valutazione'
+    )
+}}
+
+-- Claims position at every evaluation date, by accident year, product and need area.
+-- Evaluation dates are the days on which sinistri_snapshot recorded changes, plus the
+-- current build date, so every build adds one diagonal to the loss-development triangle.
+-- Incremental runs only compute evaluations from the latest stored one onwards.
+
+with versioni as (
+    select * from {{ ref('sinistri_snapshot') }}
+    where data_sinistro is not null
+),
+
+valutazioni as (
+    select distinct data_valutazione
+    from (
+        select dbt_valid_from::date as data_valutazione from versioni
+        union all
+        select current_date
+    )
+    {% if is_incremental() %}
+        where data_valutazione >= (select max(data_valutazione) from {{ this }})
+    {% endif %}
+),
+
+-- Claim versions in force at the end of each evaluation date
+posizioni as (
+    select
+        v.data_valutazione,
+        s.*
+    from valutazioni as v
+    inner join versioni as s
+        on s.dbt_valid_from < v.data_valutazione + interval '1 day'
+        and (s.dbt_valid_to is null or s.dbt_valid_to >= v.data_valutazione + interval '1 day')
+    where s.data_sinistro <= v.data_valutazione
+),
+
+aggregated as (
+    select
+        data_valutazione,
+        year(data_sinistro) as anno_sinistro,
+        year(data_valutazione) - year(data_sinistro) as anni_sviluppo,
+        prodotto,
+        area_bisogno,
+
+        -- Claim counts
+        count(*) as num_sinistri_denunciati,
+        count(case when stato_liquidazione = 'Liquidato' then 1 end) as num_sinistri_liquidati,
+        count(case when stato_liquidazione = 'In Lavorazione' then 1 end) as num_sinistri_aperti,
+        count(case when stato_liquidazione = 'Respinto' then 1 end) as num_sinistri_respinti,
+
+        -- Paid (settled claims) and incurred (settled plus open claims)
+        coalesce(sum(case when stato_liquidazione = 'Liquidato' then importo_liquidato end), 0)
+            as importo_pagato_cumulato,
+        coalesce(sum(case when stato_liquidazione <> 'Respinto' then importo_liquidato end), 0)
+            as importo_sostenuto_cumulato
+
+    from posizioni
+    group by all
+)
+
+select * from aggregated
+order by data_valutazione, anno_sinistro, prodotto
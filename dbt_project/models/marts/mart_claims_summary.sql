@@ -0,0 +1,71 @@
+{{
+    config(
+        materialized='incremental',
+        incremental_strategy='delete+insert',
+        unique_key='mese_sinistro'
+    )
+}}
+
+-- Claims aggregated by accident month, product, need area, claim type and settlement
+-- status. Incremental runs only rebuild the accident months whose claims changed (new
+-- claims, settlements, status updates), detected through a fingerprint of each month's
+-- rows stored in _impronta_mese. Claims without an accident date are left out.
+
+with sinistri as (
+    select
+        {{ without_enums(ref('stg_sinistri')) }},
+        date_trunc('month', data_sinistro)::date as mese_sinistro
+    from {{ ref('stg_sinistri') }}
+    where data_sinistro is not null
+),
+
+impronte as (
+    select
+        mese_sinistro,
+        sum(hash(
+            codice_cliente, prodotto, area_bisogno, sinistro, data_sinistro,
+            importo_liquidato, stato_liquidazione
+        )) as _impronta_mese
+    from sinistri
+    group by mese_sinistro
+),
+
+{% if is_incremental() %}
+mesi_modificati as (
+    select i.mese_sinistro
+    from impronte as i
+    left join (select distinct mese_sinistro, _impronta_mese from {{ this }}) as t
+        on i.mese_sinistro = t.mese_sinistro
+    where t._impronta_mese is distinct from i._impronta_mese
+),
+{% endif %}
+
+aggregated as (
+    select
+        s.mese_sinistro,
+        s.prodotto,
+        s.area_bisogno,
+        s.sinistro as tipo_sinistro,
+        s.stato_liquidazione,
+
+        -- Counts
+        count(*) as num_sinistri,
+        count(distinct s.codice_cliente) as num_clienti,
+
+        -- Amounts
+        sum(s.importo_liquidato) as importo_totale_liquidato,
+        avg(s.importo_liquidato) as importo_medio_liquidato,
+        max(s.importo_liquidato) as importo_max_liquidato,
+
+        i._impronta_mese
+
+    from sinistri as s
+    inner join impronte as i on s.mese_sinistro = i.mese_sinistro
+    {% if is_incremental() %}
+        where s.mese_sinistro in (select mese_sinistro from mesi_modificati)
+    {% endif %}
+    group by all
+)
+
+select * from aggregated
+order by mese_sinistro, prodotto, tipo_sinistro, stato_liquidazione
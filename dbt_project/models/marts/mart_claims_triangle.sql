@@ -0,0 +1,47 @@
+{{
+    config(
+        materialized='table'
+    )
+}}
+
+-- Loss-development triangle: one cell per accident year and development year (years
+-- between the accident year and the evaluation year), by product and need area. Each cell
+-- holds the latest evaluation made at that development year. Cells fill in as builds
+-- accumulate evaluations in mart_claims_development.
+
+with sviluppo as (
+    select * from {{ ref('mart_claims_development') }}
+    qualify row_number() over (
+        partition by anno_sinistro, anni_sviluppo, prodotto, area_bisogno
+        order by data_valutazione desc
+    ) = 1
+),
+
+triangle as (
+    select
+        anno_sinistro,
+        anni_sviluppo,
+        prodotto,
+        area_bisogno,
+        data_valutazione,
+        num_sinistri_denunciati,
+        num_sinistri_aperti,
+        importo_pagato_cumulato,
+        importo_sostenuto_cumulato,
+
+        -- Age-to-age factor against the previous development year, when it was evaluated
+        case
+            when lag(anni_sviluppo) over w = anni_sviluppo - 1
+                then importo_pagato_cumulato / nullif(lag(importo_pagato_cumulato) over w, 0)
+        end as fattore_sviluppo_pagato,
+        case
+            when lag(anni_sviluppo) over w = anni_sviluppo - 1
+                then importo_sostenuto_cumulato / nullif(lag(importo_sostenuto_cumulato) over w, 0)
+        end as fattore_sviluppo_sostenuto
+
+    from sviluppo
+    window w as (partition by anno_sinistro, prodotto, area_bisogno order by anni_sviluppo)
+)
+
+select * from triangle
+order by prodotto, anno_sinistro, anni_sviluppo
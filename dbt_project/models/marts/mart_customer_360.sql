@@ -0,0 +1,116 @@
+{{
+    config(
+        materialized='table',
+        meta={'indexes': [{'columns': ['codice_cliente'], 'unique': true}]}
+    )
+}}
+
+-- One row per customer with the full profile nested in list columns, stored in
+-- codice_cliente order with a unique index so single-customer lookups touch one row.
+
+with customers as (
+    select * from {{ ref('dim_customers') }}
+),
+
+policies as (
+    select
+        codice_cliente,
+        list(
+            struct_pack(
+                prodotto,
+                area_bisogno,
+                stato_polizza,
+                canale_acquisizione,
+                data_emissione,
+                data_scadenza,
+                premio_totale_annuo,
+                massimale,
+                margine_lordo,
+                loss_ratio,
+                in_scadenza
+            )
+            order by data_emissione desc
+        ) as polizze
+    from {{ ref('fact_policies') }}
+    group by codice_cliente
+),
+
+claims as (
+    select
+        codice_cliente,
+        list(
+            struct_pack(
+                prodotto,
+                area_bisogno,
+                sinistro,
+                data_sinistro,
+                importo_liquidato,
+                stato_liquidazione
+            )
+            order by data_sinistro desc
+        ) as sinistri
+    from {{ ref('stg_sinistri') }}
+    group by codice_cliente
+),
+
+complaints as (
+    select
+        codice_cliente,
+        list(struct_pack(prodotto, area_bisogno, reclami_e_info)) as reclami
+    from {{ ref('stg_reclami') }}
+    group by codice_cliente
+),
+
+homes as (
+    select
+        codice_cliente,
+        list(struct_pack(luogo_residenza, indirizzo, metratura, sistema_allarme)) as abitazioni
+    from {{ ref('stg_abitazioni') }}
+    group by codice_cliente
+),
+
+latest_interactions as (
+    select *
+    from {{ ref('stg_interazioni_clienti') }}
+    qualify row_number() over (
+        partition by codice_cliente
+        order by data_interazione desc
+    ) <= 20
+),
+
+recent_interactions as (
+    select
+        codice_cliente,
+        list(
+            struct_pack(
+                data_interazione,
+                tipo_interazione,
+                motivo,
+                durata_minuti,
+                esito,
+                conversione
+            )
+            order by data_interazione desc
+        ) as interazioni_recenti
+    from latest_interactions
+    group by codice_cliente
+),
+
+final as (
+    select
+        c.*,
+        coalesce(p.polizze, []) as polizze,
+        coalesce(cl.sinistri, []) as sinistri,
+        coalesce(r.reclami, []) as reclami,
+        coalesce(h.abitazioni, []) as abitazioni,
+        coalesce(i.interazioni_recenti, []) as interazioni_recenti
+    from customers as c
+    left join policies as p on c.codice_cliente = p.codice_cliente
+    left join claims as cl on c.codice_cliente = cl.codice_cliente
+    left join complaints as r on c.codice_cliente = r.codice_cliente
+    left join homes as h on c.codice_cliente = h.codice_cliente
+    left join recent_interactions as i on c.codice_cliente = i.codice_cliente
+)
+
+select * from final
+order by codice_cliente
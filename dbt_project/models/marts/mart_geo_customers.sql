@@ -0,0 +1,64 @@
+{{
+    config(
+        materialized='table'
+    )
+}}
+
+-- Spatial index of customers: every located customer is assigned to a grid cell of
+-- var geo_cell_degrees (default 0.05, about 5 km) and rows are stored in cell order, so
+-- radius searches (aida_challenge.geo) read only the row groups around the search area.
+-- The nearest agency is precomputed against the few agency locations, which keeps the
+-- cost linear in the number of customers. Agencies of one city share a location, so ties
+-- go to the customer's own agency, then to the first agency by name.
+{% set cell = var('geo_cell_degrees', 0.05) %}
+
+with clienti as (
+    select
+        c.codice_cliente,
+        c.agenzia,
+        c.zona_residenza,
+        s.latitudine,
+        s.longitudine,
+        s.probabilita_furti,
+        s.probabilita_rapine,
+        s.valore_immobiliare_medio,
+        c.num_polizze_attive,
+        c.num_prodotti_protezione
+    from {{ ref('dim_customers') }} as c
+    inner join {{ ref('stg_clienti') }} as s on c.codice_cliente = s.codice_cliente
+    where s.latitudine is not null and s.longitudine is not null
+),
+
+agenzie as (
+    select * from {{ ref('mart_agency_locations') }}
+),
+
+distanze as (
+    select
+        c.codice_cliente,
+        a.agenzia,
+        a.agenzia is distinct from c.agenzia as altra_agenzia,
+        {{ haversine_km('c.latitudine', 'c.longitudine', 'a.latitudine', 'a.longitudine') }}
+            as distanza_km
+    from clienti as c
+    cross join agenzie as a
+),
+
+agenzia_piu_vicina as (
+    select
+        codice_cliente,
+        arg_min(agenzia, (distanza_km, altra_agenzia, agenzia)) as agenzia_piu_vicina,
+        min(distanza_km) as distanza_agenzia_km
+    from distanze
+    group by codice_cliente
+)
+
+select
+    c.*,
+    floor(c.latitudine / {{ cell }})::integer as cella_lat,
+    floor(c.longitudine / {{ cell }})::integer as cella_lon,
+    v.agenzia_piu_vicina,
+    v.distanza_agenzia_km
+from clienti as c
+left join agenzia_piu_vicina as v on c.codice_cliente = v.codice_cliente
+order by cella_lat, cella_lon, c.codice_cliente
@@ -0,0 +1,34 @@
+{{
+    config(
+        materialized='table'
+    )
+}}
+
+-- Homes (stg_abitazioni) located at their owner's coordinates, since the source has
+-- addresses but no coordinates. Same grid cells and ordering as mart_geo_customers.
+
+with abitazioni as (
+    select * from {{ ref('stg_abitazioni') }}
+),
+
+clienti as (
+    select * from {{ ref('mart_geo_customers') }}
+)
+
+select
+    a.codice_cliente,
+    a.luogo_residenza,
+    a.indirizzo,
+    a.metratura,
+    a.sistema_allarme,
+    c.zona_residenza,
+    c.latitudine,
+    c.longitudine,
+    c.cella_lat,
+    c.cella_lon,
+    c.probabilita_furti,
+    c.probabilita_rapine,
+    c.num_prodotti_protezione
+from abitazioni as a
+inner join clienti as c on a.codice_cliente = c.codice_cliente
+order by c.cella_lat, c.cella_lon, a.codice_cliente
@@ -0,0 +1,31 @@
+{{
+    config(
+        materialized='table'
+    )
+}}
+
+-- Interaction count, average duration and conversion rate by interaction type, company-wide
+-- and within each agency, computed in a single grouping-sets pass. Rows with agenzia set
+-- cover the interactions of that agency's customers only; company-wide rows have a null
+-- agenzia. Rows are stored in agenzia order, so reading one agency's rows skips the others.
+
+with interazioni as (
+    select
+        c.agenzia,
+        i.tipo_interazione,
+        i.durata_minuti,
+        i.conversione
+    from {{ ref('stg_interazioni_clienti') }} i
+    inner join {{ ref('dim_customers') }} c on i.codice_cliente = c.codice_cliente
+)
+
+select
+    case when grouping(agenzia) = 0 then agenzia end as agenzia,
+    tipo_interazione,
+    count(*) as num_interazioni,
+    avg(durata_minuti) as durata_media,
+    avg(case when conversione then 1.0 else 0.0 end) * 100 as tasso_conversione
+
+from interazioni
+group by grouping sets ((tipo_interazione), (agenzia, tipo_interazione))
+order by agenzia nulls first, tipo_interazione
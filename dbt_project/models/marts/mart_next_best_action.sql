@@ -0,0 +1,104 @@
+{{
+    config(
+        materialized='table',
+        meta={'indexes': [{'columns': ['codice_cliente']}]}
+    )
+}}
+
+-- Top-k next best products per customer among the products they do not hold yet.
+-- Candidates are scored by the strongest co-holding confidence from a product the
+-- customer already holds; customers without a usable signal fall back to popularity.
+
+with customers as (
+    select
+        codice_cliente,
+        agenzia
+    from {{ ref('dim_customers') }}
+),
+
+holdings as (
+    select distinct
+        codice_cliente,
+        prodotto
+    from {{ ref('stg_polizze') }}
+    where stato_polizza = 'Attiva'
+),
+
+products as (
+    select
+        prodotto,
+        any_value(area_bisogno) as area_bisogno
+    from {{ ref('stg_polizze') }}
+    group by prodotto
+),
+
+popularity as (
+    select
+        prodotto,
+        count(*)::float / (select count(*) from customers) as popolarita
+    from holdings
+    group by prodotto
+),
+
+coholding as (
+    select * from {{ ref('int_product_coholding') }}
+),
+
+candidates as (
+    select
+        c.codice_cliente,
+        c.agenzia,
+        p.prodotto,
+        p.area_bisogno
+    from customers as c
+    cross join products as p
+    where not exists (
+        select 1
+        from holdings as h
+        where h.codice_cliente = c.codice_cliente and h.prodotto = p.prodotto
+    )
+),
+
+coholding_signal as (
+    select
+        cand.codice_cliente,
+        cand.prodotto,
+        max(co.confidenza) as confidenza,
+        arg_max(co.prodotto_posseduto, co.confidenza) as prodotto_trigger,
+        arg_max(co.lift, co.confidenza) as lift
+    from candidates as cand
+    inner join holdings as h on cand.codice_cliente = h.codice_cliente
+    inner join coholding as co
+        on h.prodotto = co.prodotto_posseduto and cand.prodotto = co.prodotto_candidato
+    group by cand.codice_cliente, cand.prodotto
+),
+
+scored as (
+    select
+        cand.codice_cliente,
+        cand.agenzia,
+        cand.prodotto,
+        cand.area_bisogno,
+        coalesce(s.confidenza, pop.popolarita, 0) as score,
+        s.prodotto_trigger,
+        s.lift,
+        case when s.confidenza is not null then 'Co-holding' else 'Popolarita' end as fonte
+    from candidates as cand
+    left join coholding_signal as s
+        on cand.codice_cliente = s.codice_cliente and cand.prodotto = s.prodotto
+    left join popularity as pop on cand.prodotto = pop.prodotto
+),
+
+ranked as (
+    select
+        *,
+        row_number() over (
+            partition by codice_cliente
+            order by score desc, prodotto
+        ) as rank_azione
+    from scored
+    qualify rank_azione <= {{ var('nba_top_k', 3) }}
+)
+
+select * from ranked
+order by agenzia, codice_cliente, rank_azione
@@ -0,0 +1,81 @@
+{{
+    config(
+        materialized='table'
+    )
+}}
+
+-- Per-policy competitive positioning of active policies against the competitor reference
+-- points of their need area (int_competitor_reference):
+-- - percentile of the policy's premium and massimale in the market-share weighted
+--   competitor distribution (0 = below every competitor, 1 = above every competitor)
+-- - gap to the premium the market would charge for the same massimale (market premium
+--   per euro of coverage times the policy's massimale)
+-- - percentile of the premium within our own book for the same product
+{% set tolerance = var('benchmark_tolerance', 0.1) %}
+
+with polizze as (
+    select
+        codice_cliente || '|' || prodotto || '|' || coalesce(data_emissione::varchar, '') as chiave_polizza,
+        codice_cliente,
+        prodotto,
+        area_bisogno,
+        agenzia,
+        zona_residenza,
+        premio_totale_annuo,
+        massimale
+    from {{ ref('fact_policies') }}
+    where stato_polizza = 'Attiva' and premio_totale_annuo is not null
+),
+
+riferimenti as (
+    select * from {{ ref('int_competitor_reference') }}
+),
+
+posizionamento as (
+    select
+        p.chiave_polizza,
+        count(r.competitor) as num_competitor,
+        sum(r.peso * r.premio_medio) as premio_mercato,
+        sum(r.peso * r.tasso_premio) as tasso_premio_mercato,
+        sum(case
+            when r.premio_medio < p.premio_totale_annuo then r.peso
+            when r.premio_medio = p.premio_totale_annuo then r.peso / 2
+            else 0
+        end) as percentile_premio_mercato,
+        sum(case
+            when r.massimale_medio < p.massimale then r.peso
+            when r.massimale_medio = p.massimale then r.peso / 2
+            else 0
+        end) as percentile_massimale_mercato
+    from polizze as p
+    inner join riferimenti as r on p.area_bisogno = r.tipo_prodotto
+    group by p.chiave_polizza
+),
+
+benchmark as (
+    select
+        p.*,
+        b.num_competitor,
+        b.premio_mercato,
+        b.percentile_premio_mercato,
+        b.percentile_massimale_mercato,
+        coalesce(p.massimale * b.tasso_premio_mercato, b.premio_mercato) as premio_atteso_mercato,
+        percent_rank() over (
+            partition by p.prodotto order by p.premio_totale_annuo
+        ) as percentile_premio_portafoglio
+    from polizze as p
+    left join posizionamento as b on p.chiave_polizza = b.chiave_polizza
+)
+
+select
+    *,
+    premio_totale_annuo - premio_atteso_mercato as gap_premio,
+    (premio_totale_annuo - premio_atteso_mercato) / nullif(premio_atteso_mercato, 0) as gap_premio_perc,
+    case
+        when premio_atteso_mercato is null then 'Nessun riferimento'
+        when premio_totale_annuo > premio_atteso_mercato * (1 + {{ tolerance }}) then 'Sopra mercato'
+        when premio_totale_annuo < premio_atteso_mercato * (1 - {{ tolerance }}) then 'Sotto mercato'
+        else 'In linea'
+    end as posizionamento_prezzo
+from benchmark
+order by prodotto, agenzia, codice_cliente
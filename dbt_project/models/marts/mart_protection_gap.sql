@@ -0,0 +1,58 @@
+{{
+    config(
+        materialized='table'
+    )
+}}
+
+-- Protection gap by area (grid cell of mart_geo_customers within a residence zone):
+-- how many customers and homes are exposed to theft and robbery risk without protection
+-- products or alarm systems.
+{% set cell = var('geo_cell_degrees', 0.05) %}
+
+with clienti as (
+    select * from {{ ref('mart_geo_customers') }}
+),
+
+abitazioni as (
+    select
+        cella_lat,
+        cella_lon,
+        zona_residenza,
+        count(*) as num_abitazioni,
+        count(case when not sistema_allarme then 1 end) as num_abitazioni_senza_allarme
+    from {{ ref('mart_geo_homes') }}
+    group by all
+),
+
+aree as (
+    select
+        cella_lat,
+        cella_lon,
+        zona_residenza,
+        (cella_lat + 0.5) * {{ cell }} as latitudine_centro,
+        (cella_lon + 0.5) * {{ cell }} as longitudine_centro,
+        count(*) as num_clienti,
+        count(case when num_prodotti_protezione = 0 then 1 end) as num_clienti_senza_protezione,
+        avg(probabilita_furti) as probabilita_furti_media,
+        avg(probabilita_rapine) as probabilita_rapine_media,
+        avg(valore_immobiliare_medio) as valore_immobiliare_medio
+    from clienti
+    group by all
+)
+
+select
+    a.*,
+    coalesce(h.num_abitazioni, 0) as num_abitazioni,
+    coalesce(h.num_abitazioni_senza_allarme, 0) as num_abitazioni_senza_allarme,
+    a.num_clienti_senza_protezione::float / a.num_clienti as quota_senza_protezione,
+
+    -- Expected theft or robbery events among unprotected customers
+    a.num_clienti_senza_protezione
+    * (a.probabilita_furti_media + a.probabilita_rapine_media) as indice_gap_protezione
+
+from aree as a
+left join abitazioni as h
+    on a.cella_lat = h.cella_lat
+    and a.cella_lon = h.cella_lon
+    and a.zona_residenza is not distinct from h.zona_residenza
+order by a.cella_lat, a.cella_lon, a.zona_residenza
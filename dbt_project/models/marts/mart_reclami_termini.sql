@@ -0,0 +1,39 @@
+{{
+    config(
+        materialized='table'
+    )
+}}
+
+-- Term statistics over the complaint text index: document frequency, total occurrences,
+-- customers mentioning the term and its BM25 inverse document frequency, used to rank
+-- search results and to surface complaint themes.
+
+with documenti as (
+    select id_reclamo, codice_cliente from {{ ref('int_reclami_documenti') }}
+),
+
+postings as (
+    select * from {{ ref('int_reclami_termini') }}
+),
+
+totale as (
+    select count(*) as num_reclami_totali from documenti
+),
+
+statistiche as (
+    select
+        p.termine,
+        count(distinct p.id_reclamo) as num_reclami,
+        count(*) as num_occorrenze,
+        count(distinct d.codice_cliente) as num_clienti
+    from postings as p
+    inner join documenti as d on p.id_reclamo = d.id_reclamo
+    group by p.termine
+)
+
+select
+    s.*,
+    ln((t.num_reclami_totali - s.num_reclami + 0.5) / (s.num_reclami + 0.5) + 1) as idf
+from statistiche as s
+cross join totale as t
+order by s.termine
@@ -0,0 +1,30 @@
+{{
+    config(
+        materialized='table'
+    )
+}}
+
+-- Renewal calendar: active policies stored in expiry date and agency order, so a date range
+-- (optionally for one agency) is answered from the row groups whose min/max statistics
+-- overlap it instead of a scan of the whole book. Nothing here depends on the current
+-- date; days to expiry are computed at query time (aida_challenge.renewals).
+
+select
+    codice_cliente || '|' || prodotto || '|' || coalesce(data_emissione::varchar, '') as chiave_polizza,
+    data_scadenza,
+    agenzia,
+    codice_cliente,
+    nome,
+    cognome,
+    zona_residenza,
+    prodotto,
+    area_bisogno,
+    canale_acquisizione,
+    data_emissione,
+    premio_totale_annuo,
+    loss_ratio,
+    margine_lordo
+from {{ ref('fact_policies') }}
+where stato_polizza = 'Attiva'
+    and data_scadenza is not null
+order by data_scadenza, agenzia, codice_cliente
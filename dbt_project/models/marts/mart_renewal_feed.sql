@@ -0,0 +1,51 @@
+{{
+    config(
+        materialized='incremental',
+        incremental_strategy='append'
+    )
+}}
+
+-- Daily feed of renewals for retention workflows. Every build appends, under today's
+-- data_feed (or var renewal_feed_date), the policies of mart_renewal_calendar that expire
+-- within the next var renewal_window_days (default 90) days and were not emitted yet for
+-- the same expiry date; a renewed policy with a new expiry date enters the feed again.
+-- Rows are appended in feed order, so polling the latest feed only reads the newest row
+-- groups. The first build emits every policy already in the window.
+{% set feed_date = var('renewal_feed_date', none) %}
+{% set window_days = var('renewal_window_days', 90) %}
+
+with feed as (
+    select
+        {% if feed_date %}'{{ feed_date }}'::date{% else %}current_date{% endif %} as data_feed
+),
+
+in_window as (
+    select
+        f.data_feed,
+        c.chiave_polizza,
+        c.data_scadenza,
+        c.agenzia,
+        c.codice_cliente,
+        c.prodotto::varchar as prodotto,
+        c.area_bisogno::varchar as area_bisogno,
+        c.premio_totale_annuo,
+        datediff('day', f.data_feed, c.data_scadenza) as giorni_alla_scadenza
+    from {{ ref('mart_renewal_calendar') }} as c
+    cross join feed as f
+    where c.data_scadenza >= f.data_feed
+        and c.data_scadenza <= f.data_feed + interval '{{ window_days }} days'
+)
+
+select
+    w.*,
+    current_timestamp as _dbt_loaded_at
+from in_window as w
+{% if is_incremental() %}
+    where not exists (
+        select 1
+        from {{ this }} as t
+        where t.chiave_polizza = w.chiave_polizza
+            and t.data_scadenza = w.data_scadenza
+    )
+{% endif %}
+order by w.data_feed, w.agenzia, w.data_scadenza
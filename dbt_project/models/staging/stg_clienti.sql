@@ -62,7 +62,7 @@ cleaned as (
         -- Activity
         "Data_Ultima_Visita" as data_ultima_visita,
         "Visite_Ultimo_Anno" as visite_ultimo_anno,
-        "Cluster_Risposta" as cluster_risposta
+        {{ categorical('"Cluster_Risposta"', 'cluster_risposta') }} as cluster_risposta
 
     from source
 )
@@ -12,10 +12,10 @@ cleaned as (
     select
         codice_cliente,
         "Data_Interazione" as data_interazione,
-        "Tipo_Interazione" as tipo_interazione,
-        "Motivo" as motivo,
+        {{ categorical('"Tipo_Interazione"', 'tipo_interazione') }} as tipo_interazione,
+        {{ categorical('"Motivo"', 'motivo') }} as motivo,
         "Durata_Minuti" as durata_minuti,
-        "Esito" as esito,
+        {{ categorical('"Esito"', 'esito') }} as esito,
         "Note" as note,
         "Conversione" as conversione
     from source
@@ -14,10 +14,10 @@ cleaned as (
         codice_cliente,
 
         -- Product info
-        "Prodotto" as prodotto,
-        "Area di Bisogno" as area_bisogno,
-        "Stato_Polizza" as stato_polizza,
-        "Canale_Acquisizione" as canale_acquisizione,
+        {{ categorical('"Prodotto"', 'prodotto') }} as prodotto,
+        {{ categorical('"Area di Bisogno"', 'area_bisogno') }} as area_bisogno,
+        {{ categorical('"Stato_Polizza"', 'stato_polizza') }} as stato_polizza,
+        {{ categorical('"Canale_Acquisizione"', 'canale_acquisizione') }} as canale_acquisizione,
 
         -- Dates
         "Data di Emissione" as data_emissione,
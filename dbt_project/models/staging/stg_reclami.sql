@@ -11,8 +11,8 @@ with source as (
 cleaned as (
     select
         codice_cliente,
-        "Prodotto" as prodotto,
-        "Area di Bisogno" as area_bisogno,
+        {{ categorical('"Prodotto"', 'prodotto') }} as prodotto,
+        {{ categorical('"Area di Bisogno"', 'area_bisogno') }} as area_bisogno,
         "Reclami_e_info" as reclami_e_info
     from source
     where reclami_e_info is not null  -- Filter out null complaints
@@ -11,12 +11,12 @@ with source as (
 cleaned as (
     select
         codice_cliente,
-        "Prodotto" as prodotto,
-        "Area di Bisogno" as area_bisogno,
+        {{ categorical('"Prodotto"', 'prodotto') }} as prodotto,
+        {{ categorical('"Area di Bisogno"', 'area_bisogno') }} as area_bisogno,
         "Sinistro" as sinistro,
         "Data_Sinistro" as data_sinistro,
         "Importo_Liquidato" as importo_liquidato,
-        "Stato_Liquidazione" as stato_liquidazione
+        {{ categorical('"Stato_Liquidazione"', 'stato_liquidazione') }} as stato_liquidazione
     from source
     where sinistro is not null  -- Filter out null claims
 )
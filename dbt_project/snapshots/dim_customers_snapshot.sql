@@ -0,0 +1,20 @@
+{% snapshot dim_customers_snapshot %}
+
+{{
+    config(
+        schema='snapshots',
+        unique_key='codice_cliente',
+        strategy='check',
+        check_cols='all',
+        hard_deletes='invalidate'
+    )
+}}
+
+-- History of dim_customers: a new version is stored only for customers whose attributes
+-- changed since the previous build. The load timestamp is left out, as it changes on
+-- every build, and
+-- categoricals are stored as VARCHAR (see macros/categorical.sql).
+select {{ without_enums(ref('dim_customers'), exclude=['_dbt_loaded_at']) }}
+from {{ ref('dim_customers') }}
+
+{% endsnapshot %}
@@ -0,0 +1,24 @@
+{% snapshot fact_policies_snapshot %}
+
+{{
+    config(
+        schema='snapshots',
+        unique_key='chiave_polizza',
+        strategy='check',
+        check_cols='all',
+        hard_deletes='invalidate'
+    )
+}}
+
+-- History of fact_policies: a new version is stored only for policies that changed since
+-- the previous build. Columns derived from the current date (days to expiry, expiry
+-- flags) and the load timestamp are left out, as they change on every build; derive them
+-- from the snapshot date instead.
+select
+    codice_cliente || '|' || prodotto || '|' || coalesce(data_emissione::varchar, '') as chiave_polizza,
+    {{ without_enums(ref('fact_policies'), exclude=[
+        '_dbt_loaded_at', 'giorni_dalla_emissione', 'giorni_alla_scadenza', 'scaduta', 'in_scadenza'
+    ]) }}
+from {{ ref('fact_policies') }}
+
+{% endsnapshot %}
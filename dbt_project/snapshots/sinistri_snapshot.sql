@@ -0,0 +1,22 @@
+{% snapshot sinistri_snapshot %}
+
+{{
+    config(
+        schema='snapshots',
+        unique_key='chiave_sinistro',
+        strategy='check',
+        check_cols=['importo_liquidato', 'stato_liquidazione'],
+        hard_deletes='invalidate'
+    )
+}}
+
+-- History of claim settlements: a new version is stored when a claim's settled amount or
+-- status changes. Each build therefore adds one evaluation of every open claim, which is
+-- what mart_claims_development turns into loss-development triangles.
+select
+    codice_cliente || '|' || prodotto || '|' || sinistro || '|' || coalesce(data_sinistro::varchar, '')
+        as chiave_sinistro,
+    {{ without_enums(ref('stg_sinistri')) }}
+from {{ ref('stg_sinistri') }}
+
+{% endsnapshot %}
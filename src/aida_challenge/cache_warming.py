@@ -0,0 +1,162 @@
+"""Post-build cache warming for the dashboard and the customer lookups.
+
+Right after a build the first dashboard session computes every query against a cold
+database file. ``warm-caches``, which ``dbt-build`` and ``dbt-publish`` run once a build
+succeeds, does that work ahead:
+
+- the dashboard's registered queries (``dashboard_queries`` and ``chart_queries`` in
+  ``aida_challenge.serving``) are computed for the common filter combinations, i.e.
+  the initial state of the company-wide view, of every agency and of every customer
+  cluster, into the serving cache stored next to the published database;
+- the columns read by the dashboard and by ``customer_lookup`` (``HOT_COLUMNS``) are
+  read once, so their pages are in the operating system's file cache when the first
+  query comes in.
+"""
+
+import argparse
+import time
+from collections import defaultdict
+from functools import partial
+from pathlib import Path
+
+import duckdb
+
+from aida_challenge import serving
+from aida_challenge.publishing import current_db_path
+
+# Columns read on every dashboard run or lookup (None: every column of the table), in
+# priority order: the dashboard's hot replica copies them into memory in this order
+HOT_COLUMNS: dict[str, list[str] | None] = {
+    "main_marts.dim_customers": [
+        "codice_cliente",
+        "agenzia",
+        "eta",
+        "reddito",
+        "professione",
+        "luogo_residenza",
+        "latitudine",
+        "longitudine",
+        "cluster_risposta",
+        "engagement_score",
+        "churn_probability",
+        "clv_stimato",
+        "satisfaction_score",
+        "num_polizze",
+        "anzianita_compagnia",
+        "visite_ultimo_anno",
+    ],
+    "main_marts.fact_policies": [
+        "codice_cliente",
+        "agenzia",
+        "prodotto",
+        "area_bisogno",
+        "premio_totale_annuo",
+        "stato_polizza",
+        "canale_acquisizione",
+        "loss_ratio",
+        "margine_lordo",
+        "data_emissione",
+        "data_scadenza",
+    ],
+    "main_marts.mart_benchmark_distribution": None,
+    "main_marts.mart_interaction_summary": None,
+    "main_segmentation.segment_profiles": None,
+    "main_marts.mart_customer_360": None,
+}
+
+
+def warm_dashboard_queries(
+    db_path: Path, max_workers: int = 8
+) -> tuple[list[tuple[str, float]], int]:
+    """Compute the dashboard queries of the common filter combinations.
+
+    Returns the (query name, seconds) pairs of the computed queries and the number of
+    queries that were already in the serving cache.
+    """
+    with duckdb.connect(str(db_path), read_only=True) as con:
+        agencies = [None, *serving.load_agencies(con)]
+    queries = [partial(serving.load_agencies)]
+    for agenzia in agencies:
+        queries += serving.dashboard_queries(agenzia)
+    timings, cached = serving.warm_serving_cache(db_path, queries, max_workers)
+
+    # The chart filters of a new session depend on the customers loaded above
+    queries = []
+    for agenzia in agencies:
+        customers = serving.cached_result(db_path, serving.load_customer_demographics, (agenzia,))
+        if customers.empty:
+            continue
+        filters = serving.default_chart_filters(agenzia, customers)
+        queries += serving.chart_queries(filters)
+        if agenzia is None:
+            for cluster in sorted(customers["cluster"].dropna().unique().tolist()):
+                queries += serving.chart_queries({**filters, "cluster": cluster})
+    chart_timings, chart_cached = serving.warm_serving_cache(db_path, queries, max_workers)
+    return timings + chart_timings, cached + chart_cached
+
+
+def warm_hot_columns(con: duckdb.DuckDBPyConnection) -> list[tuple[str, int, float]]:
+    """Read the hot mart columns once; returns (table, columns, seconds) per table read."""
+    results = []
+    for table, columns in HOT_COLUMNS.items():
+        schema, name = table.split(".")
+        existing = [
+            row[0]
+            for row in con.execute(
+                """
+                SELECT column_name FROM information_schema.columns
+                WHERE table_schema = ? AND table_name = ?
+                """,
+                [schema, name],
+            ).fetchall()
+        ]
+        if not existing:
+            continue
+        columns = [c for c in columns or existing if c in existing]
+        start = time.perf_counter()
+        # Hashing every value makes DuckDB read each column in full
+        aggregates = ", ".join(f'bit_xor(hash("{c}"))' for c in columns)
+        con.execute(f"SELECT {aggregates} FROM aida_challenge.{table}").fetchall()
+        results.append((table, len(columns), time.perf_counter() - start))
+    return results
+
+
+def warm_caches(max_workers: int = 8) -> int:
+    """Warm the serving cache and the hot mart columns of the published database."""
+    db_path = current_db_path()
+    print(f"Warming caches of {db_path}")
+    start = time.perf_counter()
+
+    query_start = time.perf_counter()
+    timings, cached = warm_dashboard_queries(db_path, max_workers)
+    print(
+        f"  Dashboard queries: {len(timings)} computed, {cached} already cached "
+        f"in {time.perf_counter() - query_start:.2f}s"
+    )
+    per_query: dict[str, list[float]] = defaultdict(list)
+    for name, seconds in timings:
+        per_query[name].append(seconds)
+    for name, seconds in sorted(per_query.items()):
+        print(f"    {name:<30} {len(seconds):>4} x {sum(seconds) / len(seconds):.3f}s")
+
+    con = duckdb.connect(str(db_path), read_only=True)
+    column_start = time.perf_counter()
+    tables = warm_hot_columns(con)
+    con.close()
+    print(
+        f"  Hot columns: {sum(n for _, n, _ in tables)} columns of {len(tables)} tables "
+        f"in {time.perf_counter() - column_start:.2f}s"
+    )
+    for table, n, seconds in tables:
+        print(f"    {table:<40} {n:>3} columns {seconds:.3f}s")
+
+    print(f"[OK] Caches warmed in {time.perf_counter() - start:.2f}s")
+    return 0
+
+
+def warm_caches_command() -> int:
+    """Warm the dashboard's serving cache and the hot mart columns after a build."""
+    parser = argparse.ArgumentParser(description=warm_caches_command.__doc__)
+    parser.add_argument("--workers", type=int, default=8, help="concurrent dashboard queries")
+    args = parser.parse_args()
+    return warm_caches(args.workers)
@@ -0,0 +1,124 @@
+"""Keyword and phrase search over the complaint text index.
+
+The complaint text (``reclami.Reclami_e_info``) is tokenized once per build into the
+inverted index ``main_intermediate.int_reclami_termini`` (one posting per token and
+position), with term statistics in ``main_marts.mart_reclami_termini``. Searches here only
+read the postings of the query terms instead of scanning every complaint with ``LIKE``.
+
+Keyword searches rank complaints with a tf-idf score; phrase searches match the query
+terms at consecutive positions. Results carry ``codice_cliente`` so they can be joined to
+the customer marts.
+"""
+
+import duckdb
+import pandas as pd
+
+from aida_challenge.publishing import shared_connection
+
+DOCUMENTS_TABLE = "aida_challenge.main_intermediate.int_reclami_documenti"
+POSTINGS_TABLE = "aida_challenge.main_intermediate.int_reclami_termini"
+TERMS_TABLE = "aida_challenge.main_marts.mart_reclami_termini"
+
+# Same tokenizer as the dbt macro tokenize_text, applied to the query parameter
+_TOKENIZE_SQL = (
+    "list_filter(regexp_split_to_array(lower(strip_accents(?)), '[^a-z0-9]+'), "
+    "lambda t: t <> '')"
+)
+
+_RESULT_COLUMNS = "d.id_reclamo, d.codice_cliente, d.prodotto, d.area_bisogno, d.reclami_e_info"
+
+
+def search_complaints(
+    query: str,
+    match_all: bool = True,
+    limit: int = 100,
+    con: duckdb.DuckDBPyConnection | None = None,
+) -> pd.DataFrame:
+    """Return the complaints matching the query keywords, best match first.
+
+    With ``match_all`` a complaint must contain every keyword, otherwise any of them.
+    """
+    con = con or shared_connection().cursor()
+    having = "HAVING count(*) = (SELECT count(*) FROM query_terms)" if match_all else ""
+    return con.execute(
+        f"""
+        WITH query_terms AS (
+            SELECT DISTINCT unnest({_TOKENIZE_SQL}) AS termine
+        ),
+        scores AS (
+            SELECT p.id_reclamo, sum(p.tf * t.idf) AS score
+            FROM (
+                SELECT id_reclamo, termine, count(*) AS tf
+                FROM {POSTINGS_TABLE}
+                WHERE termine IN (SELECT termine FROM query_terms)
+                GROUP BY id_reclamo, termine
+            ) AS p
+            JOIN {TERMS_TABLE} AS t ON p.termine = t.termine
+            GROUP BY p.id_reclamo
+            {having}
+        )
+        SELECT {_RESULT_COLUMNS}, s.score
+        FROM scores AS s
+        JOIN {DOCUMENTS_TABLE} AS d ON s.id_reclamo = d.id_reclamo
+        ORDER BY s.score DESC, d.id_reclamo
+        LIMIT ?
+    """,
+        [query, limit],
+    ).df()
+
+
+def search_phrase(
+    phrase: str, limit: int = 100, con: duckdb.DuckDBPyConnection | None = None
+) -> pd.DataFrame:
+    """Return the complaints containing the exact phrase, most occurrences first."""
+    con = con or shared_connection().cursor()
+    return con.execute(
+        f"""
+        WITH phrase AS (
+            SELECT {_TOKENIZE_SQL} AS termini
+        ),
+        phrase_terms AS (
+            SELECT unnest(termini) AS termine, generate_subscripts(termini, 1) AS posizione_frase
+            FROM phrase
+        ),
+        -- A phrase occurrence is a start position where every term sits at its phrase position
+        occurrences AS (
+            SELECT p.id_reclamo, p.posizione - q.posizione_frase AS inizio
+            FROM {POSTINGS_TABLE} AS p
+            JOIN phrase_terms AS q ON p.termine = q.termine
+            GROUP BY p.id_reclamo, inizio
+            HAVING count(DISTINCT q.posizione_frase) = (SELECT len(termini) FROM phrase)
+        ),
+        matches AS (
+            SELECT id_reclamo, count(*) AS occorrenze
+            FROM occurrences
+            GROUP BY id_reclamo
+        )
+        SELECT {_RESULT_COLUMNS}, m.occorrenze
+        FROM matches AS m
+        JOIN {DOCUMENTS_TABLE} AS d ON m.id_reclamo = d.id_reclamo
+        ORDER BY m.occorrenze DESC, d.id_reclamo
+        LIMIT ?
+    """,
+        [phrase, limit],
+    ).df()
+
+
+def top_terms(
+    limit: int = 50, min_length: int = 4, con: duckdb.DuckDBPyConnection | None = None
+) -> pd.DataFrame:
+    """Return the terms found in the most complaints, as a quick view of complaint themes.
+
+    Terms shorter than ``min_length`` (mostly articles and prepositions) are left out.
+    """
+    con = con or shared_connection().cursor()
+    return con.execute(
+        f"""
+        SELECT termine, num_reclami, num_occorrenze, num_clienti, idf
+        FROM {TERMS_TABLE}
+        WHERE length(termine) >= ?
+        ORDER BY num_reclami DESC, termine
+        LIMIT ?
+    """,
+        [min_length, limit],
+    ).df()
@@ -0,0 +1,231 @@
+"""Customer 360 point-lookup service.
+
+Profiles are served from ``main_marts.mart_customer_360``, which stores one row per
+customer (with policies, claims, complaints, homes and recent interactions nested as
+lists) sorted by ``codice_cliente`` and backed by a unique index. Equality and IN-list
+lookups are answered through the index, which DuckDB picks when the query runs: plain
+``EXPLAIN`` shows a sequential scan, ``EXPLAIN ANALYZE`` shows the index scan. An IN list
+of consecutive ids becomes a range filter instead, which the sort order confines to the
+row group holding them. Frequently requested customers are kept in an
+in-process LRU cache. Cached profiles are shared between callers, so they are returned as
+read-only mappings, with the nested lists as tuples.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any
+
+import duckdb
+
+from aida_challenge.publishing import current_db_path
+
+PROFILE_TABLE = "aida_challenge.main_marts.mart_customer_360"
+DEFAULT_CACHE_SIZE = 10_000
+
+# p99 latency target of a lookup read from the database
+TARGET_P99_MS = 10
+
+Profile = Mapping[str, Any]
+
+
+def _freeze(value: Any) -> Any:
+    """Return the value with its dicts as read-only mappings and its lists as tuples."""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+class CustomerLookup:
+    """Fetch Customer 360 profiles by ``codice_cliente``.
+
+    Instances can be shared between threads: every thread queries through its own
+    DuckDB cursor and the hot-key cache is guarded by a lock.
+    """
+
+    def __init__(self, db_path: str | Path | None = None, cache_size: int = DEFAULT_CACHE_SIZE):
+        self.db_path = Path(db_path) if db_path else current_db_path()
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._con = duckdb.connect(str(self.db_path), read_only=True)
+        self._local = threading.local()
+        self._cache: OrderedDict[int, Profile] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cursor(self) -> duckdb.DuckDBPyConnection:
+        """Return this thread's cursor, creating it on first use."""
+        cursor = getattr(self._local, "cursor", None)
+        if cursor is None:
+            cursor = self._con.cursor()
+            self._local.cursor = cursor
+        return cursor
+
+    def _fetch(self, ids: list[int]) -> dict[int, Profile]:
+        """Read profiles for uncached ids from the database."""
+        cursor = self._cursor()
+        if len(ids) == 1:
+            cursor.execute(f"SELECT * FROM {PROFILE_TABLE} WHERE codice_cliente = ?", ids)
+        else:
+            # An IN list of parameters is pushed down to the index / zone maps, unlike a
+            # subquery or a list parameter
+            placeholders = ", ".join("?" * len(ids))
+            cursor.execute(
+                f"SELECT * FROM {PROFILE_TABLE} WHERE codice_cliente IN ({placeholders})", ids
+            )
+        columns = [d[0] for d in cursor.description]
+        key = columns.index("codice_cliente")
+        return {row[key]: _freeze(dict(zip(columns, row))) for row in cursor.fetchall()}
+
+    def get_profiles(self, ids: list[int]) -> dict[int, Profile]:
+        """Return the profiles of the given customers, keyed by ``codice_cliente``.
+
+        Unknown customers are left out of the result. The profiles are read-only; copy one
+        with ``dict(profile)`` to modify it.
+        """
+        profiles = {}
+        missing = []
+        with self._lock:
+            for codice_cliente in dict.fromkeys(ids):
+                profile = self._cache.get(codice_cliente)
+                if profile is None:
+                    missing.append(codice_cliente)
+                    continue
+                self._cache.move_to_end(codice_cliente)
+                profiles[codice_cliente] = profile
+            self.hits += len(profiles)
+            self.misses += len(missing)
+
+        if missing:
+            fetched = self._fetch(missing)
+            profiles.update(fetched)
+            with self._lock:
+                self._cache.update(fetched)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return profiles
+
+    def get_profile(self, codice_cliente: int) -> Profile | None:
+        """Return one customer's profile, or None if the customer does not exist."""
+        return self.get_profiles([codice_cliente]).get(codice_cliente)
+
+    def reload(self) -> bool:
+        """Switch to the currently published database version if it changed.
+
+        Returns True when the connection was reopened (and the cache cleared).
+        """
+        db_path = current_db_path()
+        if db_path == self.db_path:
+            return False
+        self.close()
+        self.db_path = db_path
+        self._con = duckdb.connect(str(db_path), read_only=True)
+        self._local = threading.local()
+        return True
+
+    def clear_cache(self) -> None:
+        """Drop all cached profiles."""
+        with self._lock:
+            self._cache.clear()
+
+    def close(self) -> None:
+        """Close the database connection and drop the cache."""
+        self.clear_cache()
+        self._con.close()
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    """Return the pct-th percentile (nearest rank) of the values."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def _run_phase(
+    lookup: CustomerLookup, name: str, batches: list[list[int]], threads: int
+) -> list[float]:
+    """Time every lookup of one benchmark phase and print a summary line."""
+
+    def timed(batch: list[int]) -> float:
+        start = time.perf_counter()
+        lookup.get_profiles(batch)
+        return (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        latencies = list(pool.map(timed, batches))
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"{name:<8} requests={len(latencies):,}  "
+        f"p50={statistics.median(latencies):.2f} ms  "
+        f"p95={_percentile(latencies, 95):.2f} ms  "
+        f"p99={_percentile(latencies, 99):.2f} ms  "
+        f"throughput={len(latencies) / elapsed:,.0f} req/s"
+    )
+    return latencies
+
+
+def benchmark_lookup() -> int:
+    """Benchmark Customer 360 lookup latency under concurrent load."""
+    parser = argparse.ArgumentParser(description=benchmark_lookup.__doc__)
+    parser.add_argument("--requests", type=int, default=2000, help="lookups per phase")
+    parser.add_argument("--threads", type=int, default=8, help="concurrent clients")
+    parser.add_argument("--batch-size", type=int, default=1, help="customers per lookup")
+    parser.add_argument("--hot-keys", type=int, default=500, help="distinct customers requested")
+    args = parser.parse_args()
+
+    db_path = current_db_path()
+    if not db_path.exists():
+        print(f"ERROR: Database not found at: {db_path}")
+        print("Run 'uv run dbt-build' first to create the marts.")
+        return 1
+
+    lookup = CustomerLookup(db_path)
+    ids = [
+        row[0]
+        for row in lookup._cursor()
+        .execute(
+            f"SELECT codice_cliente FROM {PROFILE_TABLE} "
+            f"USING SAMPLE reservoir({int(args.hot_keys)} ROWS)"
+        )
+        .fetchall()
+    ]
+    if not ids:
+        print(f"ERROR: {PROFILE_TABLE} is empty.")
+        return 1
+
+    batches = [random.choices(ids, k=args.batch_size) for _ in range(args.requests)]
+    print(f"Benchmarking {PROFILE_TABLE} in: {db_path}")
+    print(
+        f"{args.requests:,} lookups per phase, {args.threads} threads, "
+        f"batch size {args.batch_size}, {len(ids):,} distinct customers\n"
+    )
+
+    _run_phase(lookup, "cold", batches, args.threads)
+    _run_phase(lookup, "warm", batches, args.threads)
+    lookup.clear_cache()
+    lookup.cache_size = 0
+    # Every lookup of this phase reads the database, so it is the one held to the target
+    uncached = _run_phase(lookup, "nocache", batches, args.threads)
+
+    print(f"\nCache hit rate: {lookup.hits / max(lookup.hits + lookup.misses, 1):.1%}")
+    target_met = _percentile(uncached, 99) < TARGET_P99_MS
+    print(
+        f"[{'OK' if target_met else 'WARN'}] Uncached p99 "
+        f"{'within' if target_met else 'above'} {TARGET_P99_MS} ms"
+    )
+    cpus = os.cpu_count() or 1
+    if args.threads > cpus:
+        print(f"{args.threads} threads share {cpus} CPU(s): latencies include queueing.")
+    lookup.close()
+    return 0
@@ -0,0 +1,404 @@
+"""Long-lived local daemon keeping the command-line entry points warm.
+
+Every ``uv run`` entry point starts a new interpreter, and the dbt commands spawn a new
+``dbt`` process that parses the whole project before doing any work. ``aida-daemon``
+starts once and keeps the entry point modules imported, dbt loaded with the parsed
+manifest and a DuckDB connection to the published database open (the working database is
+only opened per query, so builds in other processes are not locked out). ``aida <command>``
+sends a command to it over a local socket and prints its output:
+
+    uv run aida-daemon &
+    uv run aida dbt-test --select staging
+    uv run aida query "SELECT count(*) FROM aida_challenge.main_marts.dim_customers"
+
+In the daemon, dbt runs in-process through ``dbtRunner`` with the cached manifest, which
+is parsed again only when a file of the dbt project changes. Commands run one at a time.
+Without a running daemon, ``aida`` runs the command in its own process instead.
+
+This module only imports the standard library at the top, so the ``aida`` client itself
+starts quickly; ``benchmark-startup`` measures cold and warm start times.
+"""
+
+import argparse
+import contextlib
+import gc
+import importlib
+import io
+import json
+import os
+import secrets
+import statistics
+import subprocess
+import sys
+import time
+import tomllib
+from collections.abc import Callable
+from multiprocessing.connection import Client, Connection, Listener
+from pathlib import Path
+from typing import Any
+
+ROOT = Path(__file__).parent.parent.parent
+DAEMON_FILE = ROOT / "data" / "daemon.json"
+DBT_PROJECT_DIR = ROOT / "dbt_project"
+DEFAULT_PORT = 8766
+
+# Entry points that serve or loop forever, or belong to the daemon itself
+NOT_SERVED = {
+    "aida",
+    "aida-daemon",
+    "benchmark-startup",
+    "explore-db",
+    "dbt-docs-serve",
+    "serve-exports",
+}
+
+# dbt project files whose changes require parsing the manifest again
+_DBT_PROJECT_FILES = ["dbt_project.yml", "packages.yml", "profiles.yml"]
+_DBT_PROJECT_DIRS = ["models", "macros", "snapshots", "tests", "seeds", "analyses"]
+
+
+def entry_points() -> dict[str, str]:
+    """Return the project's entry points as ``{name: "module:function"}``."""
+    with open(ROOT / "pyproject.toml", "rb") as f:
+        scripts = tomllib.load(f)["project"]["scripts"]
+    return {name: target for name, target in scripts.items() if name not in NOT_SERVED}
+
+
+def _load_entry_point(target: str) -> Callable[[], int | None]:
+    """Import and return the function of a ``module:function`` entry point."""
+    module, function = target.split(":")
+    return getattr(importlib.import_module(module), function)
+
+
+def _run_entry_point(name: str, args: list[str]) -> int:
+    """Run an entry point as if called from the command line with args."""
+    targets = entry_points()
+    if name not in targets:
+        print(f"ERROR: Unknown command '{name}'. Available: {', '.join(sorted(targets))}")
+        return 1
+    argv, cwd = sys.argv, os.getcwd()
+    sys.argv = [name, *args]
+    try:
+        return _load_entry_point(targets[name])() or 0
+    except SystemExit as e:
+        # argparse exits on --help and on invalid arguments
+        return e.code if isinstance(e.code, int) else 0 if e.code is None else 1
+    finally:
+        sys.argv = argv
+        os.chdir(cwd)
+
+
+class WarmState:
+    """Modules, parsed dbt manifest and DuckDB connection kept by the daemon."""
+
+    def __init__(self) -> None:
+        for target in entry_points().values():
+            _load_entry_point(target)
+
+        from dbt.cli.main import dbtRunner
+
+        from aida_challenge import dbt_commands
+
+        self._runner_class = dbtRunner
+        self.manifest: Any = None
+        self._fingerprint: tuple[int, float] | None = None
+        self.con: Any = None
+        self._con_path: Path | None = None
+        self.parse_manifest()
+        self.connection()
+        self.release_connection()
+        dbt_commands.set_dbt_runner(self.run_dbt)
+
+    def _project_fingerprint(self) -> tuple[int, float]:
+        """Return the number and latest modification time of the dbt project files."""
+        paths = [DBT_PROJECT_DIR / name for name in _DBT_PROJECT_FILES]
+        for directory in _DBT_PROJECT_DIRS:
+            paths += (DBT_PROJECT_DIR / directory).rglob("*")
+        mtimes = [p.stat().st_mtime for p in paths if p.is_file()]
+        return len(mtimes), max(mtimes, default=0.0)
+
+    def parse_manifest(self) -> None:
+        """Parse the dbt project, keeping the manifest for later commands."""
+        from aida_challenge.dbt_commands import get_dbt_args
+
+        cwd = os.getcwd()
+        os.chdir(DBT_PROJECT_DIR)
+        try:
+            result = self._runner_class().invoke(["parse", *get_dbt_args(), "--quiet"])
+        finally:
+            os.chdir(cwd)
+        if not result.success:
+            raise RuntimeError(f"dbt parse failed: {result.exception}")
+        self.manifest = result.result
+        self._fingerprint = self._project_fingerprint()
+
+    def connection(self) -> Any:
+        """Return the open read-only connection, following newly published versions.
+
+        Published versions are never written again, so their connection stays open. The
+        working database is written by builds in other processes, which a connection held
+        here would lock out, so callers close it after use (see ``release_connection``).
+        """
+        import duckdb
+
+        from aida_challenge.publishing import current_db_path
+
+        db_path = current_db_path()
+        if self.con is None or db_path != self._con_path:
+            self.close_connection()
+            if db_path.exists():
+                self.con = duckdb.connect(str(db_path), read_only=True)
+                self._con_path = db_path
+        return self.con
+
+    def release_connection(self) -> None:
+        """Close the connection unless it is to a published version."""
+        from aida_challenge.publishing import working_db_path
+
+        if self._con_path == working_db_path():
+            self.close_connection()
+
+    def close_connection(self) -> None:
+        """Close the DuckDB connection, e.g. before dbt writes to the same file."""
+        if self.con is not None:
+            self.con.close()
+        self.con = None
+        self._con_path = None
+
+    def run_dbt(self, command: list[str], env: dict[str, str]) -> int:
+        """Run a dbt command in-process with the cached manifest."""
+        from dbt.adapters.duckdb.connections import DuckDBConnectionManager
+
+        if self._project_fingerprint() != self._fingerprint:
+            print("dbt project changed, parsing it again...")
+            self.parse_manifest()
+
+        # DuckDB refuses a read-write connection while this process holds a read-only one
+        self.close_connection()
+        previous = {key: os.environ.get(key) for key in env}
+        os.environ.update(env)
+        try:
+            result = self._runner_class(manifest=self.manifest).invoke(command)
+        finally:
+            # dbt-duckdb keeps its database open between commands; release the file lock
+            DuckDBConnectionManager.close_all_connections()
+            gc.collect()
+            for key, value in previous.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+        if result.exception is not None:
+            print(f"ERROR: {result.exception}")
+            return 2
+        return 0 if result.success else 1
+
+    def query(self, sql: str) -> int:
+        """Print the result of a SQL query on the published database."""
+        import duckdb
+
+        con = self.connection()
+        if con is None:
+            print("ERROR: Database not found. Run 'uv run load-raw-data' first.")
+            return 1
+        try:
+            con.sql(sql).show(max_rows=100)
+        except duckdb.Error as e:
+            print(f"ERROR: {e}")
+            return 1
+        finally:
+            self.release_connection()
+        return 0
+
+    def handle(self, request: dict[str, Any]) -> dict[str, Any]:
+        """Run one client request and return its exit code and captured output."""
+        output = io.StringIO()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+            try:
+                if request["command"] == "query":
+                    code = self.query(" ".join(request["args"]))
+                else:
+                    code = _run_entry_point(request["command"], request["args"])
+            except Exception as e:  # noqa: BLE001 - a failing command must not stop the daemon
+                print(f"ERROR: {type(e).__name__}: {e}")
+                code = 1
+        return {"code": code, "output": output.getvalue(), "seconds": time.perf_counter() - start}
+
+
+def _daemon_address() -> tuple[tuple[str, int], bytes] | None:
+    """Return the address and key of the running daemon, if any."""
+    if not DAEMON_FILE.exists():
+        return None
+    info = json.loads(DAEMON_FILE.read_text(encoding="utf-8"))
+    return ("127.0.0.1", info["port"]), bytes.fromhex(info["authkey"])
+
+
+def _connect_daemon() -> Connection | None:
+    """Connect to the running daemon, or return None if it is not running."""
+    address = _daemon_address()
+    if address is None:
+        return None
+    try:
+        return Client(address[0], authkey=address[1])
+    except OSError:
+        return None
+
+
+def daemon_running() -> bool:
+    """Return whether a daemon is running and answering requests."""
+    conn = _connect_daemon()
+    if conn is None:
+        return False
+    with conn:
+        conn.send({"command": "__ping__"})
+        return conn.recv()["code"] == 0
+
+
+def aida() -> int:
+    """Run a project command through the warm daemon, or in this process without one."""
+    argv = sys.argv[1:]
+    cold = bool(argv) and argv[0] == "--cold"
+    if cold:
+        argv = argv[1:]
+    if not argv or argv[0] in ("-h", "--help"):
+        print("usage: aida [--cold] <command> [args...]\n")
+        print("Commands: query <sql>, " + ", ".join(sorted(entry_points())))
+        return 0
+
+    conn = None if cold else _connect_daemon()
+    if conn is None:
+        if argv[0] == "query":
+            print("ERROR: 'query' needs a running daemon. Start it with 'uv run aida-daemon'.")
+            return 1
+        return _run_entry_point(argv[0], argv[1:])
+
+    with conn:
+        conn.send({"command": argv[0], "args": argv[1:]})
+        response = conn.recv()
+    print(response["output"], end="")
+    return response["code"]
+
+
+def aida_daemon() -> int:
+    """Start the CLI daemon, or stop the running one."""
+    parser = argparse.ArgumentParser(description=aida_daemon.__doc__)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--stop", action="store_true", help="stop the running daemon")
+    args = parser.parse_args()
+
+    if args.stop:
+        conn = _connect_daemon()
+        if conn is None:
+            print("WARNING: No daemon is running.")
+            return 0
+        with conn:
+            conn.send({"command": "__stop__"})
+        print("[OK] Daemon stopped")
+        return 0
+    if daemon_running():
+        print(f"ERROR: A daemon is already running (see {DAEMON_FILE}).")
+        return 1
+
+    start = time.perf_counter()
+    print("Starting daemon: importing modules, parsing the dbt project...")
+    state = WarmState()
+    authkey = secrets.token_bytes(32)
+    listener = Listener(("127.0.0.1", args.port), authkey=authkey)
+
+    DAEMON_FILE.parent.mkdir(parents=True, exist_ok=True)
+    # The key is never readable by other users: the file is created owner-only, then
+    # moved into place (an existing file would keep its permissions if rewritten)
+    tmp_file = DAEMON_FILE.with_suffix(".tmp")
+    tmp_file.unlink(missing_ok=True)
+    fd = os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with open(fd, "w", encoding="utf-8") as f:
+        json.dump({"port": args.port, "authkey": authkey.hex(), "pid": os.getpid()}, f)
+    os.replace(tmp_file, DAEMON_FILE)
+    print(f"[OK] Daemon ready on port {args.port} in {time.perf_counter() - start:.2f}s")
+
+    try:
+        while True:
+            try:
+                conn = listener.accept()
+            except (OSError, EOFError):
+                # Failed handshake, e.g. a client with a stale key
+                continue
+            with conn:
+                try:
+                    request = conn.recv()
+                except (OSError, EOFError):
+                    continue
+                if request["command"] == "__stop__":
+                    break
+                if request["command"] == "__ping__":
+                    conn.send({"code": 0})
+                    continue
+                response = state.handle(request)
+                try:
+                    conn.send(response)
+                except OSError:
+                    # The client went away before the command finished
+                    continue
+                print(
+                    f"{request['command']} {' '.join(request['args'])}: "
+                    f"exit {response['code']} in {response['seconds']:.2f}s"
+                )
+    except KeyboardInterrupt:
+        pass
+    finally:
+        listener.close()
+        state.close_connection()
+        DAEMON_FILE.unlink(missing_ok=True)
+    print("[OK] Daemon stopped")
+    return 0
+
+
+def _time_runs(command: list[str], runs: int) -> list[float]:
+    """Return the wall-clock seconds of each run of a command in a new process."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run(command, cwd=ROOT, capture_output=True, check=False)
+        timings.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            # A failing command usually exits early, which would make its timing meaningless
+            print(f"WARNING: Run exited with code {result.returncode}, timings are unreliable")
+    return timings
+
+
+def benchmark_startup() -> int:
+    """Benchmark entry point import times and cold versus daemon command start times."""
+    parser = argparse.ArgumentParser(description=benchmark_startup.__doc__)
+    parser.add_argument("--runs", type=int, default=3, help="runs per measurement")
+    parser.add_argument(
+        "command",
+        nargs="*",
+        default=["dbt-test", "--select", "stg_clienti"],
+        help="command to time cold and through the daemon",
+    )
+    args = parser.parse_args()
+
+    python = [sys.executable, "-c"]
+    print(f"Import time per entry point module (median of {args.runs} new processes):")
+    baseline = statistics.median(_time_runs([*python, "pass"], args.runs))
+    print(f"  {'(interpreter only)':<36} {baseline * 1000:8.0f} ms")
+    for module in sorted({target.split(":")[0] for target in entry_points().values()}):
+        timings = _time_runs([*python, f"import {module}"], args.runs)
+        print(f"  {module:<36} {(statistics.median(timings) - baseline) * 1000:8.0f} ms")
+
+    client = "import sys; from aida_challenge.daemon import aida; sys.argv = {}; sys.exit(aida())"
+    print(f"\nCommand: {' '.join(args.command)}")
+    cold = statistics.median(
+        _time_runs([*python, client.format(["aida", "--cold", *args.command])], args.runs)
+    )
+    print(f"  cold    {cold:8.2f} s")
+
+    if not daemon_running():
+        print("  daemon  not running, start it with 'uv run aida-daemon' to compare")
+        return 0
+    warm = statistics.median(
+        _time_runs([*python, client.format(["aida", *args.command])], args.runs)
+    )
+    print(f"  daemon  {warm:8.2f} s  ({cold / warm:.1f}x faster)")
+    return 0
@@ -0,0 +1,398 @@
+"""Single-pass data-quality checks over the tests declared in the dbt project.
+
+``dbt test`` runs every ``unique``, ``not_null``, ``relationships`` (and dbt_utils) test as
+its own query, rescanning the same table once per test. This engine reads the tests from
+the dbt manifest (``dbt_project/target/manifest.json``), groups them by tested table and
+evaluates all of a table's tests as filtered aggregates of one query, so every table is
+scanned once. ``relationships`` tests look up the parent keys through a subquery.
+
+The same query profiles the table (row count, and null fraction, mean and standard
+deviation of every column), which is compared with the profile stored by the previous run:
+
+- ``row_count_anomaly``: the row count changed by more than ``--row-count-tolerance``
+- ``distribution_drift``: a numeric column's mean moved by more than ``--drift-threshold``
+  standard deviations, or a column's null fraction by more than ``--null-drift``
+
+Statistical checks only warn. Results are written per check to
+``main_quality.check_results`` and profiles to ``main_quality.column_profiles``.
+"""
+
+import argparse
+import json
+import re
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+import duckdb
+
+from aida_challenge.publishing import ROOT, working_db_path
+
+MANIFEST_PATH = ROOT / "dbt_project" / "target" / "manifest.json"
+QUALITY_SCHEMA = "aida_challenge.main_quality"
+RESULTS_TABLE = f"{QUALITY_SCHEMA}.check_results"
+PROFILES_TABLE = f"{QUALITY_SCHEMA}.column_profiles"
+
+DEFAULT_ROW_COUNT_TOLERANCE = 0.2
+DEFAULT_DRIFT_THRESHOLD = 0.5
+DEFAULT_NULL_DRIFT = 0.1
+
+_NUMERIC_TYPE = re.compile(r"^(U?(TINY|SMALL|BIG|HUGE)?INT(EGER)?|FLOAT|DOUBLE|DECIMAL.*)$")
+_RELATION_CALL = re.compile(r"(ref|source)\(([^)]*)\)")
+
+
+@dataclass
+class Check:
+    """A dbt test translated into a failing-row count over its table."""
+
+    name: str
+    test: str
+    column: str | None
+    severity: str
+    failures_sql: str
+
+
+def _quote(identifier: str) -> str:
+    """Quote a column name for DuckDB."""
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _literal(value: Any) -> str:
+    """Render a Python value as a SQL literal."""
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    return str(value)
+
+
+def _resolve_relation(call: str, depends_on: list[str], manifest: dict[str, Any]) -> str | None:
+    """Return the table name of a ``ref(...)`` or ``source(...)`` test argument."""
+    match = _RELATION_CALL.search(call)
+    if match is None:
+        return None
+    kind, raw_args = match.groups()
+    args = [a.strip().strip("'\"") for a in raw_args.split(",")]
+    for unique_id in depends_on:
+        if kind == "ref" and unique_id in manifest["nodes"]:
+            node = manifest["nodes"][unique_id]
+            if node["name"] == args[-1]:
+                return node["relation_name"].replace('"', "")
+        if kind == "source" and unique_id in manifest["sources"]:
+            node = manifest["sources"][unique_id]
+            if [node["source_name"], node["name"]] == args:
+                return node["relation_name"].replace('"', "")
+    return None
+
+
+def _failures_sql(
+    test: str,
+    kwargs: dict[str, Any],
+    where: str | None,
+    depends_on: list[str],
+    manifest: dict[str, Any],
+) -> str | None:
+    """Return the aggregate counting failing rows for a test, or None if unsupported.
+
+    ``where`` is the test's ``config.where``, restricting the rows it applies to.
+    """
+    column = kwargs.get("column_name")
+    col = _quote(column) if column else None
+    applies = f" FILTER (WHERE {where})" if where else ""
+    if test == "not_null":
+        condition = f"{col} IS NULL"
+    elif test == "unique":
+        return f"count({col}){applies} - count(DISTINCT {col}){applies}"
+    elif test == "unique_combination_of_columns":
+        columns = ", ".join(_quote(c) for c in kwargs["combination_of_columns"])
+        return f"count(*){applies} - count(DISTINCT ({columns})){applies}"
+    elif test == "accepted_values":
+        values = ", ".join(_literal(v) for v in kwargs["values"])
+        condition = f"{col} IS NOT NULL AND {col} NOT IN ({values})"
+    elif test == "accepted_range":
+        bounds = []
+        inclusive = kwargs.get("inclusive", True)
+        if kwargs.get("min_value") is not None:
+            bounds.append(f"{col} {'<' if inclusive else '<='} {kwargs['min_value']}")
+        if kwargs.get("max_value") is not None:
+            bounds.append(f"{col} {'>' if inclusive else '>='} {kwargs['max_value']}")
+        condition = " OR ".join(bounds) or "false"
+    elif test == "expression_is_true":
+        expression = f"{col} {kwargs['expression']}" if col else kwargs["expression"]
+        condition = f"NOT ({expression})"
+    elif test == "relationships":
+        parent = _resolve_relation(kwargs["to"], depends_on, manifest)
+        if parent is None:
+            return None
+        field = _quote(kwargs["field"])
+        condition = (
+            f"{col} IS NOT NULL AND {col} NOT IN "
+            f"(SELECT {field} FROM {parent} WHERE {field} IS NOT NULL)"
+        )
+    else:
+        return None
+    if where:
+        condition = f"({where}) AND ({condition})"
+    return f"count(*) FILTER (WHERE {condition})"
+
+
+def load_checks(manifest_path: Path = MANIFEST_PATH) -> tuple[dict[str, list[Check]], list[str]]:
+    """Read the tests of the dbt manifest, grouped by the relation they test.
+
+    Returns the checks per relation and the names of the tests that cannot be evaluated
+    here (custom tests, or tests whose table could not be resolved), which dbt still runs.
+    """
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+
+    checks: dict[str, list[Check]] = {}
+    unsupported = []
+    for node in manifest["nodes"].values():
+        if node["resource_type"] != "test" or not node["config"]["enabled"]:
+            continue
+        metadata = node.get("test_metadata")
+        if not metadata:
+            unsupported.append(node["name"])
+            continue
+        kwargs = metadata["kwargs"]
+        # Arguments templated with Jinja (e.g. {{ var(...) }}) can only be rendered by dbt
+        if any("{{" in str(v) for k, v in kwargs.items() if k != "model"):
+            unsupported.append(node["name"])
+            continue
+        depends_on = node["depends_on"]["nodes"]
+        relation = _resolve_relation(kwargs.get("model", ""), depends_on, manifest)
+        failures = _failures_sql(
+            metadata["name"], kwargs, node["config"].get("where"), depends_on, manifest
+        )
+        if relation is None or failures is None:
+            unsupported.append(node["name"])
+            continue
+        checks.setdefault(relation, []).append(
+            Check(
+                name=node["name"],
+                test=metadata["name"],
+                column=kwargs.get("column_name"),
+                severity=node["config"]["severity"].lower(),
+                failures_sql=failures,
+            )
+        )
+    return checks, unsupported
+
+
+def _ensure_tables(con: duckdb.DuckDBPyConnection) -> None:
+    """Create the quality schema, results table and profiles table if needed."""
+    con.execute(f"CREATE SCHEMA IF NOT EXISTS {QUALITY_SCHEMA}")
+    con.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {RESULTS_TABLE} (
+            run_id VARCHAR NOT NULL,
+            checked_at TIMESTAMP NOT NULL,
+            relation VARCHAR NOT NULL,
+            check_name VARCHAR NOT NULL,
+            test VARCHAR NOT NULL,
+            column_name VARCHAR,
+            status VARCHAR NOT NULL,
+            failures BIGINT,
+            detail VARCHAR
+        )
+    """
+    )
+    con.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {PROFILES_TABLE} (
+            run_id VARCHAR NOT NULL,
+            checked_at TIMESTAMP NOT NULL,
+            relation VARCHAR NOT NULL,
+            column_name VARCHAR NOT NULL,
+            row_count BIGINT NOT NULL,
+            null_fraction DOUBLE,
+            mean DOUBLE,
+            stddev DOUBLE
+        )
+    """
+    )
+
+
+def _scan(
+    con: duckdb.DuckDBPyConnection, relation: str, checks: list[Check]
+) -> tuple[list[int], dict[str, dict[str, Any]], int]:
+    """Evaluate all checks and profile all columns of a relation in one query.
+
+    Returns the failing-row count of every check, the profile of every column and the
+    row count.
+    """
+    columns = con.execute(f"SELECT column_name, column_type FROM (DESCRIBE {relation})").fetchall()
+    expressions = ["count(*)"] + [check.failures_sql for check in checks]
+    for column, column_type in columns:
+        col = _quote(column)
+        expressions.append(f"count(*) - count({col})")
+        if _NUMERIC_TYPE.match(column_type):
+            expressions += [f"avg({col})::DOUBLE", f"stddev_samp({col})::DOUBLE"]
+        else:
+            expressions += ["NULL::DOUBLE", "NULL::DOUBLE"]
+
+    row = con.execute(f"SELECT {', '.join(expressions)} FROM {relation}").fetchone()
+    row_count = row[0]
+    failures = list(row[1 : len(checks) + 1])
+    profile_values = row[len(checks) + 1 :]
+    profiles = {}
+    for i, (column, _) in enumerate(columns):
+        nulls, mean, stddev = profile_values[3 * i : 3 * i + 3]
+        profiles[column] = {
+            "null_fraction": nulls / row_count if row_count else None,
+            "mean": mean,
+            "stddev": stddev,
+        }
+    return failures, profiles, row_count
+
+
+def _statistical_checks(
+    con: duckdb.DuckDBPyConnection,
+    relation: str,
+    row_count: int,
+    profiles: dict[str, dict[str, Any]],
+    args: argparse.Namespace,
+) -> list[tuple[str, str, str | None, str, int | None, str]]:
+    """Compare a relation's profile with the previous run and return the drift results."""
+    previous = con.execute(
+        f"""
+        SELECT column_name, row_count, null_fraction, mean, stddev
+        FROM {PROFILES_TABLE}
+        WHERE relation = ?
+            AND run_id = (SELECT max(run_id) FROM {PROFILES_TABLE} WHERE relation = ?)
+    """,
+        [relation, relation],
+    ).fetchall()
+    if not previous:
+        return []
+
+    results = []
+    previous_rows = previous[0][1]
+    change = abs(row_count - previous_rows) / max(previous_rows, 1)
+    results.append(
+        (
+            "row_count_anomaly",
+            "row_count_anomaly",
+            None,
+            "warn" if change > args.row_count_tolerance else "pass",
+            row_count - previous_rows,
+            f"{previous_rows:,} -> {row_count:,} rows ({change:.1%} change)",
+        )
+    )
+
+    for column, _, prev_nulls, prev_mean, prev_std in previous:
+        current = profiles.get(column)
+        if current is None:
+            continue
+        reasons = []
+        if prev_mean is not None and current["mean"] is not None and prev_std:
+            shift = abs(current["mean"] - prev_mean) / prev_std
+            if shift > args.drift_threshold:
+                reasons.append(f"mean {prev_mean:.4g} -> {current['mean']:.4g} ({shift:.2f} sd)")
+        if (
+            prev_nulls is not None
+            and current["null_fraction"] is not None
+            and abs(current["null_fraction"] - prev_nulls) > args.null_drift
+        ):
+            reasons.append(f"nulls {prev_nulls:.1%} -> {current['null_fraction']:.1%}")
+        results.append(
+            (
+                f"distribution_drift_{column}",
+                "distribution_drift",
+                column,
+                "warn" if reasons else "pass",
+                None,
+                "; ".join(reasons) or None,
+            )
+        )
+    return results
+
+
+def check_data_quality() -> int:
+    """Run the dbt project's data tests in one scan per table, plus drift checks."""
+    parser = argparse.ArgumentParser(description=check_data_quality.__doc__)
+    parser.add_argument("--db-path", default=str(working_db_path()))
+    parser.add_argument("--manifest", default=str(MANIFEST_PATH))
+    parser.add_argument(
+        "--select", help="only check relations whose name contains this text, e.g. polizze"
+    )
+    parser.add_argument("--row-count-tolerance", type=float, default=DEFAULT_ROW_COUNT_TOLERANCE)
+    parser.add_argument("--drift-threshold", type=float, default=DEFAULT_DRIFT_THRESHOLD)
+    parser.add_argument("--null-drift", type=float, default=DEFAULT_NULL_DRIFT)
+    args = parser.parse_args()
+
+    manifest_path = Path(args.manifest)
+    if not manifest_path.exists():
+        print(f"ERROR: dbt manifest not found at: {manifest_path}")
+        print("Run 'uv run dbt-build' (or any dbt command) first to generate it.")
+        return 1
+
+    checks, unsupported = load_checks(manifest_path)
+    if args.select:
+        checks = {r: c for r, c in checks.items() if args.select in r}
+
+    run_id = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    checked_at = datetime.now()
+    con = duckdb.connect(args.db_path)
+    _ensure_tables(con)
+
+    start = time.perf_counter()
+    results = []
+    profile_rows = []
+    for relation, relation_checks in sorted(checks.items()):
+        try:
+            failures, profiles, row_count = _scan(con, relation, relation_checks)
+        except duckdb.Error as e:
+            print(f"ERROR: {relation}: {e}")
+            for check in relation_checks:
+                results.append(
+                    (relation, check.name, check.test, check.column, "error", None, str(e))
+                )
+            continue
+
+        for check, failed in zip(relation_checks, failures):
+            status = "pass" if failed == 0 else check.severity
+            detail = f"{failed:,} failing rows" if failed else None
+            results.append((relation, check.name, check.test, check.column, status, failed, detail))
+        for name, test, column, status, value, detail in _statistical_checks(
+            con, relation, row_count, profiles, args
+        ):
+            results.append((relation, name, test, column, status, value, detail))
+        profile_rows += [
+            (relation, column, row_count, p["null_fraction"], p["mean"], p["stddev"])
+            for column, p in profiles.items()
+        ]
+
+        statuses = [r[4] for r in results if r[0] == relation]
+        print(
+            f"OK {relation}: {len(relation_checks)} tests in one scan, "
+            f"{statuses.count('error')} errors, {statuses.count('warn')} warnings"
+        )
+    elapsed = time.perf_counter() - start
+
+    con.executemany(
+        f"INSERT INTO {RESULTS_TABLE} VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [(run_id, checked_at, *r) for r in results],
+    )
+    if profile_rows:
+        con.executemany(
+            f"INSERT INTO {PROFILES_TABLE} VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(run_id, checked_at, *p) for p in profile_rows],
+        )
+    con.close()
+
+    problems = [r for r in results if r[4] != "pass"]
+    if problems:
+        print("\nChecks not passing:")
+        for relation, name, _, _, status, _, detail in problems:
+            print(f"  {status.upper():5} {relation} {name}: {detail}")
+    if unsupported:
+        print(f"\nWARNING: {len(unsupported)} test(s) not supported here, run them with dbt-test:")
+        for name in unsupported:
+            print(f"  {name}")
+
+    errors = sum(1 for r in results if r[4] == "error")
+    print(
+        f"\n[OK] {len(results)} checks on {len(checks)} tables in {elapsed:.2f}s, "
+        f"{errors} errors, {len(problems) - errors} warnings (run {run_id})"
+    )
+    return 1 if errors else 0
@@ -1,11 +1,65 @@
 """Wrapper functions for dbt commands."""
 
+import argparse
 import subprocess
 import os
 import shutil
+import sys
 from pathlib import Path
 from datetime import datetime
 
+# Runs dbt in-process instead of spawning a new dbt process; set by the CLI daemon
+_dbt_runner = None
+
+# Development builds on a sample of the customers use their own profile target and
+# database file, never the working or published database
+SAMPLE_TARGET = "sample"
+SAMPLE_DB_PATH = Path(__file__).parent.parent.parent / "data" / "dev" / "aida_challenge.duckdb"
+DEFAULT_SAMPLE_FRACTION = 0.05
+
+# Customers are spread over this many hash buckets; a sample keeps the lowest ones
+_SAMPLE_BUCKETS = 10_000
+
+# dbt options that build a subset of the models or another target than the default one
+_PARTIAL_BUILD_OPTIONS = {
+    "-s",
+    "--select",
+    "-m",
+    "--models",
+    "--exclude",
+    "--selector",
+    "-t",
+    "--target",
+}
+
+# Models that keep history across builds, with the models built from them. Once a version
+# is published, this history lives in the published database only (see publishing).
+_HISTORY_SELECTORS = ["resource_type:snapshot+", "mart_renewal_feed+"]
+
+
+def set_dbt_runner(runner):
+    """Route dbt commands to ``runner(command, env)`` instead of a new dbt process.
+
+    ``command`` is the full dbt argument list and ``env`` the environment variables to
+    override; the runner returns the exit code. Pass None to restore the default.
+    """
+    global _dbt_runner
+    _dbt_runner = runner
+
+
+def _run_dbt(*command, env=None, argv=None):
+    """Run a dbt command with the common arguments plus any given on the command line.
+
+    ``argv`` replaces the command line arguments, for commands that parse some of them.
+    """
+    args = [*command, *get_dbt_args(), *(sys.argv[1:] if argv is None else argv)]
+    # The sample target of profiles.yml reads its database path from here
+    env = {"AIDA_SAMPLE_DB_PATH": str(SAMPLE_DB_PATH), **(env or {})}
+    if _dbt_runner is not None:
+        return _dbt_runner(args, env)
+    result = subprocess.run(["dbt", *args], check=False, env={**os.environ, **env})
+    return result.returncode
+
 
 def _set_project_root():
     """Change to dbt project directory."""
@@ -53,6 +107,55 @@ def _archive_log():
     return None
 
 
+def _history_exclusion():
+    """Return the dbt arguments leaving the history models out of a working database build.
+
+    Nothing is left out before the first publish, or for builds into another database.
+    """
+    from aida_challenge.publishing import current_version, working_db_path
+
+    args = sys.argv[1:]
+    for i, arg in enumerate(args):
+        option, _, value = arg.partition("=")
+        if option not in ("-t", "--target"):
+            continue
+        target = value or (args[i + 1] if i + 1 < len(args) else "")
+        # dev is the default target of profiles.yml, which builds the working database
+        if target != "dev":
+            return []
+    if Path(os.environ.get("AIDA_DB_PATH", working_db_path())) != working_db_path():
+        return []
+    if current_version() is None:
+        return []
+    print("Snapshots and mart_renewal_feed are left out: dbt-publish builds their history.")
+    return ["--exclude", *_HISTORY_SELECTORS]
+
+
+def _warm_caches(db_path):
+    """Warm the dashboard and lookup caches after a successful build of ``db_path``.
+
+    Caches are only warmed when the build covered every model of the default target and
+    wrote the database the dashboard reads. Set AIDA_SKIP_WARMING=1 to skip it, e.g. in CI.
+    """
+    from aida_challenge.publishing import current_db_path
+
+    if os.environ.get("AIDA_SKIP_WARMING"):
+        return
+    partial = [arg for arg in sys.argv[1:] if arg.split("=")[0] in _PARTIAL_BUILD_OPTIONS]
+    if partial:
+        print(f"Cache warming skipped: not a full build of the default target ({partial[0]})")
+        return
+    if Path(db_path) != current_db_path():
+        print(f"Cache warming skipped: readers use {current_db_path()}, not the built database")
+        return
+    from aida_challenge.cache_warming import warm_caches
+
+    try:
+        warm_caches()
+    except Exception as e:  # noqa: BLE001 - a cold cache must not fail a finished build
+        print(f"WARNING: Cache warming failed: {e}")
+
+
 def get_dbt_args():
     """Get common dbt arguments with proper paths."""
     # We assume we are in dbt_project directory
@@ -92,16 +195,15 @@ def get_dbt_args():
 def dbt_debug():
     """Run dbt debug."""
     _set_project_root()
-    args = get_dbt_args()
-    print(f"Running: dbt debug {' '.join(args)}")
-    subprocess.run(["dbt", "debug", *args], check=False)
+    print("Running: dbt debug")
+    _run_dbt("debug")
     _archive_log()
 
 
 def dbt_deps():
     """Install dbt dependencies."""
     _set_project_root()
-    subprocess.run(["dbt", "deps", *get_dbt_args()], check=False)
+    _run_dbt("deps")
     _archive_log()
 
 
@@ -109,43 +211,156 @@ def dbt_run():
     """Run all dbt models."""
     _set_project_root()
     _check_database()
-    result = subprocess.run(["dbt", "run", *get_dbt_args()], check=False)
+    returncode = _run_dbt("run", *_history_exclusion())
     _archive_log()
-    return result.returncode
+    return returncode
 
 
 def dbt_test():
     """Test all dbt models."""
     _set_project_root()
-    result = subprocess.run(["dbt", "test", *get_dbt_args()], check=False)
+    returncode = _run_dbt("test")
     _archive_log()
-    return result.returncode
+    return returncode
 
 
 def dbt_build():
     """Build and test all dbt models."""
     _set_project_root()
-    result = subprocess.run(["dbt", "build", *get_dbt_args()], check=False)
+    returncode = _run_dbt("build", *_history_exclusion())
     _archive_log()
-    return result.returncode
+    if returncode == 0:
+        from aida_challenge.publishing import working_db_path
+
+        # profiles.yml builds into AIDA_DB_PATH when it is set
+        _warm_caches(os.environ.get("AIDA_DB_PATH", working_db_path()))
+    return returncode
+
+
+def dbt_publish():
+    """Build all dbt models into a new database version and publish it atomically."""
+    from aida_challenge import publishing
+
+    _set_project_root()
+    _check_database()
+    version_path = publishing.prepare_version()
+
+    # profiles.yml reads the target database from AIDA_DB_PATH
+    returncode = _run_dbt("build", env={"AIDA_DB_PATH": str(version_path)})
+    _archive_log()
+
+    if returncode != 0:
+        print("ERROR: Build failed, the published version is left untouched.")
+        publishing.discard_version(version_path)
+        return returncode
+
+    publishing.publish_version(version_path)
+    publishing.collect_garbage()
+    _warm_caches(version_path)
+    return 0
+
+
+def create_sample_database(fraction, source_path=None):
+    """Copy the raw tables into the sample database, keeping a fraction of the customers.
+
+    Customers are kept by a hash of codice_cliente, so every table keeps the same
+    customers and joins stay intact. The same fraction always keeps the same customers,
+    and a larger fraction keeps a superset of them. Tables without codice_cliente are
+    copied in full. The sample database is recreated from scratch.
+    """
+    import duckdb
+
+    from aida_challenge.publishing import working_db_path
+
+    source_path = Path(source_path or working_db_path())
+    SAMPLE_DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    SAMPLE_DB_PATH.unlink(missing_ok=True)
+    SAMPLE_DB_PATH.with_name(SAMPLE_DB_PATH.name + ".wal").unlink(missing_ok=True)
+
+    buckets = round(fraction * _SAMPLE_BUCKETS)
+    print(f"Sampling {fraction:.1%} of the customers of {source_path} into: {SAMPLE_DB_PATH}")
+    con = duckdb.connect(str(SAMPLE_DB_PATH))
+    try:
+        quoted_path = str(source_path).replace("'", "''")
+        con.execute(f"ATTACH '{quoted_path}' AS source (READ_ONLY)")
+        # The raw tables are the ones in the main schema, dbt models live in main_<layer>
+        tables = con.execute(
+            """
+            SELECT t.table_name, bool_or(c.column_name = 'codice_cliente') AS per_customer
+            FROM duckdb_tables() AS t
+            JOIN duckdb_columns() AS c USING (database_name, schema_name, table_name)
+            WHERE t.database_name = 'source' AND t.schema_name = 'main'
+            GROUP BY t.table_name
+            ORDER BY t.table_name
+        """
+        ).fetchall()
+        for table, per_customer in tables:
+            sample_filter = (
+                f"WHERE hash(codice_cliente::BIGINT) % {_SAMPLE_BUCKETS} < {buckets}"
+                if per_customer
+                else ""
+            )
+            con.execute(
+                f"CREATE TABLE main.{table} AS SELECT * FROM source.main.{table} {sample_filter}"
+            )
+            kept = con.execute(f"SELECT count(*) FROM main.{table}").fetchone()[0]
+            total = con.execute(f"SELECT count(*) FROM source.main.{table}").fetchone()[0]
+            print(f"  {table:<25} {kept:>10,} of {total:>10,} rows")
+    finally:
+        con.close()
+
+
+def dbt_sample():
+    """Build every dbt model on a sample of the customers, into the development database."""
+    import duckdb
+
+    parser = argparse.ArgumentParser(
+        description=dbt_sample.__doc__,
+        epilog="Other arguments are passed to dbt build, e.g. --select staging+",
+    )
+    parser.add_argument(
+        "--fraction",
+        type=float,
+        default=DEFAULT_SAMPLE_FRACTION,
+        help=f"share of the customers to keep (default {DEFAULT_SAMPLE_FRACTION})",
+    )
+    args, dbt_args = parser.parse_known_args()
+    if not 0 < args.fraction <= 1:
+        print("ERROR: --fraction must be between 0 (excluded) and 1.")
+        return 1
+
+    _set_project_root()
+    _check_database()
+    try:
+        create_sample_database(args.fraction)
+    except duckdb.Error as e:
+        print(f"ERROR: Could not create the sample database: {e}")
+        return 1
+
+    returncode = _run_dbt("build", "--target", SAMPLE_TARGET, argv=dbt_args)
+    _archive_log()
+    if returncode == 0:
+        print(f"\n[OK] Sample database built: {SAMPLE_DB_PATH}")
+        print(f"Iterate on models with: uv run dbt-run --target {SAMPLE_TARGET} --select <model>")
+    return returncode
 
 
 def dbt_clean():
     """Clean dbt artifacts."""
     _set_project_root()
-    subprocess.run(["dbt", "clean", *get_dbt_args()], check=False)
+    _run_dbt("clean")
     _archive_log()
 
 
 def dbt_docs_generate():
     """Generate dbt documentation."""
     _set_project_root()
-    subprocess.run(["dbt", "docs", "generate", *get_dbt_args()], check=False)
+    _run_dbt("docs", "generate")
     _archive_log()
 
 
 def dbt_docs_serve():
     """Serve dbt documentation."""
     _set_project_root()
-    subprocess.run(["dbt", "docs", "serve", *get_dbt_args()], check=False)
+    _run_dbt("docs", "serve")
     _archive_log()
@@ -0,0 +1,383 @@
+"""Columnar exports of the marts for downstream consumers.
+
+Marts are exported from the published database as partitioned Parquet (written by DuckDB)
+or Arrow IPC files (written with pyarrow), instead of CSV dumps. Every export goes into its
+own directory ``data/exports/<table>/<export_id>/`` together with a ``manifest.json``
+listing each file with its row count and SHA-256 checksum, and ``LATEST`` points to the
+newest export of the table.
+
+Exports are incremental: the key and a hash of every exported row are kept in
+``data/exports/<table>/_state.parquet``, so after the first (full) export only rows that
+are new or changed since the previous export are written, and the keys of removed rows
+go to a separate ``deletes`` file. Consumers apply a table's exports in order, following
+``previous_export_id`` in the manifests back to the last full export.
+
+``serve-exports`` optionally serves the same marts over a local Arrow Flight endpoint,
+streaming record batches straight from DuckDB.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+import duckdb
+
+from aida_challenge.publishing import DATA_DIR, current_db_path, shared_connection
+
+EXPORTS_DIR = DATA_DIR / "exports"
+MARTS_SCHEMA = "aida_challenge.main_marts"
+
+# Exported marts: row key, partition columns and columns left out of the change detection
+# (build timestamps and values derived from the current date, which change on every build)
+EXPORTS: dict[str, dict[str, list[str]]] = {
+    "dim_customers": {
+        "key": ["codice_cliente"],
+        "partition_by": ["agenzia"],
+        "ignore": ["_dbt_loaded_at"],
+    },
+    "fact_policies": {
+        "key": ["codice_cliente", "prodotto", "data_emissione"],
+        "partition_by": ["agenzia"],
+        "ignore": [
+            "_dbt_loaded_at",
+            "giorni_dalla_emissione",
+            "giorni_alla_scadenza",
+            "scaduta",
+            "in_scadenza",
+        ],
+    },
+    "mart_policy_benchmark": {
+        "key": ["chiave_polizza"],
+        "partition_by": ["prodotto"],
+        "ignore": [],
+    },
+    "mart_claims_summary": {
+        "key": ["mese_sinistro", "prodotto", "area_bisogno", "tipo_sinistro", "stato_liquidazione"],
+        "partition_by": [],
+        "ignore": [],
+    },
+}
+
+# File extension of each export format
+FORMATS = {"parquet": "parquet", "arrow": "arrow"}
+
+DEFAULT_FLIGHT_PORT = 8815
+
+# Helper columns computed for change detection, never written to the data files
+_KEY_COLUMN = "_chiave_export"
+_HASH_COLUMN = "_impronta_export"
+
+
+def _table_config(table: str) -> dict[str, list[str]]:
+    """Return the export configuration of a mart, rejecting unknown marts."""
+    if table not in EXPORTS:
+        raise ValueError(f"Unknown export table '{table}', expected one of: {', '.join(EXPORTS)}")
+    return EXPORTS[table]
+
+
+def _sha256(path: Path) -> str:
+    """Return the SHA-256 checksum of a file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _count_rows(con: duckdb.DuckDBPyConnection, path: Path, fmt: str) -> int:
+    """Return the number of rows stored in an exported file."""
+    if fmt == "parquet":
+        return con.execute(
+            "SELECT coalesce(sum(num_rows), 0) FROM parquet_file_metadata(?)", [str(path)]
+        ).fetchone()[0]
+
+    import pyarrow.ipc
+
+    with pyarrow.ipc.open_file(path) as reader:
+        return sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+
+
+def _write(
+    con: duckdb.DuckDBPyConnection,
+    query: str,
+    target: Path,
+    fmt: str,
+    partition_by: list[str],
+) -> None:
+    """Write a query result to target, a directory of partition files or a single file."""
+    if fmt == "parquet":
+        if partition_by:
+            options = f"FORMAT parquet, PARTITION_BY ({', '.join(partition_by)})"
+        else:
+            options = "FORMAT parquet"
+        con.execute(f"COPY ({query}) TO '{target}' ({options})")
+        return
+
+    import pyarrow.dataset
+
+    reader = con.execute(query).fetch_record_batch()
+    if partition_by:
+        pyarrow.dataset.write_dataset(
+            reader,
+            target,
+            format="ipc",
+            partitioning=partition_by,
+            partitioning_flavor="hive",
+            basename_template="data_{i}.arrow",
+        )
+    else:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        with pyarrow.ipc.new_file(target, reader.schema) as writer:
+            for batch in reader:
+                writer.write_batch(batch)
+
+
+def latest_export(table: str) -> dict[str, Any] | None:
+    """Return the manifest of the newest export of a mart, if any."""
+    pointer = EXPORTS_DIR / table / "LATEST"
+    if not pointer.exists():
+        return None
+    manifest = EXPORTS_DIR / table / pointer.read_text(encoding="utf-8").strip() / "manifest.json"
+    if not manifest.exists():
+        return None
+    return json.loads(manifest.read_text(encoding="utf-8"))
+
+
+def export_table(
+    table: str,
+    fmt: str = "parquet",
+    full: bool = False,
+    con: duckdb.DuckDBPyConnection | None = None,
+) -> dict[str, Any]:
+    """Export a mart and return the manifest of the export.
+
+    Without ``full``, only rows that are new or changed since the previous export of the
+    table are written, plus the keys of rows that disappeared. The first export of a
+    table, or one in a different format than the previous, is always full.
+    """
+    config = _table_config(table)
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format '{fmt}', expected one of: {', '.join(FORMATS)}")
+    con = con or shared_connection().cursor()
+
+    table_dir = EXPORTS_DIR / table
+    state_path = table_dir / "_state.parquet"
+    previous = latest_export(table)
+    full = full or previous is None or previous["format"] != fmt or not state_path.exists()
+
+    export_id = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    export_dir = table_dir / export_id
+    ext = FORMATS[fmt]
+    # ENUM values hash as their position in the type, which moves when a value is added
+    # to the domain, so they are hashed as text
+    hashed = {
+        column: f"{column}::VARCHAR" if column_type.startswith("ENUM") else column
+        for column, column_type in con.execute(
+            f"SELECT column_name, column_type FROM (DESCRIBE {MARTS_SCHEMA}.{table})"
+        ).fetchall()
+    }
+    key_sql = ", ".join(config["key"])
+    hashed_key = ", ".join(hashed[column] for column in config["key"])
+    tracked = [hashed[column] for column in hashed if column not in config["ignore"]]
+
+    # Every row with a hash of its key and of its tracked columns
+    con.execute(
+        f"""
+        CREATE OR REPLACE TEMP TABLE export_rows AS
+        SELECT *, hash({hashed_key}) AS {_KEY_COLUMN}, hash({', '.join(tracked)}) AS {_HASH_COLUMN}
+        FROM {MARTS_SCHEMA}.{table}
+    """
+    )
+
+    if full:
+        changed = f"SELECT * EXCLUDE ({_KEY_COLUMN}, {_HASH_COLUMN}) FROM export_rows"
+        deleted = None
+    else:
+        state = f"read_parquet('{state_path}')"
+        changed = f"""
+            SELECT r.* EXCLUDE ({_KEY_COLUMN}, {_HASH_COLUMN})
+            FROM export_rows AS r
+            LEFT JOIN {state} AS s ON r.{_KEY_COLUMN} = s.{_KEY_COLUMN}
+            WHERE s.{_KEY_COLUMN} IS NULL OR r.{_HASH_COLUMN} <> s.{_HASH_COLUMN}
+        """
+        deleted = f"""
+            SELECT s.* EXCLUDE ({_KEY_COLUMN}, {_HASH_COLUMN})
+            FROM {state} AS s
+            ANTI JOIN export_rows AS r ON r.{_KEY_COLUMN} = s.{_KEY_COLUMN}
+        """
+
+    export_dir.mkdir(parents=True)
+    try:
+        num_changed = con.execute(f"SELECT count(*) FROM ({changed})").fetchone()[0]
+        if num_changed:
+            target = export_dir / "data" if config["partition_by"] else export_dir / f"data.{ext}"
+            _write(con, changed, target, fmt, config["partition_by"])
+
+        num_deleted = 0
+        if deleted is not None:
+            num_deleted = con.execute(f"SELECT count(*) FROM ({deleted})").fetchone()[0]
+            if num_deleted:
+                _write(con, deleted, export_dir / f"deletes.{ext}", fmt, [])
+
+        files = []
+        for path in sorted(p for p in export_dir.rglob("*") if p.is_file()):
+            files.append(
+                {
+                    "path": path.relative_to(export_dir).as_posix(),
+                    "kind": "deletes" if path.name.startswith("deletes.") else "data",
+                    "rows": _count_rows(con, path, fmt),
+                    "bytes": path.stat().st_size,
+                    "sha256": _sha256(path),
+                }
+            )
+
+        manifest = {
+            "table": table,
+            "export_id": export_id,
+            "mode": "full" if full else "delta",
+            "previous_export_id": None if full else previous["export_id"],
+            "format": fmt,
+            "key": config["key"],
+            "partition_by": config["partition_by"],
+            "source_db": con.execute(
+                "SELECT path FROM duckdb_databases() WHERE database_name = 'aida_challenge'"
+            ).fetchone()[0],
+            "exported_at": datetime.now().isoformat(timespec="seconds"),
+            "total_rows": con.execute("SELECT count(*) FROM export_rows").fetchone()[0],
+            "changed_rows": num_changed,
+            "deleted_rows": num_deleted,
+            "files": files,
+        }
+        (export_dir / "manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+
+        # State for the next delta: the key columns plus both hashes of every current row
+        tmp_state = state_path.with_suffix(".tmp")
+        con.execute(
+            f"""
+            COPY (SELECT {key_sql}, {_KEY_COLUMN}, {_HASH_COLUMN} FROM export_rows)
+            TO '{tmp_state}' (FORMAT parquet)
+        """
+        )
+        os.replace(tmp_state, state_path)
+    except Exception:
+        shutil.rmtree(export_dir, ignore_errors=True)
+        raise
+    finally:
+        con.execute("DROP TABLE IF EXISTS export_rows")
+
+    tmp_pointer = table_dir / "LATEST.tmp"
+    tmp_pointer.write_text(export_id, encoding="utf-8")
+    os.replace(tmp_pointer, table_dir / "LATEST")
+    return manifest
+
+
+def export_marts() -> int:
+    """Export marts as partitioned Parquet or Arrow IPC files with manifests."""
+    parser = argparse.ArgumentParser(description=export_marts.__doc__)
+    parser.add_argument(
+        "tables", nargs="*", default=list(EXPORTS), help="marts to export (default: all)"
+    )
+    parser.add_argument("--format", choices=list(FORMATS), default="parquet")
+    parser.add_argument("--full", action="store_true", help="export every row, not a delta")
+    parser.add_argument("--db-path", default=str(current_db_path()))
+    args = parser.parse_args()
+
+    unknown = [t for t in args.tables if t not in EXPORTS]
+    if unknown:
+        print(f"ERROR: Unknown table(s): {', '.join(unknown)}")
+        print(f"Exportable marts: {', '.join(EXPORTS)}")
+        return 1
+    if args.format == "arrow":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            print("ERROR: pyarrow is required for Arrow IPC exports.")
+            print("Install it with 'uv sync --extra export'.")
+            return 1
+
+    con = duckdb.connect(args.db_path, read_only=True)
+    for table in args.tables:
+        start = time.perf_counter()
+        manifest = export_table(table, args.format, args.full, con)
+        print(
+            f"OK {table}: {manifest['mode']} export {manifest['export_id']}, "
+            f"{manifest['changed_rows']:,} changed and {manifest['deleted_rows']:,} deleted "
+            f"of {manifest['total_rows']:,} rows in {time.perf_counter() - start:.2f}s"
+        )
+    con.close()
+
+    print(f"\n[OK] Exports written to: {EXPORTS_DIR}")
+    return 0
+
+
+def serve_exports() -> int:
+    """Serve the exportable marts over a local Arrow Flight endpoint."""
+    parser = argparse.ArgumentParser(description=serve_exports.__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_FLIGHT_PORT)
+    args = parser.parse_args()
+
+    try:
+        import pyarrow as pa
+        from pyarrow import flight
+    except ImportError:
+        print("ERROR: pyarrow with Flight support is required to serve exports.")
+        print("Install it with 'uv sync --extra export'.")
+        return 1
+
+    class MartsFlightServer(flight.FlightServerBase):  # type: ignore[misc]
+        """Flight server whose tickets are mart names, read from the published database."""
+
+        def _query(self, table: str) -> str:
+            _table_config(table)
+            return f"SELECT * FROM {MARTS_SCHEMA}.{table}"
+
+        def _info(self, table: str) -> Any:
+            con = shared_connection().cursor()
+            try:
+                schema = con.execute(f"{self._query(table)} LIMIT 0").fetch_arrow_table().schema
+                rows = con.execute(f"SELECT count(*) FROM {MARTS_SCHEMA}.{table}").fetchone()[0]
+            finally:
+                con.close()
+            descriptor = flight.FlightDescriptor.for_path(table)
+            endpoint = flight.FlightEndpoint(table.encode(), [])
+            return flight.FlightInfo(schema, descriptor, [endpoint], rows, -1)
+
+        def list_flights(self, context: Any, criteria: bytes) -> Any:
+            for table in EXPORTS:
+                yield self._info(table)
+
+        def get_flight_info(self, context: Any, descriptor: Any) -> Any:
+            return self._info(descriptor.path[0].decode())
+
+        def do_get(self, context: Any, ticket: Any) -> Any:
+            # One cursor per request, following CURRENT to the newest published version
+            con = shared_connection().cursor()
+            reader = con.execute(self._query(ticket.ticket.decode())).fetch_record_batch()
+
+            def batches() -> Any:
+                # Closed once the stream is sent, or when the client disconnects
+                try:
+                    yield from reader
+                finally:
+                    reader.close()
+                    con.close()
+
+            return flight.RecordBatchStream(
+                pa.RecordBatchReader.from_batches(reader.schema, batches())
+            )
+
+    location = f"grpc://{args.host}:{args.port}"
+    server = MartsFlightServer(location)
+    print(f"[OK] Serving {len(EXPORTS)} marts at {location} (Ctrl+C to stop)")
+    try:
+        server.serve()
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
@@ -0,0 +1,78 @@
+"""Customer feature reads shared by the batch scoring and segmentation models.
+
+Both models read numeric columns of ``main_marts.dim_customers`` in chunks, detect changed
+customers through a hash of their feature values, and keep their fitted models as
+versioned pickle files in ``data/models``. By default they read the database the
+dashboard reads and write their results into a new published version of it.
+"""
+
+from collections.abc import Iterator
+from contextlib import AbstractContextManager, nullcontext
+from pathlib import Path
+from typing import Any
+
+import duckdb
+import pandas as pd
+
+from aida_challenge.publishing import DATA_DIR, derived_version
+
+SOURCE_TABLE = "aida_challenge.main_marts.dim_customers"
+MODELS_DIR = DATA_DIR / "models"
+
+DEFAULT_CHUNK_SIZE = 100_000
+
+# DuckDB hands out results in vectors of this many rows
+_VECTOR_SIZE = 2048
+
+
+def feature_sql(features: list[str]) -> str:
+    """Return the select list reading the features as doubles, with 0 for missing values."""
+    return ", ".join(f"coalesce({f}, 0)::DOUBLE AS {f}" for f in features)
+
+
+def hash_sql(features: list[str]) -> str:
+    """Return the expression hashing the feature values of a customer."""
+    return f"hash({', '.join(features)})"
+
+
+def output_database(db_path: str | None) -> AbstractContextManager[Path]:
+    """Return a context yielding the database to write results to.
+
+    This is ``db_path``, written in place, when given. Otherwise results are published
+    with the dashboard's database (see ``publishing.derived_version``).
+    """
+    return nullcontext(Path(db_path)) if db_path else derived_version()
+
+
+def has_pending_rows(db_path: Path, query: str, params: list[Any] | None = None) -> bool:
+    """Return whether a query finds customers to process, reading the database read-only.
+
+    Everything is pending while the results table the query reads does not exist yet.
+    """
+    con = duckdb.connect(str(db_path), read_only=True)
+    try:
+        return con.execute(f"SELECT EXISTS ({query})", params or []).fetchone()[0]
+    except duckdb.CatalogException:
+        return True
+    finally:
+        con.close()
+
+
+def latest_model_path(prefix: str) -> Path | None:
+    """Return the most recent model file named ``<prefix>_<version>.pkl``, if any."""
+    models = sorted(MODELS_DIR.glob(f"{prefix}_*.pkl"))
+    return models[-1] if models else None
+
+
+def iter_chunks(
+    con: duckdb.DuckDBPyConnection, query: str, chunk_size: int, params: list[Any] | None = None
+) -> Iterator[pd.DataFrame]:
+    """Yield the query result as DataFrames of about chunk_size rows."""
+    cursor = con.cursor()
+    cursor.execute(query, params or [])
+    vectors_per_chunk = max(chunk_size // _VECTOR_SIZE, 1)
+    while True:
+        chunk = cursor.fetch_df_chunk(vectors_per_chunk)
+        if chunk.empty:
+            break
+        yield chunk
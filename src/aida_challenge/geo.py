@@ -0,0 +1,121 @@
+"""Proximity queries over the spatial marts.
+
+``main_marts.mart_geo_customers`` and ``mart_geo_homes`` store customers and homes in grid
+cell order, so a radius search first filters on the bounding box of the circle (which
+DuckDB resolves with the row-group min/max statistics of the grid-sorted table) and only
+computes exact great-circle distances for the rows inside it. The nearest agency of every
+customer and the per-area protection gap are precomputed by dbt.
+"""
+
+import math
+
+import duckdb
+import pandas as pd
+
+from aida_challenge.publishing import shared_connection
+
+CUSTOMERS_TABLE = "aida_challenge.main_marts.mart_geo_customers"
+HOMES_TABLE = "aida_challenge.main_marts.mart_geo_homes"
+AGENCIES_TABLE = "aida_challenge.main_marts.mart_agency_locations"
+PROTECTION_GAP_TABLE = "aida_challenge.main_marts.mart_protection_gap"
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+# Same formula as the dbt macro haversine_km, against the $lat, $lon query point
+_DISTANCE_SQL = f"""2 * {EARTH_RADIUS_KM} * asin(sqrt(
+    pow(sin(radians(latitudine - $lat) / 2), 2)
+    + cos(radians($lat)) * cos(radians(latitudine))
+    * pow(sin(radians(longitudine - $lon) / 2), 2)
+))"""
+
+
+def _bounding_box(lat: float, lon: float, radius_km: float) -> dict[str, float]:
+    """Return the latitude/longitude box enclosing the circle around a point."""
+    dlat = radius_km / KM_PER_DEGREE
+    # Longitude degrees shrink towards the poles; clamp to avoid dividing by ~0
+    dlon = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+    return {
+        "lat": lat,
+        "lon": lon,
+        "radius": radius_km,
+        "min_lat": lat - dlat,
+        "max_lat": lat + dlat,
+        "min_lon": lon - dlon,
+        "max_lon": lon + dlon,
+    }
+
+
+def _within(
+    table: str, lat: float, lon: float, radius_km: float, con: duckdb.DuckDBPyConnection | None
+) -> pd.DataFrame:
+    """Return the rows of a spatial mart within radius_km of a point, nearest first."""
+    con = con or shared_connection().cursor()
+    return con.execute(
+        f"""
+        SELECT * FROM (
+            SELECT *, {_DISTANCE_SQL} AS distanza_km
+            FROM {table}
+            WHERE latitudine BETWEEN $min_lat AND $max_lat
+                AND longitudine BETWEEN $min_lon AND $max_lon
+        )
+        WHERE distanza_km <= $radius
+        ORDER BY distanza_km
+    """,
+        _bounding_box(lat, lon, radius_km),
+    ).df()
+
+
+def customers_within(
+    lat: float, lon: float, radius_km: float, con: duckdb.DuckDBPyConnection | None = None
+) -> pd.DataFrame:
+    """Return the customers living within radius_km of a point, nearest first."""
+    return _within(CUSTOMERS_TABLE, lat, lon, radius_km, con)
+
+
+def homes_within(
+    lat: float, lon: float, radius_km: float, con: duckdb.DuckDBPyConnection | None = None
+) -> pd.DataFrame:
+    """Return the homes within radius_km of a point, nearest first."""
+    return _within(HOMES_TABLE, lat, lon, radius_km, con)
+
+
+def nearest_agency(
+    lat: float, lon: float, con: duckdb.DuckDBPyConnection | None = None
+) -> dict[str, object] | None:
+    """Return the agency closest to a point with its distance, or None without agencies.
+
+    Agencies of one city share a location; ties go to the first agency by name. A
+    customer's nearest agency is also precomputed in ``mart_geo_customers``.
+    """
+    con = con or shared_connection().cursor()
+    row = con.execute(
+        f"""
+        SELECT agenzia, latitudine, longitudine, {_DISTANCE_SQL} AS distanza_km
+        FROM {AGENCIES_TABLE}
+        ORDER BY distanza_km, agenzia
+        LIMIT 1
+    """,
+        {"lat": lat, "lon": lon},
+    ).fetchone()
+    if row is None:
+        return None
+    return dict(zip(["agenzia", "latitudine", "longitudine", "distanza_km"], row))
+
+
+def protection_gap(
+    zona_residenza: str | None = None,
+    limit: int = 100,
+    con: duckdb.DuckDBPyConnection | None = None,
+) -> pd.DataFrame:
+    """Return the areas with the largest protection gap, optionally within one zone."""
+    con = con or shared_connection().cursor()
+    return con.execute(
+        f"""
+        SELECT * FROM {PROTECTION_GAP_TABLE}
+        WHERE $zona IS NULL OR zona_residenza = $zona
+        ORDER BY indice_gap_protezione DESC
+        LIMIT $limit
+    """,
+        {"zona": zona_residenza, "limit": limit},
+    ).df()
@@ -0,0 +1,65 @@
+"""Serve ranked next best actions precomputed in ``main_marts.mart_next_best_action``.
+
+The co-holding matrix and the per-customer top-k candidates are computed once per dbt
+build (``int_product_coholding`` and ``mart_next_best_action``), so requests here are
+plain indexed reads.
+"""
+
+import duckdb
+import pandas as pd
+
+from aida_challenge.publishing import shared_connection
+
+NBA_TABLE = "aida_challenge.main_marts.mart_next_best_action"
+ACTION_COLUMNS = """
+    codice_cliente,
+    agenzia,
+    rank_azione,
+    prodotto,
+    area_bisogno,
+    score,
+    fonte,
+    prodotto_trigger,
+    lift
+"""
+
+
+def get_customer_actions(
+    codice_cliente: int, con: duckdb.DuckDBPyConnection | None = None
+) -> pd.DataFrame:
+    """Return the ranked actions for one customer, best first."""
+    con = con or shared_connection().cursor()
+    return con.execute(
+        f"""
+        SELECT {ACTION_COLUMNS}
+        FROM {NBA_TABLE}
+        WHERE codice_cliente = ?
+        ORDER BY rank_azione
+    """,
+        [codice_cliente],
+    ).df()
+
+
+def get_agency_actions(
+    agenzia: str,
+    limit: int = 100,
+    top_rank_only: bool = True,
+    con: duckdb.DuckDBPyConnection | None = None,
+) -> pd.DataFrame:
+    """Return an agency's actions across its customers, highest score first.
+
+    By default only each customer's best action is included, so the list reads as
+    "who to call next and what to propose".
+    """
+    con = con or shared_connection().cursor()
+    rank_filter = "AND rank_azione = 1" if top_rank_only else ""
+    return con.execute(
+        f"""
+        SELECT {ACTION_COLUMNS}
+        FROM {NBA_TABLE}
+        WHERE agenzia = ? {rank_filter}
+        ORDER BY score DESC, codice_cliente, rank_azione
+        LIMIT ?
+    """,
+        [agenzia, limit],
+    ).df()
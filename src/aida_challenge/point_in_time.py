@@ -0,0 +1,104 @@
+"""Point-in-time reads over the dbt snapshots of dim_customers and fact_policies.
+
+Every build snapshots both marts into ``main_snapshots`` (see ``dbt_project/snapshots``),
+storing a new row version only when a customer or policy changed. Each version is valid
+from ``dbt_valid_from`` until ``dbt_valid_to`` (NULL for the current version), so the state
+"as of" a date is the version whose validity interval contains it. A date means the end of
+that day: the state left by the last build on or before it.
+
+``point_in_time_join`` attaches to every row of a labelled dataset the features valid at
+that row's own reference date, which is what a training set needs to avoid leaking
+information from after the label date.
+"""
+
+from datetime import date, datetime
+
+import duckdb
+import pandas as pd
+
+from aida_challenge.publishing import shared_connection
+
+SNAPSHOTS_SCHEMA = "aida_challenge.main_snapshots"
+SNAPSHOTS = {
+    "customers": f"{SNAPSHOTS_SCHEMA}.dim_customers_snapshot",
+    "policies": f"{SNAPSHOTS_SCHEMA}.fact_policies_snapshot",
+}
+
+# Version bookkeeping columns added by dbt, left out of the returned features
+_SNAPSHOT_COLUMNS = "dbt_scd_id, dbt_updated_at, dbt_valid_from, dbt_valid_to"
+
+
+def _snapshot_table(entity: str) -> str:
+    """Return the snapshot table of an entity, rejecting unknown entities."""
+    if entity not in SNAPSHOTS:
+        raise ValueError(f"Unknown entity '{entity}', expected one of: {', '.join(SNAPSHOTS)}")
+    return SNAPSHOTS[entity]
+
+
+def as_of(
+    entity: str, as_of_date: date | datetime | str, con: duckdb.DuckDBPyConnection | None = None
+) -> pd.DataFrame:
+    """Return the state of ``customers`` or ``policies`` as of the end of the given date."""
+    table = _snapshot_table(entity)
+    con = con or shared_connection().cursor()
+    return con.execute(
+        f"""
+        SELECT * EXCLUDE ({_SNAPSHOT_COLUMNS})
+        FROM {table}
+        WHERE dbt_valid_from < ?::DATE + INTERVAL 1 DAY
+            AND (dbt_valid_to IS NULL OR dbt_valid_to >= ?::DATE + INTERVAL 1 DAY)
+    """,
+        [as_of_date, as_of_date],
+    ).df()
+
+
+def customers_as_of(
+    as_of_date: date | datetime | str, con: duckdb.DuckDBPyConnection | None = None
+) -> pd.DataFrame:
+    """Return dim_customers as of the end of the given date."""
+    return as_of("customers", as_of_date, con)
+
+
+def policies_as_of(
+    as_of_date: date | datetime | str, con: duckdb.DuckDBPyConnection | None = None
+) -> pd.DataFrame:
+    """Return fact_policies as of the end of the given date."""
+    return as_of("policies", as_of_date, con)
+
+
+def point_in_time_join(
+    labels: pd.DataFrame,
+    date_column: str = "data_riferimento",
+    entity: str = "customers",
+    key: str = "codice_cliente",
+    con: duckdb.DuckDBPyConnection | None = None,
+) -> pd.DataFrame:
+    """Attach to every label row the entity features valid at the row's reference date.
+
+    ``labels`` needs a ``key`` column and a ``date_column``. All label rows are kept; rows
+    whose entity did not exist at that date get NULL features. Joining ``policies`` returns
+    one row per policy the customer held at that date.
+    """
+    table = _snapshot_table(entity)
+    missing = {key, date_column} - set(labels.columns)
+    if missing:
+        raise ValueError(f"labels is missing column(s): {', '.join(sorted(missing))}")
+
+    con = con or shared_connection().cursor()
+    con.register("pit_labels", labels)
+    try:
+        return con.execute(
+            f"""
+            SELECT l.*, s.* EXCLUDE ({key}, {_SNAPSHOT_COLUMNS})
+            FROM pit_labels AS l
+            LEFT JOIN {table} AS s
+                ON s.{key} = l.{key}
+                AND s.dbt_valid_from < l.{date_column}::DATE + INTERVAL 1 DAY
+                AND (
+                    s.dbt_valid_to IS NULL
+                    OR s.dbt_valid_to >= l.{date_column}::DATE + INTERVAL 1 DAY
+                )
+        """
+        ).df()
+    finally:
+        con.unregister("pit_labels")
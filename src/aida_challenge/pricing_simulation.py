@@ -0,0 +1,328 @@
+"""What-if pricing scenarios over the active policies of ``main_marts.fact_policies``.
+
+A scenario changes the premium of the policies matching its filters (product, need area,
+agency, zone, minimum loss ratio). The portfolio is loaded once into NumPy arrays and
+simulated in batches of Monte Carlo draws spread over a process pool. In every draw each
+policy:
+
+- lapses with its customer's ``churn_probability``, shifted on the logit scale by
+  ``elasticity`` times the premium change, so price increases raise lapses;
+- if it stays, earns its premium net of commission (``commissione_perc``) and operating
+  costs, minus a claims cost drawn from a Gamma distribution with mean
+  ``loss_ratio * premio_totale_annuo`` and coefficient of variation ``claims_cv``.
+
+The baseline (unchanged premiums) is simulated on the same random numbers, so the margin
+change of a scenario is measured without the noise of two independent simulations.
+Margin and lapse distributions are aggregated per draw by product, by agency and in total::
+
+    from aida_challenge.pricing_simulation import Scenario, simulate_pricing
+
+    scenario = Scenario(change=0.05, prodotto="casa", zona_residenza="Nord", min_loss_ratio=1.0)
+    result = simulate_pricing(scenario, draws=2000)
+    result[result["dimensione"] == "prodotto"]
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import duckdb
+import numpy as np
+import pandas as pd
+
+from aida_challenge.publishing import shared_connection
+
+POLICIES_TABLE = "aida_challenge.main_marts.fact_policies"
+CUSTOMERS_TABLE = "aida_challenge.main_marts.dim_customers"
+
+DEFAULT_DRAWS = 1000
+DEFAULT_ELASTICITY = 2.0
+DEFAULT_CLAIMS_CV = 1.0
+
+# Policy x draw values simulated at once by a worker, bounding its memory use
+_BATCH_CELLS = 4_000_000
+
+_PERCENTILES = [5, 50, 95]
+
+# Portfolio arrays loaded once per worker process by _init_worker
+_worker_portfolio: dict[str, np.ndarray] | None = None
+
+
+@dataclass
+class Scenario:
+    """A premium change applied to the active policies matching every given filter."""
+
+    change: float
+    prodotto: str | None = None
+    area_bisogno: str | None = None
+    agenzia: str | None = None
+    zona_residenza: str | None = None
+    min_loss_ratio: float | None = None
+    elasticity: float = DEFAULT_ELASTICITY
+    claims_cv: float = DEFAULT_CLAIMS_CV
+
+    def filter_sql(self) -> tuple[str, list]:
+        """Return the SQL condition selecting the policies in scope, and its parameters."""
+        conditions, params = ["true"], []
+        # Product names are long, so a case-insensitive part of the name is enough
+        if self.prodotto is not None:
+            conditions.append("contains(lower(p.prodotto::VARCHAR), lower(?))")
+            params.append(self.prodotto)
+        for column in ("area_bisogno", "agenzia", "zona_residenza"):
+            value = getattr(self, column)
+            if value is not None:
+                conditions.append(f"p.{column}::VARCHAR = ?")
+                params.append(value)
+        if self.min_loss_ratio is not None:
+            conditions.append("p.loss_ratio >= ?")
+            params.append(self.min_loss_ratio)
+        return " AND ".join(conditions), params
+
+
+def load_portfolio(
+    scenario: Scenario, con: duckdb.DuckDBPyConnection | None = None
+) -> tuple[dict[str, np.ndarray], pd.DataFrame]:
+    """Load the active policies as arrays, and the (product, agency) cells they fall in.
+
+    The arrays hold one value per policy; ``cell`` indexes the rows of the returned cells.
+    """
+    con = con or shared_connection().cursor()
+    condition, params = scenario.filter_sql()
+    policies = con.execute(
+        f"""
+        SELECT
+            p.prodotto::VARCHAR AS prodotto,
+            coalesce(p.agenzia, 'N/D') AS agenzia,
+            coalesce(p.premio_totale_annuo, 0)::DOUBLE AS premio,
+            coalesce(p.commissione_perc, 0)::DOUBLE AS commissione_perc,
+            coalesce(p.costi_operativi, 0)::DOUBLE AS costi_operativi,
+            greatest(coalesce(p.loss_ratio, 0), 0)::DOUBLE AS loss_ratio,
+            least(greatest(coalesce(c.churn_probability, 0), 0), 1)::DOUBLE AS prob_disdetta,
+            ({condition}) AS in_scenario
+        FROM {POLICIES_TABLE} AS p
+        LEFT JOIN {CUSTOMERS_TABLE} AS c ON p.codice_cliente = c.codice_cliente
+        WHERE p.stato_polizza = 'Attiva'
+    """,
+        params,
+    ).df()
+
+    cells = policies[["prodotto", "agenzia"]].drop_duplicates().sort_values(["prodotto", "agenzia"])
+    cells = cells.reset_index(drop=True)
+    cell_index = pd.MultiIndex.from_frame(cells).get_indexer(
+        pd.MultiIndex.from_frame(policies[["prodotto", "agenzia"]])
+    )
+    portfolio = {
+        "cell": cell_index.astype(np.int64),
+        "premio": policies["premio"].to_numpy(np.float64),
+        "commissione_perc": policies["commissione_perc"].to_numpy(np.float64),
+        "costi_operativi": policies["costi_operativi"].to_numpy(np.float64),
+        "loss_ratio": policies["loss_ratio"].to_numpy(np.float64),
+        "prob_disdetta": policies["prob_disdetta"].to_numpy(np.float64),
+        "in_scenario": policies["in_scenario"].to_numpy(bool),
+    }
+    cells["polizze"] = np.bincount(cell_index, minlength=len(cells))
+    cells["polizze_scenario"] = np.bincount(
+        cell_index, weights=portfolio["in_scenario"], minlength=len(cells)
+    ).astype(np.int64)
+    return portfolio, cells
+
+
+def _init_worker(portfolio: dict[str, np.ndarray]) -> None:
+    """Keep the portfolio arrays in a worker process."""
+    global _worker_portfolio
+    _worker_portfolio = portfolio
+
+
+def _lapse_probability(base: np.ndarray, change: np.ndarray, elasticity: float) -> np.ndarray:
+    """Shift lapse probabilities on the logit scale in proportion to the premium change."""
+    base = np.clip(base, 1e-6, 1 - 1e-6)
+    logit = np.log(base / (1 - base)) + elasticity * change
+    return 1 / (1 + np.exp(-logit))
+
+
+def _simulate_batch(
+    scenario: Scenario, draws: int, num_cells: int, seed: np.random.SeedSequence
+) -> dict[str, np.ndarray]:
+    """Simulate a batch of draws; returns (draws x cells) margin and lapse sums."""
+    assert _worker_portfolio is not None
+    p = _worker_portfolio
+    n = len(p["premio"])
+    rng = np.random.default_rng(seed)
+
+    change = np.where(p["in_scenario"], scenario.change, 0.0)
+    new_premium = p["premio"] * (1 + change)
+    base_prob = np.clip(p["prob_disdetta"], 0, 1)
+    scenario_prob = np.where(
+        p["in_scenario"], _lapse_probability(base_prob, change, scenario.elasticity), base_prob
+    )
+
+    # Same uniforms for baseline and scenario: a policy lapsing in the baseline also
+    # lapses after a price increase in that draw
+    u = rng.random((draws, n))
+    base_lapse = u < base_prob
+    scenario_lapse = u < scenario_prob
+
+    # Claims do not depend on the premium charged: Gamma noise around the expected cost
+    shape = 1 / scenario.claims_cv**2
+    claims = rng.gamma(shape, 1 / shape, (draws, n)) * (p["loss_ratio"] * p["premio"])
+    base_margin = p["premio"] * (1 - p["commissione_perc"]) - p["costi_operativi"] - claims
+    scenario_margin = base_margin + (new_premium - p["premio"]) * (1 - p["commissione_perc"])
+
+    # One bincount per quantity: draw d, cell c is bin d * num_cells + c
+    bins = (np.arange(draws)[:, None] * num_cells + p["cell"]).ravel()
+
+    def per_cell(values: np.ndarray) -> np.ndarray:
+        sums = np.bincount(bins, weights=values.ravel(), minlength=draws * num_cells)
+        return sums.reshape(draws, num_cells)
+
+    return {
+        "margine_base": per_cell(np.where(base_lapse, 0.0, base_margin)),
+        "margine_scenario": per_cell(np.where(scenario_lapse, 0.0, scenario_margin)),
+        "disdette_base": per_cell(base_lapse.astype(np.float64)),
+        "disdette_scenario": per_cell(scenario_lapse.astype(np.float64)),
+    }
+
+
+def _summarize(dimension: str, groups: pd.DataFrame, sims: dict[str, np.ndarray]) -> pd.DataFrame:
+    """Summarize the (draws x groups) simulations of one grouping into distribution stats."""
+    delta = sims["margine_scenario"] - sims["margine_base"]
+    summary = groups.assign(dimensione=dimension)
+    summary["margine_base_medio"] = sims["margine_base"].mean(axis=0)
+    summary["margine_scenario_medio"] = sims["margine_scenario"].mean(axis=0)
+    for q, values in zip(
+        _PERCENTILES, np.percentile(sims["margine_scenario"], _PERCENTILES, axis=0)
+    ):
+        summary[f"margine_scenario_p{q:02d}"] = values
+    summary["delta_margine_medio"] = delta.mean(axis=0)
+    for q, values in zip(_PERCENTILES, np.percentile(delta, _PERCENTILES, axis=0)):
+        summary[f"delta_margine_p{q:02d}"] = values
+    summary["prob_margine_inferiore"] = (delta < 0).mean(axis=0)
+    summary["disdette_base_attese"] = sims["disdette_base"].mean(axis=0)
+    summary["disdette_scenario_attese"] = sims["disdette_scenario"].mean(axis=0)
+    return summary
+
+
+def simulate_pricing(
+    scenario: Scenario,
+    draws: int = DEFAULT_DRAWS,
+    workers: int | None = None,
+    seed: int = 42,
+    con: duckdb.DuckDBPyConnection | None = None,
+) -> pd.DataFrame:
+    """Simulate a pricing scenario and return its margin and lapse distributions.
+
+    One row per product, per agency and for the whole portfolio (``dimensione`` is
+    ``prodotto``, ``agenzia`` or ``totale``). Results only depend on ``seed``, not on the
+    number of workers.
+    """
+    portfolio, cells = load_portfolio(scenario, con)
+    num_policies, num_cells = len(portfolio["premio"]), len(cells)
+    if num_policies == 0:
+        raise ValueError(f"No active policies in {POLICIES_TABLE}")
+
+    per_batch = max(1, min(draws, _BATCH_CELLS // num_policies))
+    batches = [min(per_batch, draws - start) for start in range(0, draws, per_batch)]
+    seeds = np.random.SeedSequence(seed).spawn(len(batches))
+    with ProcessPoolExecutor(
+        max_workers=workers or os.cpu_count(), initializer=_init_worker, initargs=(portfolio,)
+    ) as pool:
+        futures = [
+            pool.submit(_simulate_batch, scenario, size, num_cells, batch_seed)
+            for size, batch_seed in zip(batches, seeds)
+        ]
+        results = [future.result() for future in futures]
+    sims = {key: np.concatenate([r[key] for r in results]) for key in results[0]}
+
+    summaries = []
+    for dimension in ("prodotto", "agenzia"):
+        codes, labels = pd.factorize(cells[dimension], sort=True)
+        # (draws x cells) @ (cells x groups) sums the cells of every group in each draw
+        membership = np.zeros((num_cells, len(labels)))
+        membership[np.arange(num_cells), codes] = 1
+        groups = cells.groupby(dimension, sort=True)[["polizze", "polizze_scenario"]].sum()
+        groups = groups.reset_index().rename(columns={dimension: "gruppo"})
+        summaries.append(
+            _summarize(dimension, groups, {k: v @ membership for k, v in sims.items()})
+        )
+    total = pd.DataFrame(
+        {
+            "gruppo": ["Totale"],
+            "polizze": [cells["polizze"].sum()],
+            "polizze_scenario": [cells["polizze_scenario"].sum()],
+        }
+    )
+    summaries.append(
+        _summarize("totale", total, {k: v.sum(axis=1, keepdims=True) for k, v in sims.items()})
+    )
+    result = pd.concat(summaries, ignore_index=True)
+    return result[["dimensione", *[c for c in result.columns if c != "dimensione"]]]
+
+
+def simulate_pricing_command() -> int:
+    """Simulate a what-if premium change over the active policies."""
+    parser = argparse.ArgumentParser(description=simulate_pricing_command.__doc__)
+    parser.add_argument("--change", type=float, required=True, help="e.g. 0.05 for +5%%")
+    parser.add_argument("--product", help="part of the product name, case-insensitive")
+    parser.add_argument("--need-area", help="area di bisogno")
+    parser.add_argument("--agency")
+    parser.add_argument("--zone", help="zona di residenza")
+    parser.add_argument("--min-loss-ratio", type=float)
+    parser.add_argument("--elasticity", type=float, default=DEFAULT_ELASTICITY)
+    parser.add_argument("--claims-cv", type=float, default=DEFAULT_CLAIMS_CV)
+    parser.add_argument("--draws", type=int, default=DEFAULT_DRAWS)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="also write the full results to this CSV file")
+    args = parser.parse_args()
+
+    if args.draws < 1 or args.claims_cv <= 0 or args.change <= -1:
+        print("ERROR: --draws must be positive, --claims-cv above 0 and --change above -1.")
+        return 1
+    scenario = Scenario(
+        change=args.change,
+        prodotto=args.product,
+        area_bisogno=args.need_area,
+        agenzia=args.agency,
+        zona_residenza=args.zone,
+        min_loss_ratio=args.min_loss_ratio,
+        elasticity=args.elasticity,
+        claims_cv=args.claims_cv,
+    )
+
+    start = time.perf_counter()
+    try:
+        result = simulate_pricing(scenario, args.draws, args.workers, args.seed)
+    except (duckdb.Error, ValueError) as e:
+        print(f"ERROR: {e}")
+        return 1
+    elapsed = time.perf_counter() - start
+
+    total = result[result["dimensione"] == "totale"].iloc[0]
+    if total["polizze_scenario"] == 0:
+        print("WARNING: No active policy matches the scenario filters.")
+    print(
+        f"Scenario {args.change:+.1%} on {total['polizze_scenario']:,} of "
+        f"{total['polizze']:,} active policies, {args.draws:,} draws in {elapsed:.2f}s"
+    )
+    columns = [
+        "gruppo",
+        "polizze_scenario",
+        "margine_base_medio",
+        "margine_scenario_medio",
+        "delta_margine_medio",
+        "delta_margine_p05",
+        "delta_margine_p95",
+        "disdette_base_attese",
+        "disdette_scenario_attese",
+    ]
+    with pd.option_context("display.width", 200, "display.float_format", "{:,.1f}".format):
+        for dimension in ("prodotto", "agenzia", "totale"):
+            print(f"\nBy {dimension}:")
+            print(result.loc[result["dimensione"] == dimension, columns].to_string(index=False))
+
+    if args.output:
+        result.to_csv(args.output, index=False)
+        print(f"\n[OK] Results written to: {args.output}")
+    return 0
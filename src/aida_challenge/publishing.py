@@ -0,0 +1,243 @@
+"""Versioned database publishing (build-then-swap) utilities.
+
+dbt normally writes into ``data/aida_challenge.duckdb``, the same file the dashboard
+reads. In publish mode every build goes into a fresh ``data/versions/<version>/`` directory
+and readers only switch to it once the build has completed, by following the ``CURRENT``
+pointer file which is replaced atomically.
+
+Each version keeps the ``aida_challenge.duckdb`` file name so the catalog name used in
+queries (``aida_challenge.main_marts...``) is the same for every version.
+
+The schemas and tables that accumulate history across builds (``HISTORY_SCHEMAS``,
+``HISTORY_TABLES``) have a single source of truth: the published version. New versions
+are seeded with the working database, then their history is replaced by the published
+one. Once a version is published, ``dbt-build`` and ``dbt-run`` leave the history models
+(and the models built from them) out of builds of the working database, so its copy of
+the history stops changing and is only ever read by the first publish.
+
+The tables written by the scoring and segmentation jobs (``DERIVED_SCHEMAS``) are not
+built by dbt either. Once a version is published, the jobs write them into a new version
+copied from the published one (``derived_version``), which is published when they
+complete, and every dbt build carries them forward like the history.
+"""
+
+import os
+import shutil
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import duckdb
+
+ROOT = Path(__file__).parent.parent.parent
+DATA_DIR = ROOT / "data"
+DB_FILENAME = "aida_challenge.duckdb"
+WORKING_DB_PATH = DATA_DIR / DB_FILENAME
+VERSIONS_DIR = DATA_DIR / "versions"
+CURRENT_POINTER = DATA_DIR / "CURRENT"
+
+# Current version plus the previous one, so readers still holding it are not disturbed
+KEEP_VERSIONS = 2
+
+# Schemas whose tables cannot be rebuilt from the raw data (dbt snapshots)
+HISTORY_SCHEMAS = ["main_snapshots"]
+
+# Incremental models that cannot be rebuilt either (what earlier builds already emitted)
+HISTORY_TABLES = ["main_marts.mart_renewal_feed"]
+
+# Schemas written outside dbt, by the scoring and segmentation jobs
+DERIVED_SCHEMAS = ["main_scoring", "main_segmentation"]
+
+# Shared read-only connections, one per database file
+_connections: dict[Path, duckdb.DuckDBPyConnection] = {}
+_connections_lock = threading.Lock()
+
+
+def working_db_path() -> Path:
+    """Return the path of the working database (raw data and in-place builds)."""
+    return WORKING_DB_PATH
+
+
+def current_version() -> str | None:
+    """Return the name of the currently published version, if any."""
+    if not CURRENT_POINTER.exists():
+        return None
+    version = CURRENT_POINTER.read_text(encoding="utf-8").strip()
+    if not version or not (VERSIONS_DIR / version / DB_FILENAME).exists():
+        return None
+    return version
+
+
+def current_db_path() -> Path:
+    """Return the database readers should open.
+
+    This is the published version when one exists, otherwise the working database.
+    """
+    version = current_version()
+    if version is None:
+        return WORKING_DB_PATH
+    return VERSIONS_DIR / version / DB_FILENAME
+
+
+def shared_connection(db_path: Path | None = None) -> duckdb.DuckDBPyConnection:
+    """Return the shared read-only connection to a database, by default the current one.
+
+    The connection is opened once per database file and kept, so a newly published
+    version gets its own connection while readers of the previous one are undisturbed.
+    It is shared by every caller: query through ``.cursor()`` from threads. A read-only
+    connection blocks writers in other processes, so call ``close_shared_connections()``
+    before building the working database from elsewhere.
+    """
+    db_path = db_path or current_db_path()
+    with _connections_lock:
+        if db_path not in _connections:
+            _connections[db_path] = duckdb.connect(str(db_path), read_only=True)
+        return _connections[db_path]
+
+
+def close_shared_connections() -> None:
+    """Close the shared read-only connections."""
+    with _connections_lock:
+        while _connections:
+            _connections.popitem()[1].close()
+
+
+def list_versions() -> list[str]:
+    """Return all version names, oldest first."""
+    if not VERSIONS_DIR.exists():
+        return []
+    return sorted(p.name for p in VERSIONS_DIR.iterdir() if p.is_dir())
+
+
+def _new_version_path() -> Path:
+    """Create the directory of a new version and return its database file path."""
+    version = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    version_path = VERSIONS_DIR / version / DB_FILENAME
+    version_path.parent.mkdir(parents=True)
+    return version_path
+
+
+def prepare_version() -> Path:
+    """Create a new version seeded with the working database and return its file path."""
+    version_path = _new_version_path()
+    print(f"Preparing new database version: {version_path.parent.name}")
+    shutil.copy2(WORKING_DB_PATH, version_path)
+    carry_forward_history(version_path)
+    return version_path
+
+
+@contextmanager
+def derived_version() -> Iterator[Path]:
+    """Yield the database to write derived tables to, and publish them when done.
+
+    Before the first publish this is the working database, written in place. Afterwards
+    it is a new version copied from the published one: it is published when the block
+    completes and discarded when the block raises, so readers never see a partial write.
+    """
+    published = current_version()
+    if published is None:
+        yield WORKING_DB_PATH
+        return
+
+    version_path = _new_version_path()
+    print(f"Preparing new database version {version_path.parent.name} from {published}")
+    shutil.copy2(VERSIONS_DIR / published / DB_FILENAME, version_path)
+    try:
+        yield version_path
+    except BaseException:
+        discard_version(version_path)
+        raise
+    publish_version(version_path)
+    collect_garbage()
+
+
+def carry_forward_history(version_path: Path) -> list[str]:
+    """Replace the history and derived tables of a new version with the published ones.
+
+    Returns the copied tables and views. Nothing is copied when no version is published
+    yet, so the first version keeps the history built in the working database.
+    """
+    published = current_version()
+    if published is None:
+        return []
+
+    copied = []
+    con = duckdb.connect(str(version_path))
+    try:
+        con.execute(f"ATTACH '{VERSIONS_DIR / published / DB_FILENAME}' AS published (READ_ONLY)")
+        con.execute("USE aida_challenge")
+        schemas = HISTORY_SCHEMAS + DERIVED_SCHEMAS
+        # Recreated from their DDL, which keeps the keys INSERT OR REPLACE relies on
+        tables = con.execute(
+            """
+            SELECT schema_name, table_name, sql FROM duckdb_tables()
+            WHERE database_name = 'published'
+                AND (schema_name IN (SELECT unnest(?))
+                    OR schema_name || '.' || table_name IN (SELECT unnest(?)))
+        """,
+            [schemas, HISTORY_TABLES],
+        ).fetchall()
+        for schema, table, table_sql in tables:
+            con.execute(f"CREATE SCHEMA IF NOT EXISTS {schema}")
+            con.execute(f"DROP TABLE IF EXISTS {schema}.{table}")
+            con.execute(table_sql)
+            con.execute(f"INSERT INTO {schema}.{table} SELECT * FROM published.{schema}.{table}")
+            copied.append(f"{schema}.{table}")
+        # Views over the copied tables (main_scoring.scores_latest)
+        views = con.execute(
+            """
+            SELECT schema_name, view_name, sql FROM duckdb_views()
+            WHERE database_name = 'published' AND NOT internal
+                AND schema_name IN (SELECT unnest(?))
+        """,
+            [schemas],
+        ).fetchall()
+        for schema, view, view_sql in views:
+            con.execute(f"DROP VIEW IF EXISTS {schema}.{view}")
+            con.execute(view_sql)
+            copied.append(f"{schema}.{view}")
+    finally:
+        con.close()
+
+    if copied:
+        print(f"Carried forward {len(copied)} history table(s) and view(s) from {published}")
+    return copied
+
+
+def discard_version(version_path: Path) -> None:
+    """Delete an unpublished version (e.g. after a failed build)."""
+    version = version_path.parent.name
+    if version == current_version():
+        raise ValueError(f"Refusing to discard the published version: {version}")
+    shutil.rmtree(version_path.parent, ignore_errors=True)
+    print(f"Discarded unpublished version: {version}")
+
+
+def publish_version(version_path: Path) -> None:
+    """Atomically point readers to a completed version."""
+    version = version_path.parent.name
+    tmp_pointer = CURRENT_POINTER.with_suffix(".tmp")
+    tmp_pointer.write_text(version, encoding="utf-8")
+    os.replace(tmp_pointer, CURRENT_POINTER)
+    print(f"[OK] Published database version: {version}")
+
+
+def collect_garbage(keep: int = KEEP_VERSIONS) -> list[str]:
+    """Delete old versions, keeping the newest ``keep`` and always the published one."""
+    current = current_version()
+    versions = list_versions()
+    removed = []
+    for version in versions[: max(len(versions) - keep, 0)]:
+        if version == current:
+            continue
+        try:
+            shutil.rmtree(VERSIONS_DIR / version)
+        except OSError as e:
+            # Still open by a reader on platforms that lock open files; retry next publish
+            print(f"WARNING: Could not remove version {version}: {e}")
+            continue
+        removed.append(version)
+        print(f"Removed old version: {version}")
+    return removed
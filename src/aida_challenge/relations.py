@@ -0,0 +1,159 @@
+"""Lazy relations over the dbt models, for notebooks and services.
+
+Every function returns a DuckDB relation instead of a DataFrame. Relations are lazy:
+``filter``, ``project``, ``join``, ``aggregate``, ``order`` and ``limit`` only compose a
+query, which DuckDB optimizes and runs as a whole when the result is materialized, so
+filters and projections are applied while scanning instead of on a full pandas copy::
+
+    from aida_challenge import relations
+
+    customers = relations.dim_customers()
+    policies = (
+        relations.fact_policies()
+        .filter("stato_polizza = 'Attiva'")
+        .project("codice_cliente, premio_totale_annuo")
+    )
+    by_agency = customers.join(policies, "codice_cliente").aggregate(
+        "agenzia, count(*) AS polizze, sum(premio_totale_annuo) AS premi", "agenzia"
+    )
+
+    by_agency.df()                                # pandas
+    relations.to_arrow(by_agency)                 # Arrow table (requires pyarrow)
+    for batch in relations.iter_batches(customers, batch_size=50_000):
+        ...                                       # pandas (or Arrow) batches
+
+Relations that are combined must come from the same connection; all functions use one
+shared read-only connection to the published database unless ``con`` is given. A
+read-only connection blocks writers in other processes, so call ``close()`` before
+running ``dbt-build`` on the same database from elsewhere.
+"""
+
+from collections.abc import Iterator
+
+import duckdb
+import pandas as pd
+
+from aida_challenge.publishing import close_shared_connections, shared_connection
+
+CATALOG = "aida_challenge"
+
+# dbt layers in the order names are resolved in
+LAYERS = {
+    "marts": "main_marts",
+    "intermediate": "main_intermediate",
+    "staging": "main_staging",
+}
+
+# DuckDB produces results in vectors of this many rows
+_VECTOR_SIZE = 2048
+
+
+def connection() -> duckdb.DuckDBPyConnection:
+    """Return the shared read-only connection to the currently published database."""
+    return shared_connection()
+
+
+def close() -> None:
+    """Close the shared connections; relations built on them can no longer be read."""
+    close_shared_connections()
+
+
+def list_models(
+    layer: str | None = None, con: duckdb.DuckDBPyConnection | None = None
+) -> dict[str, list[str]]:
+    """Return the model names of each layer (or of one layer) in the database."""
+    layers = LAYERS if layer is None else {layer: _schema(layer)}
+    con = con or connection()
+    rows = con.execute(
+        """
+        SELECT table_schema, table_name
+        FROM information_schema.tables
+        WHERE table_catalog = ? AND table_schema IN (SELECT unnest(?))
+        ORDER BY table_name
+    """,
+        [CATALOG, list(layers.values())],
+    ).fetchall()
+    return {
+        name: [table for schema, table in rows if schema == layer_schema]
+        for name, layer_schema in layers.items()
+    }
+
+
+def _schema(layer: str) -> str:
+    """Return the schema of a dbt layer, rejecting unknown layers."""
+    if layer not in LAYERS:
+        raise ValueError(f"Unknown layer '{layer}', expected one of: {', '.join(LAYERS)}")
+    return LAYERS[layer]
+
+
+def model(name: str, con: duckdb.DuckDBPyConnection | None = None) -> duckdb.DuckDBPyRelation:
+    """Return a dbt model as a lazy relation.
+
+    ``name`` is a model name (``dim_customers``, ``int_customer_policies``, ``stg_polizze``),
+    looked up in the marts, intermediate and staging layers in turn, or a qualified
+    ``layer.model`` name.
+    """
+    con = con or connection()
+    layer, _, table = name.rpartition(".")
+    models = list_models(layer or None, con)
+    for layer_name, tables in models.items():
+        if table in tables:
+            # Staging and intermediate models are views, which con.table() does not read
+            relation = con.sql(f"FROM {CATALOG}.{LAYERS[layer_name]}.{table}")
+            return relation.set_alias(table)
+    raise ValueError(f"Unknown model '{name}' in layer(s): {', '.join(models)}")
+
+
+def dim_customers(con: duckdb.DuckDBPyConnection | None = None) -> duckdb.DuckDBPyRelation:
+    """Return the customer dimension as a lazy relation."""
+    return model("marts.dim_customers", con)
+
+
+def fact_policies(con: duckdb.DuckDBPyConnection | None = None) -> duckdb.DuckDBPyRelation:
+    """Return the policy fact table as a lazy relation."""
+    return model("marts.fact_policies", con)
+
+
+def sql(query: str, con: duckdb.DuckDBPyConnection | None = None) -> duckdb.DuckDBPyRelation:
+    """Return a SQL query as a lazy relation, composable with the model relations."""
+    return (con or connection()).sql(query)
+
+
+def to_pandas(relation: duckdb.DuckDBPyRelation) -> pd.DataFrame:
+    """Run a relation and return the result as a pandas DataFrame."""
+    return relation.df()
+
+
+def to_arrow(relation: duckdb.DuckDBPyRelation):
+    """Run a relation and return the result as an Arrow table (requires pyarrow)."""
+    _require_pyarrow()
+    return relation.fetch_arrow_table()
+
+
+def iter_batches(
+    relation: duckdb.DuckDBPyRelation, batch_size: int = 100_000, arrow: bool = False
+) -> Iterator:
+    """Run a relation and yield the result in batches of about ``batch_size`` rows.
+
+    Batches are pandas DataFrames, or Arrow record batches with ``arrow=True``. Only one
+    batch is held in memory at a time.
+    """
+    # A new relation, so reading its result does not consume the caller's relation
+    result = relation.project("*")
+    if arrow:
+        _require_pyarrow()
+        yield from result.fetch_record_batch(batch_size)
+        return
+    vectors = max(1, batch_size // _VECTOR_SIZE)
+    while len(batch := result.fetch_df_chunk(vectors)):
+        yield batch
+
+
+def _require_pyarrow() -> None:
+    """Raise a helpful error when pyarrow is not installed."""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise ImportError(
+            "pyarrow is required for Arrow results. Install it with 'uv sync --extra export'."
+        ) from None
@@ -0,0 +1,73 @@
+"""Renewal range queries and the daily renewal feed.
+
+``main_marts.mart_renewal_calendar`` stores the active policies in expiry date and agency
+order, so a query on an expiry date range is answered from the row groups whose min/max
+statistics overlap it. ``main_marts.mart_renewal_feed`` is appended by every build with
+the policies that entered the renewal window, in feed order, so a poll for the renewals
+emitted since the previous poll only reads the newest rows::
+
+    from aida_challenge.renewals import renewal_feed, renewals_between
+
+    renewals_between("2025-07-01", "2025-07-31", agenzia="Agenzia_Roma_1")
+    feed = renewal_feed()              # renewals emitted by the latest build
+    renewal_feed(since=feed["_dbt_loaded_at"].max())   # next poll: only newer renewals
+"""
+
+from datetime import date, datetime
+
+import duckdb
+import pandas as pd
+
+from aida_challenge.publishing import shared_connection
+
+CALENDAR_TABLE = "aida_challenge.main_marts.mart_renewal_calendar"
+FEED_TABLE = "aida_challenge.main_marts.mart_renewal_feed"
+
+
+def renewals_between(
+    start: date | datetime | str,
+    end: date | datetime | str,
+    agenzia: str | None = None,
+    con: duckdb.DuckDBPyConnection | None = None,
+) -> pd.DataFrame:
+    """Return the active policies expiring between two dates (inclusive), soonest first."""
+    con = con or shared_connection().cursor()
+    return con.execute(
+        f"""
+        SELECT *, datediff('day', current_date, data_scadenza) AS giorni_alla_scadenza
+        FROM {CALENDAR_TABLE}
+        WHERE data_scadenza BETWEEN ?::DATE AND ?::DATE
+            AND (?::VARCHAR IS NULL OR agenzia = ?)
+        ORDER BY data_scadenza, agenzia, codice_cliente
+    """,
+        [start, end, agenzia, agenzia],
+    ).df()
+
+
+def renewal_feed(
+    since: date | datetime | str | None = None,
+    agenzia: str | None = None,
+    con: duckdb.DuckDBPyConnection | None = None,
+) -> pd.DataFrame:
+    """Return the renewals emitted by builds after ``since``, or by the latest build.
+
+    Pass the largest ``_dbt_loaded_at`` already processed as ``since`` to receive every
+    renewal exactly once, however often the feed is polled and however many builds run
+    in a day.
+    """
+    con = con or shared_connection().cursor()
+    if since is None:
+        condition = f"_dbt_loaded_at = (SELECT max(_dbt_loaded_at) FROM {FEED_TABLE})"
+        params = []
+    else:
+        condition, params = "_dbt_loaded_at > ?::TIMESTAMPTZ", [since]
+    return con.execute(
+        f"""
+        SELECT *
+        FROM {FEED_TABLE}
+        WHERE {condition}
+            AND (?::VARCHAR IS NULL OR agenzia = ?)
+        ORDER BY data_feed, agenzia, data_scadenza
+    """,
+        [*params, agenzia, agenzia],
+    ).df()
@@ -0,0 +1,283 @@
+"""Batch scoring of customers for churn and cross-sell propensity.
+
+Features are read from ``main_marts.dim_customers`` in vectorized chunks and scored by a
+trained model in a process pool. Results go to the versioned ``main_scoring.scores``
+table (one row per customer and model version) of the database the dashboard reads, in a
+new published version once one exists. Scoring is incremental: a customer is only
+re-scored when the model version is new or its features changed since the last run,
+which is detected through a hash of the feature values.
+
+Until observed outcomes are available, the models are trained on proxy labels derived
+from the marts (see ``LABELS``).
+"""
+
+import argparse
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+import duckdb
+import numpy as np
+import pandas as pd
+
+from aida_challenge.features import (
+    DEFAULT_CHUNK_SIZE,
+    MODELS_DIR,
+    SOURCE_TABLE,
+    feature_sql,
+    has_pending_rows,
+    hash_sql,
+    iter_chunks,
+    latest_model_path,
+    output_database,
+)
+from aida_challenge.publishing import current_db_path
+
+SCORES_SCHEMA = "aida_challenge.main_scoring"
+SCORES_TABLE = f"{SCORES_SCHEMA}.scores"
+
+# Product-mix counts are left out: distinct products minus protection products is the
+# number of investment products, i.e. the cross-sell label itself
+FEATURES = [
+    "eta",
+    "reddito",
+    "clv_stimato",
+    "engagement_score",
+    "satisfaction_score",
+    "potenziale_crescita",
+    "num_polizze_totali",
+    "premio_annuo_medio",
+    "num_interazioni_totali",
+    "tasso_conversione",
+    "num_esiti_positivi",
+    "num_sinistri_totali",
+    "frequenza_sinistri_annua",
+]
+
+# Proxy targets: lapsed customers (all policies expired) and investment product holders
+LABELS = {
+    "churn": "num_polizze_totali > 0 AND num_polizze_attive = 0",
+    "cross_sell": "num_prodotti_investimento > 0",
+}
+
+# Model loaded once per worker process by _init_worker
+_worker_model: dict[str, Any] | None = None
+
+
+def _init_worker(model_path: str) -> None:
+    """Load the model into a worker process."""
+    global _worker_model
+    with open(model_path, "rb") as f:
+        _worker_model = pickle.load(f)
+
+
+def _score_chunk(features: np.ndarray) -> dict[str, np.ndarray]:
+    """Score one chunk of feature rows with every model in the bundle."""
+    assert _worker_model is not None
+    return {
+        target: estimator.predict_proba(features)[:, 1]
+        for target, estimator in _worker_model["estimators"].items()
+    }
+
+
+def _ensure_scores_table(con: duckdb.DuckDBPyConnection) -> None:
+    """Create the scores table and its latest-version view if needed."""
+    con.execute(f"CREATE SCHEMA IF NOT EXISTS {SCORES_SCHEMA}")
+    con.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {SCORES_TABLE} (
+            codice_cliente BIGINT NOT NULL,
+            model_version VARCHAR NOT NULL,
+            churn_score DOUBLE,
+            cross_sell_score DOUBLE,
+            feature_hash UBIGINT NOT NULL,
+            scored_at TIMESTAMP NOT NULL,
+            PRIMARY KEY (codice_cliente, model_version)
+        )
+    """
+    )
+    con.execute(
+        f"""
+        CREATE OR REPLACE VIEW {SCORES_SCHEMA}.scores_latest AS
+        SELECT * FROM {SCORES_TABLE}
+        WHERE model_version = (SELECT max(model_version) FROM {SCORES_TABLE})
+    """
+    )
+
+
+def train_scoring_models() -> int:
+    """Train the churn and cross-sell models on dim_customers and save them."""
+    parser = argparse.ArgumentParser(description=train_scoring_models.__doc__)
+    parser.add_argument(
+        "--db-path", default=str(current_db_path()), help="defaults to the published database"
+    )
+    parser.add_argument("--sample-size", type=int, default=500_000)
+    args = parser.parse_args()
+
+    try:
+        from sklearn.ensemble import HistGradientBoostingClassifier
+    except ImportError:
+        print("ERROR: scikit-learn is required to train models.")
+        print("Install it with 'uv sync --extra analysis'.")
+        return 1
+
+    con = duckdb.connect(args.db_path, read_only=True)
+    label_sql = ", ".join(f"({expr})::INTEGER AS {target}" for target, expr in LABELS.items())
+    df = con.execute(
+        f"""
+        SELECT {feature_sql(FEATURES)}, {label_sql}
+        FROM {SOURCE_TABLE}
+        USING SAMPLE reservoir({int(args.sample_size)} ROWS) REPEATABLE (42)
+    """
+    ).df()
+    con.close()
+    print(f"Training on {len(df):,} customers from {args.db_path}")
+
+    features = df[FEATURES].to_numpy()
+    estimators = {}
+    for target in LABELS:
+        labels = df[target].to_numpy()
+        if labels.min() == labels.max():
+            print(f"ERROR: Proxy label '{target}' has a single class, cannot train.")
+            return 1
+        estimators[target] = HistGradientBoostingClassifier(random_state=42).fit(features, labels)
+        print(f"OK Trained {target} model (positive rate {labels.mean():.1%})")
+
+    version = datetime.now().strftime("%Y%m%d_%H%M%S")
+    MODELS_DIR.mkdir(parents=True, exist_ok=True)
+    model_path = MODELS_DIR / f"scoring_{version}.pkl"
+    with open(model_path, "wb") as f:
+        pickle.dump({"version": version, "features": FEATURES, "estimators": estimators}, f)
+    print(f"\n[OK] Model {version} saved to: {model_path}")
+    return 0
+
+
+def _customers_to_score_sql(features: list[str], full: bool) -> str:
+    """Return the query reading the features of the customers to score with a model version.
+
+    Its parameter is the model version.
+    """
+    changed_filter = (
+        "" if full else "WHERE s.codice_cliente IS NULL OR s.feature_hash <> c.feature_hash"
+    )
+    return f"""
+        WITH customers AS (
+            SELECT codice_cliente, {hash_sql(features)} AS feature_hash, {feature_sql(features)}
+            FROM {SOURCE_TABLE}
+        )
+        SELECT c.*
+        FROM customers AS c
+        LEFT JOIN {SCORES_TABLE} AS s
+            ON s.codice_cliente = c.codice_cliente AND s.model_version = ?
+        {changed_filter}
+    """
+
+
+def _score(
+    con: duckdb.DuckDBPyConnection,
+    model_path: Path,
+    model_version: str,
+    features: list[str],
+    args: argparse.Namespace,
+) -> tuple[pd.DataFrame | None, float]:
+    """Score the new or changed customers into the scores table.
+
+    Returns the new scores (None when every customer is up to date) and the scoring time.
+    """
+    _ensure_scores_table(con)
+    query = _customers_to_score_sql(features, args.full)
+
+    start = time.perf_counter()
+    keys, hashes, futures = [], [], []
+    with ProcessPoolExecutor(
+        max_workers=args.workers, initializer=_init_worker, initargs=(str(model_path),)
+    ) as pool:
+        for chunk in iter_chunks(con, query, args.chunk_size, [model_version]):
+            keys.append(chunk["codice_cliente"].to_numpy(np.int64))
+            hashes.append(chunk["feature_hash"].to_numpy(np.uint64))
+            futures.append(pool.submit(_score_chunk, chunk[features].to_numpy(np.float64)))
+        results = [future.result() for future in futures]
+
+    if not results:
+        return None, time.perf_counter() - start
+
+    scores = pd.DataFrame(
+        {
+            "codice_cliente": np.concatenate(keys),
+            "model_version": model_version,
+            "churn_score": np.concatenate([r["churn"] for r in results]),
+            "cross_sell_score": np.concatenate([r["cross_sell"] for r in results]),
+            "feature_hash": np.concatenate(hashes),
+        }
+    )
+    elapsed = time.perf_counter() - start
+
+    con.register("new_scores", scores)
+    con.execute("BEGIN TRANSACTION")
+    con.execute(
+        f"""
+        DELETE FROM {SCORES_TABLE}
+        WHERE model_version = ?
+            AND codice_cliente IN (SELECT codice_cliente FROM new_scores)
+    """,
+        [model_version],
+    )
+    con.execute(
+        f"""
+        INSERT INTO {SCORES_TABLE}
+        SELECT codice_cliente, model_version, churn_score, cross_sell_score,
+            feature_hash, current_timestamp
+        FROM new_scores
+    """
+    )
+    con.execute("COMMIT")
+    return scores, elapsed
+
+
+def score_customers() -> int:
+    """Score new or changed customers and write them to main_scoring.scores."""
+    parser = argparse.ArgumentParser(description=score_customers.__doc__)
+    parser.add_argument(
+        "--db-path", help="database scored in place; defaults to a new published version"
+    )
+    parser.add_argument("--model-path", help="defaults to the latest trained model")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--full", action="store_true", help="re-score every customer")
+    args = parser.parse_args()
+
+    model_path = Path(args.model_path) if args.model_path else latest_model_path("scoring")
+    if model_path is None or not model_path.exists():
+        print("ERROR: No trained model found.")
+        print("Run 'uv run train-scoring-models' first.")
+        return 1
+    with open(model_path, "rb") as f:
+        model = pickle.load(f)
+    # Read the features the model was trained on, older models may use other ones
+    model_version, features = model["version"], model["features"]
+
+    # Checked before writing, so an up-to-date database is not copied into a new version
+    source_path = Path(args.db_path) if args.db_path else current_db_path()
+    query = _customers_to_score_sql(features, args.full)
+    if not has_pending_rows(source_path, query, [model_version]):
+        print("[OK] All customers are up to date, nothing to score.")
+        return 0
+
+    print(f"Scoring with model {model_version} using {args.workers} workers")
+    with output_database(args.db_path) as db_path:
+        con = duckdb.connect(str(db_path))
+        try:
+            scores, elapsed = _score(con, model_path, model_version, features, args)
+        finally:
+            con.close()
+
+    if scores is None:
+        print("[OK] All customers are up to date, nothing to score.")
+        return 0
+    print(f"OK Scored {len(scores):,} customers in {elapsed:.2f}s")
+    print(f"Throughput: {len(scores) / elapsed:,.0f} customers/s")
+    return 0
@@ -0,0 +1,298 @@
+"""Customer segmentation with mini-batch k-means over dim_customers.
+
+Fitting streams ``main_marts.dim_customers`` in chunks and updates the scaler and the
+centroids with ``partial_fit``, so memory use does not depend on the number of customers.
+Assignment is a vectorized nearest-centroid search in numpy and is incremental: only new
+customers, customers whose features changed (detected through a hash of the feature
+values) or customers assigned by an older model are reassigned.
+
+Results are written to ``main_segmentation.customer_segments`` and summarised in
+``main_segmentation.segment_profiles``, which the dashboard's Segmentation tab reads. Both
+are written to the database the dashboard reads, in a new published version once one
+exists.
+"""
+
+import argparse
+import pickle
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+import duckdb
+import numpy as np
+import pandas as pd
+
+from aida_challenge.features import (
+    DEFAULT_CHUNK_SIZE,
+    MODELS_DIR,
+    SOURCE_TABLE,
+    feature_sql,
+    has_pending_rows,
+    hash_sql,
+    iter_chunks,
+    latest_model_path,
+    output_database,
+)
+from aida_challenge.publishing import current_db_path
+
+SEGMENTS_SCHEMA = "aida_challenge.main_segmentation"
+SEGMENTS_TABLE = f"{SEGMENTS_SCHEMA}.customer_segments"
+PROFILES_TABLE = f"{SEGMENTS_SCHEMA}.segment_profiles"
+
+FEATURES = [
+    "eta",
+    "reddito",
+    "clv_stimato",
+    "engagement_score",
+    "churn_probability",
+    "satisfaction_score",
+    "potenziale_crescita",
+    "num_polizze_attive",
+    "premio_annuo_totale",
+    "num_interazioni_totali",
+    "tasso_conversione",
+    "frequenza_sinistri_annua",
+]
+
+DEFAULT_CLUSTERS = 6
+
+_FEATURE_SQL = feature_sql(FEATURES)
+
+
+def assign_nearest(model: dict[str, Any], features: np.ndarray) -> np.ndarray:
+    """Return the index of the nearest centroid for every feature row."""
+    scaled = (features - model["mean"]) / model["scale"]
+    centroids = model["centroids"]
+    # |x - c|^2 = |x|^2 - 2 x.c + |c|^2, and |x|^2 does not change the argmin
+    distances = (centroids**2).sum(axis=1) - 2 * scaled @ centroids.T
+    return distances.argmin(axis=1)
+
+
+def _ensure_tables(con: duckdb.DuckDBPyConnection) -> None:
+    """Create the segmentation schema and assignment table if needed."""
+    con.execute(f"CREATE SCHEMA IF NOT EXISTS {SEGMENTS_SCHEMA}")
+    con.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {SEGMENTS_TABLE} (
+            codice_cliente BIGINT PRIMARY KEY,
+            segmento INTEGER NOT NULL,
+            model_version VARCHAR NOT NULL,
+            feature_hash UBIGINT NOT NULL,
+            assigned_at TIMESTAMP NOT NULL
+        )
+    """
+    )
+
+
+def _refresh_profiles(con: duckdb.DuckDBPyConnection) -> None:
+    """Rebuild the per-segment summary read by the dashboard.
+
+    Rows with a null agenzia cover every customer; the others the customers of one agency.
+    """
+    averages = ",\n            ".join(f"avg(c.{f}) AS avg_{f}" for f in FEATURES)
+    con.execute(
+        f"""
+        CREATE OR REPLACE TABLE {PROFILES_TABLE} AS
+        SELECT
+            c.agenzia,
+            s.segmento,
+            'Segmento ' || s.segmento AS nome_segmento,
+            count(*) AS num_clienti,
+            {averages}
+        FROM {SEGMENTS_TABLE} AS s
+        JOIN {SOURCE_TABLE} AS c ON s.codice_cliente = c.codice_cliente
+        GROUP BY GROUPING SETS ((s.segmento), (c.agenzia, s.segmento))
+        ORDER BY c.agenzia NULLS FIRST, s.segmento
+    """
+    )
+
+
+def _load_model(model_path: Path) -> dict[str, Any]:
+    """Load a fitted segmentation model."""
+    with open(model_path, "rb") as f:
+        return pickle.load(f)
+
+
+def _customers_to_assign_sql(features: list[str], full: bool) -> str:
+    """Return the query reading the features of the customers to (re)assign with a model.
+
+    Unless ``full``, its parameter is the model version.
+    """
+    changed_filter = (
+        ""
+        if full
+        else """WHERE s.codice_cliente IS NULL
+            OR s.feature_hash <> c.feature_hash
+            OR s.model_version <> ?"""
+    )
+    return f"""
+        WITH customers AS (
+            SELECT codice_cliente, {hash_sql(features)} AS feature_hash, {feature_sql(features)}
+            FROM {SOURCE_TABLE}
+        )
+        SELECT c.*
+        FROM customers AS c
+        LEFT JOIN {SEGMENTS_TABLE} AS s ON s.codice_cliente = c.codice_cliente
+        {changed_filter}
+    """
+
+
+def _needs_assignment(db_path: Path, model: dict[str, Any]) -> bool:
+    """Return whether customers were added, changed or removed since the last assignment."""
+    query = f"""
+        SELECT codice_cliente FROM ({_customers_to_assign_sql(model["features"], full=False)})
+        UNION ALL
+        SELECT codice_cliente FROM {SEGMENTS_TABLE}
+        WHERE codice_cliente NOT IN (SELECT codice_cliente FROM {SOURCE_TABLE})
+    """
+    return has_pending_rows(db_path, query, [model["version"]])
+
+
+def _assign(
+    con: duckdb.DuckDBPyConnection, model: dict[str, Any], chunk_size: int, full: bool
+) -> int:
+    """Assign new or changed customers to segments and return how many were assigned."""
+    _ensure_tables(con)
+    # The features the model was fitted on, older models may use other ones
+    features = model["features"]
+    query = _customers_to_assign_sql(features, full)
+    params = [] if full else [model["version"]]
+
+    assigned = []
+    for chunk in iter_chunks(con, query, chunk_size, params):
+        assigned.append(
+            pd.DataFrame(
+                {
+                    "codice_cliente": chunk["codice_cliente"].to_numpy(np.int64),
+                    "segmento": assign_nearest(model, chunk[features].to_numpy(np.float64)) + 1,
+                    "feature_hash": chunk["feature_hash"].to_numpy(np.uint64),
+                }
+            )
+        )
+
+    con.execute("BEGIN TRANSACTION")
+    # Customers no longer present in dim_customers
+    con.execute(
+        f"""
+        DELETE FROM {SEGMENTS_TABLE}
+        WHERE codice_cliente NOT IN (SELECT codice_cliente FROM {SOURCE_TABLE})
+    """
+    )
+    if assigned:
+        con.register("new_segments", pd.concat(assigned))
+        con.execute(
+            f"""
+            INSERT OR REPLACE INTO {SEGMENTS_TABLE}
+            SELECT codice_cliente, segmento, ?, feature_hash, current_timestamp
+            FROM new_segments
+        """,
+            [model["version"]],
+        )
+    _refresh_profiles(con)
+    con.execute("COMMIT")
+    return sum(len(chunk) for chunk in assigned)
+
+
+def fit_segments() -> int:
+    """Fit the segmentation model out of core and assign every customer."""
+    parser = argparse.ArgumentParser(description=fit_segments.__doc__)
+    parser.add_argument(
+        "--db-path", help="database assigned in place; defaults to a new published version"
+    )
+    parser.add_argument("--clusters", type=int, default=DEFAULT_CLUSTERS)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--epochs", type=int, default=3, help="passes over the data")
+    args = parser.parse_args()
+
+    try:
+        from sklearn.cluster import MiniBatchKMeans
+        from sklearn.preprocessing import StandardScaler
+    except ImportError:
+        print("ERROR: scikit-learn is required to fit the segmentation model.")
+        print("Install it with 'uv sync --extra analysis'.")
+        return 1
+
+    # Fitted on the database the assignments are written to
+    con = duckdb.connect(args.db_path or str(current_db_path()), read_only=True)
+    # Shuffle once so every chunk is a representative mini-batch
+    query = f"SELECT {_FEATURE_SQL} FROM {SOURCE_TABLE} ORDER BY hash(codice_cliente)"
+
+    start = time.perf_counter()
+    scaler = StandardScaler()
+    for chunk in iter_chunks(con, query, args.chunk_size):
+        scaler.partial_fit(chunk[FEATURES].to_numpy(np.float64))
+
+    kmeans = MiniBatchKMeans(n_clusters=args.clusters, random_state=42, n_init=3)
+    for epoch in range(args.epochs):
+        for chunk in iter_chunks(con, query, args.chunk_size):
+            features = scaler.transform(chunk[FEATURES].to_numpy(np.float64))
+            if len(features) >= args.clusters:
+                kmeans.partial_fit(features)
+        print(f"OK Epoch {epoch + 1}/{args.epochs} done")
+
+    con.close()
+    if not hasattr(kmeans, "cluster_centers_"):
+        print(f"ERROR: Not enough customers in {SOURCE_TABLE} to fit {args.clusters} clusters.")
+        return 1
+
+    version = datetime.now().strftime("%Y%m%d_%H%M%S")
+    model = {
+        "version": version,
+        "features": FEATURES,
+        "mean": scaler.mean_,
+        # Constant features have zero variance; keep them neutral instead of dividing by 0
+        "scale": np.where(scaler.scale_ == 0, 1.0, scaler.scale_),
+        "centroids": kmeans.cluster_centers_,
+    }
+    MODELS_DIR.mkdir(parents=True, exist_ok=True)
+    model_path = MODELS_DIR / f"segmentation_{version}.pkl"
+    with open(model_path, "wb") as f:
+        pickle.dump(model, f)
+    print(f"OK Fitted {args.clusters} segments in {time.perf_counter() - start:.2f}s")
+    print(f"Model saved to: {model_path}")
+
+    with output_database(args.db_path) as db_path:
+        con = duckdb.connect(str(db_path))
+        try:
+            count = _assign(con, model, args.chunk_size, full=True)
+        finally:
+            con.close()
+    print(f"\n[OK] Assigned {count:,} customers to segments")
+    return 0
+
+
+def assign_segments() -> int:
+    """Assign new or changed customers to segments using the latest fitted model."""
+    parser = argparse.ArgumentParser(description=assign_segments.__doc__)
+    parser.add_argument(
+        "--db-path", help="database assigned in place; defaults to a new published version"
+    )
+    parser.add_argument("--model-path", help="defaults to the latest fitted model")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--full", action="store_true", help="reassign every customer")
+    args = parser.parse_args()
+
+    model_path = Path(args.model_path) if args.model_path else latest_model_path("segmentation")
+    if model_path is None or not model_path.exists():
+        print("ERROR: No fitted segmentation model found.")
+        print("Run 'uv run fit-segments' first.")
+        return 1
+
+    model = _load_model(model_path)
+
+    # Checked before writing, so an up-to-date database is not copied into a new version
+    source_path = Path(args.db_path) if args.db_path else current_db_path()
+    if not args.full and not _needs_assignment(source_path, model):
+        print("[OK] All customers are up to date, nothing to assign.")
+        return 0
+
+    start = time.perf_counter()
+    with output_database(args.db_path) as db_path:
+        con = duckdb.connect(str(db_path))
+        try:
+            count = _assign(con, model, args.chunk_size, full=args.full)
+        finally:
+            con.close()
+    print(f"[OK] Assigned {count:,} customers in {time.perf_counter() - start:.2f}s")
+    return 0
@@ -0,0 +1,545 @@
+"""Queries of the dashboard and their serving cache.
+
+The dashboard (``streamlit_app/data_loader.py``) turns each ``load_*`` query into a
+loader of the published database, cached per dashboard process. ``warm-caches`` runs the
+same queries after a build, for the common filter combinations (``dashboard_queries`` and
+``chart_queries``), into the serving cache stored next to the database, so a dashboard
+process that has never run a query starts with their results. A stamp of the database
+file invalidates the entries as soon as the database is written again.
+
+Every query takes a DuckDB connection (or cursor) as its first argument; the calls
+registered here leave it out.
+"""
+
+import hashlib
+import inspect
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+
+import duckdb
+import pandas as pd
+
+SERVING_CACHE_DIRNAME = "serving_cache"
+_STAMP_FILENAME = "DATABASE"
+
+
+def _database_stamp(db_path):
+    """Identify the content of a database file (and its WAL) by size and modification time."""
+    stamps = []
+    for path in (Path(db_path), Path(f"{db_path}.wal")):
+        if path.exists():
+            stat = path.stat()
+            stamps.append(f"{stat.st_size}-{stat.st_mtime_ns}")
+    return " ".join(stamps)
+
+
+def _serving_cache_dir(db_path):
+    """Return the serving cache directory of a database, if its stamp is still valid."""
+    cache_dir = Path(db_path).parent / SERVING_CACHE_DIRNAME
+    stamp = cache_dir / _STAMP_FILENAME
+    if stamp.exists() and stamp.read_text(encoding="utf-8") == _database_stamp(db_path):
+        return cache_dir
+    return None
+
+
+def _serving_cache_filename(query, args, kwargs):
+    """Name the serving cache entry of one query call, independent of how args are passed."""
+    call = inspect.signature(query).bind(None, *args, **kwargs)
+    call.apply_defaults()
+    # The first argument is the connection
+    arguments = list(call.arguments.items())[1:]
+    digest = hashlib.sha256(repr(sorted(arguments)).encode()).hexdigest()
+    return f"{query.__name__}-{digest[:16]}.pkl"
+
+
+def cached_result(db_path, query, args=(), kwargs=None):
+    """Return the result of a query call stored in the serving cache of a database.
+
+    Raises KeyError when the call was not stored, or the database changed since.
+    """
+    cache_dir = _serving_cache_dir(db_path)
+    if cache_dir is not None:
+        try:
+            return pd.read_pickle(cache_dir / _serving_cache_filename(query, args, kwargs or {}))
+        except FileNotFoundError:
+            pass
+    raise KeyError(query.__name__)
+
+
+def warm_serving_cache(db_path, calls, max_workers=8):
+    """Compute query calls into the serving cache of a database.
+
+    Takes calls like those of ``dashboard_queries``; calls already stored for the same
+    database are kept. Returns a (query name, seconds) pair per computed call, and the
+    number of calls that were already stored.
+    """
+    cache_dir = Path(db_path).parent / SERVING_CACHE_DIRNAME
+    if _serving_cache_dir(db_path) is None:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        cache_dir.mkdir(parents=True)
+        (cache_dir / _STAMP_FILENAME).write_text(_database_stamp(db_path), encoding="utf-8")
+
+    # One call per entry: agency-independent queries come up for every agency
+    entries = {cache_dir / _serving_cache_filename(c.func, c.args, c.keywords): c for c in calls}
+    missing = {path: call for path, call in entries.items() if not path.exists()}
+
+    def warm(path, call):
+        start = time.perf_counter()
+        # One cursor per call, so the calls run on separate threads
+        with con.cursor() as cursor:
+            result = call.func(cursor, *call.args, **call.keywords)
+        # Written under a temporary name, so a dashboard never reads a partial entry
+        partial_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        pd.to_pickle(result, partial_path)
+        os.replace(partial_path, path)
+        return call.func.__name__, time.perf_counter() - start
+
+    # Closing the connection releases the database file, the process warming it is
+    # usually a build
+    with (
+        duckdb.connect(str(db_path), read_only=True) as con,
+        ThreadPoolExecutor(max_workers=max_workers) as pool,
+    ):
+        timings = list(pool.map(warm, missing, missing.values()))
+    return timings, len(entries) - len(missing)
+
+
+def _agency_filter(agenzia, column="agenzia", keyword="WHERE"):
+    """Return the SQL condition and parameters restricting a query to one agency.
+
+    The marts are stored in agency order, so the condition lets DuckDB skip the row
+    groups of every other agency. Without an agency the query is left company-wide.
+    """
+    if agenzia is None:
+        return "", []
+    return f"{keyword} {column} = ?", [agenzia]
+
+
+def load_agencies(con):
+    """Load the list of agencies for the agency selector."""
+    return [
+        row[0]
+        for row in con.execute(
+            """
+            SELECT DISTINCT agenzia
+            FROM aida_challenge.main_marts.dim_customers
+            WHERE agenzia IS NOT NULL
+            ORDER BY agenzia
+        """
+        ).fetchall()
+    ]
+
+
+def load_customer_demographics(con, agenzia=None):
+    """Load customer demographic data, optionally for one agency only."""
+    where, params = _agency_filter(agenzia)
+    return con.execute(
+        f"""
+        SELECT
+            codice_cliente as customer_id,
+            eta as age,
+            reddito as income,
+            professione as profession,
+            luogo_residenza as city,
+            cluster_risposta as cluster,
+            engagement_score,
+            churn_probability,
+            clv_stimato as clv,
+            satisfaction_score,
+            num_polizze as policy_count,
+            anzianita_compagnia as tenure_years,
+            visite_ultimo_anno as annual_visits
+        FROM aida_challenge.main_marts.dim_customers
+        {where}
+    """,
+        params,
+    ).df()
+
+
+def load_policy_data(con, agenzia=None):
+    """Load policy and portfolio data, optionally for one agency only."""
+    where, params = _agency_filter(agenzia)
+    return con.execute(
+        f"""
+        SELECT
+            codice_cliente as customer_id,
+            prodotto as product,
+            area_bisogno as need_area,
+            premio_totale_annuo as annual_premium,
+            stato_polizza as policy_status,
+            canale_acquisizione as acquisition_channel,
+            loss_ratio,
+            margine_lordo as gross_margin,
+            data_emissione,
+            data_scadenza
+        FROM aida_challenge.main_marts.fact_policies
+        {where}
+    """,
+        params,
+    ).df()
+
+
+def load_geographic_data(con, agenzia=None):
+    """Load customer geographic data, optionally for one agency only."""
+    where, params = _agency_filter(agenzia, keyword="AND")
+    return con.execute(
+        f"""
+        SELECT
+            codice_cliente as customer_id,
+            latitudine as lat,
+            longitudine as lon,
+            luogo_residenza as city,
+            clv_stimato as clv
+        FROM aida_challenge.main_marts.dim_customers
+        WHERE latitudine IS NOT NULL
+            AND longitudine IS NOT NULL
+            {where}
+    """,
+        params,
+    ).df()
+
+
+def load_cluster_summary(con, agenzia=None):
+    """Load cluster characteristics summary, optionally for one agency only."""
+    where, params = _agency_filter(agenzia, keyword="AND")
+    return con.execute(
+        f"""
+        SELECT
+            cluster_risposta as cluster,
+            COUNT(*) as customer_count,
+            AVG(eta) as avg_age,
+            AVG(reddito) as avg_income,
+            AVG(num_polizze) as avg_policies,
+            AVG(clv_stimato) as avg_clv,
+            AVG(engagement_score) as avg_engagement,
+            AVG(churn_probability) as avg_churn_risk,
+            AVG(satisfaction_score) as avg_satisfaction
+        FROM aida_challenge.main_marts.dim_customers
+        WHERE cluster_risposta IS NOT NULL
+            {where}
+        GROUP BY cluster_risposta
+        ORDER BY cluster_risposta
+    """,
+        params,
+    ).df()
+
+
+def load_channel_performance(con, agenzia=None):
+    """Load channel acquisition and performance data, optionally for one agency only."""
+    where, params = _agency_filter(agenzia, column="p.agenzia", keyword="AND")
+    return con.execute(
+        f"""
+        SELECT
+            p.canale_acquisizione as channel,
+            COUNT(DISTINCT p.codice_cliente) as customer_count,
+            AVG(c.clv_stimato) as avg_clv,
+            AVG(c.engagement_score) as avg_engagement,
+            AVG(p.premio_totale_annuo) as avg_premium,
+            SUM(p.premio_totale_annuo) as total_revenue,
+            SUM(p.margine_lordo) as total_margin
+        FROM aida_challenge.main_marts.fact_policies p
+        JOIN aida_challenge.main_marts.dim_customers c
+            ON p.codice_cliente = c.codice_cliente
+        WHERE p.stato_polizza = 'Attiva'
+            {where}
+        GROUP BY p.canale_acquisizione
+        ORDER BY total_revenue DESC
+    """,
+        params,
+    ).df()
+
+
+def load_product_performance(con, agenzia=None):
+    """Load product performance metrics, optionally for one agency only."""
+    where, params = _agency_filter(agenzia, keyword="AND")
+    return con.execute(
+        f"""
+        SELECT
+            prodotto as product,
+            area_bisogno as need_area,
+            AVG(loss_ratio) as avg_loss_ratio,
+            SUM(premio_totale_annuo) as total_premium,
+            SUM(margine_lordo) as total_margin,
+            COUNT(*) as policy_count,
+            AVG(premio_totale_annuo) as avg_premium
+        FROM aida_challenge.main_marts.fact_policies
+        WHERE stato_polizza = 'Attiva'
+            {where}
+        GROUP BY prodotto, area_bisogno
+        ORDER BY total_premium DESC
+    """,
+        params,
+    ).df()
+
+
+def load_benchmark_distribution(con, agenzia=None):
+    """Load competitor price-gap distributions by product, agency and zone.
+
+    For one agency, only its own policies are broken down, by product and zone.
+    """
+    return con.execute(
+        """
+        SELECT
+            dimensione as dimension,
+            valore as value,
+            num_polizze as policy_count,
+            gap_premio_perc_p10 as gap_p10,
+            gap_premio_perc_p25 as gap_p25,
+            gap_premio_perc_mediano as gap_median,
+            gap_premio_perc_p75 as gap_p75,
+            gap_premio_perc_p90 as gap_p90,
+            percentile_premio_medio as avg_premium_percentile,
+            percentile_massimale_medio as avg_coverage_percentile,
+            quota_sopra_mercato as share_above_market,
+            quota_sotto_mercato as share_below_market
+        FROM aida_challenge.main_marts.mart_benchmark_distribution
+        WHERE agenzia IS NOT DISTINCT FROM ?
+        ORDER BY dimensione, num_polizze DESC
+    """,
+        [agenzia],
+    ).df()
+
+
+def load_interaction_summary(con, agenzia=None):
+    """Load interaction type summary, optionally for the customers of one agency only."""
+    return con.execute(
+        """
+        SELECT
+            tipo_interazione as interaction_type,
+            num_interazioni as interaction_count,
+            durata_media as avg_duration,
+            tasso_conversione as conversion_rate
+        FROM aida_challenge.main_marts.mart_interaction_summary
+        WHERE agenzia IS NOT DISTINCT FROM ?
+        ORDER BY interaction_count DESC
+    """,
+        [agenzia],
+    ).df()
+
+
+def load_segment_profiles(con, agenzia=None):
+    """Load behavioural segment profiles written by `fit-segments`, if available.
+
+    For one agency, the profiles only cover its own customers.
+    """
+    # Profiles written before they were broken down by agency count as missing
+    has_segments = con.execute(
+        """
+        SELECT COUNT(*) > 0
+        FROM information_schema.columns
+        WHERE table_schema = 'main_segmentation' AND table_name = 'segment_profiles'
+            AND column_name = 'agenzia'
+    """
+    ).fetchone()[0]
+    if not has_segments:
+        return None
+    return con.execute(
+        """
+        SELECT
+            nome_segmento as segment,
+            num_clienti as customer_count,
+            avg_eta as avg_age,
+            avg_reddito as avg_income,
+            avg_clv_stimato as avg_clv,
+            avg_engagement_score as avg_engagement,
+            avg_churn_probability as avg_churn_risk,
+            avg_satisfaction_score as avg_satisfaction,
+            avg_num_polizze_attive as avg_active_policies,
+            avg_premio_annuo_totale as avg_premium
+        FROM aida_challenge.main_segmentation.segment_profiles
+        WHERE agenzia IS NOT DISTINCT FROM ?
+        ORDER BY segmento
+    """,
+        [agenzia],
+    ).df()
+
+
+# Chart data computed in DuckDB: histogram bins and box-plot summaries instead of
+# row-level frames, so the chart payload does not grow with the number of customers
+
+# Dashboard column names of dim_customers that charts can summarise
+CHART_COLUMNS = {
+    "age": "eta",
+    "income": "reddito",
+    "clv": "clv_stimato",
+    "tenure_years": "anzianita_compagnia",
+    "engagement_score": "engagement_score",
+    "churn_probability": "churn_probability",
+}
+
+# Same stages as pd.cut(tenure_years, bins=[0, 2, 5, 10, inf]): right-closed, tenure 0 excluded
+LIFECYCLE_STAGES = ["New (0-2y)", "Growing (2-5y)", "Mature (5-10y)", "Loyal (10y+)"]
+
+CHART_GROUPS = {
+    "cluster": "cluster_risposta",
+    "lifecycle_stage": f"""CASE
+            WHEN anzianita_compagnia > 10 THEN '{LIFECYCLE_STAGES[3]}'
+            WHEN anzianita_compagnia > 5 THEN '{LIFECYCLE_STAGES[2]}'
+            WHEN anzianita_compagnia > 2 THEN '{LIFECYCLE_STAGES[1]}'
+            WHEN anzianita_compagnia > 0 THEN '{LIFECYCLE_STAGES[0]}'
+        END""",
+}
+
+
+def _customer_filter(agenzia, cluster, age_range, income_range, required=()):
+    """Return the SQL WHERE clause and parameters of the dashboard's sidebar filters.
+
+    ``required`` lists chart columns that must not be null, like ``dropna(subset=...)``.
+    """
+    conditions, params = [], []
+    if agenzia is not None:
+        conditions.append("agenzia = ?")
+        params.append(agenzia)
+    if cluster is not None:
+        conditions.append("cluster_risposta = ?")
+        params.append(cluster)
+    if age_range is not None:
+        conditions.append("eta BETWEEN ? AND ?")
+        params += list(age_range)
+    if income_range is not None:
+        conditions.append("reddito BETWEEN ? AND ?")
+        params += list(income_range)
+    conditions += [f"{CHART_COLUMNS[column]} IS NOT NULL" for column in required]
+    where = "WHERE " + " AND ".join(conditions) if conditions else ""
+    return where, params
+
+
+def load_histogram(
+    con, column, bins, agenzia=None, cluster=None, age_range=None, income_range=None, required=()
+):
+    """Load histogram bins (bin_start, bin_end, count) of a customer column.
+
+    About ``bins`` bins of equal, rounded width are computed in DuckDB, each covering
+    [bin_start, bin_end).
+    """
+    where, params = _customer_filter(agenzia, cluster, age_range, income_range, (*required, column))
+    return con.execute(
+        f"""
+        WITH filtered AS (
+            SELECT {CHART_COLUMNS[column]}::DOUBLE AS v
+            FROM aida_challenge.main_marts.dim_customers
+            {where}
+        ),
+        width AS (
+            SELECT coalesce(b[2] - b[1], 1) AS w
+            FROM (SELECT equi_width_bins(min(v), max(v), ?, true) AS b FROM filtered)
+        )
+        SELECT
+            floor(v / w) * w AS bin_start,
+            floor(v / w) * w + w AS bin_end,
+            COUNT(*) AS count
+        FROM filtered, width
+        GROUP BY ALL
+        ORDER BY bin_start
+    """,
+        [*params, bins],
+    ).df()
+
+
+def load_box_summary(
+    con,
+    column,
+    group,
+    agenzia=None,
+    cluster=None,
+    age_range=None,
+    income_range=None,
+    required=(),
+    max_outliers=50,
+):
+    """Load box-plot statistics of a customer column per group.
+
+    Returns per group the quartiles, the whiskers (furthest values within 1.5 IQR of
+    the box) and a sample of the most extreme outliers, as drawn by ``px.box``.
+    """
+    where, params = _customer_filter(agenzia, cluster, age_range, income_range, (*required, column))
+    return con.execute(
+        f"""
+        WITH filtered AS (
+            SELECT {CHART_GROUPS[group]} AS grp, {CHART_COLUMNS[column]}::DOUBLE AS v
+            FROM aida_challenge.main_marts.dim_customers
+            {where}
+        ),
+        quartiles AS (
+            SELECT grp, quantile_cont(v, [0.25, 0.5, 0.75]) AS q
+            FROM filtered
+            WHERE grp IS NOT NULL
+            GROUP BY grp
+        ),
+        fences AS (
+            SELECT
+                grp, q[1] AS q1, q[2] AS median, q[3] AS q3,
+                q[1] - 1.5 * (q[3] - q[1]) AS lower_fence,
+                q[3] + 1.5 * (q[3] - q[1]) AS upper_fence
+            FROM quartiles
+        )
+        SELECT
+            f.grp AS {group},
+            COUNT(*) AS count,
+            ANY_VALUE(q1) AS q1,
+            ANY_VALUE(median) AS median,
+            ANY_VALUE(q3) AS q3,
+            MIN(v) FILTER (WHERE v >= lower_fence) AS lower_whisker,
+            MAX(v) FILTER (WHERE v <= upper_fence) AS upper_whisker,
+            COUNT(*) FILTER (WHERE v < lower_fence OR v > upper_fence) AS outlier_count,
+            coalesce(
+                list(v ORDER BY abs(v - median) DESC)
+                    FILTER (WHERE v < lower_fence OR v > upper_fence)[1:?],
+                []
+            ) AS outliers
+        FROM filtered AS f
+        JOIN fences USING (grp)
+        GROUP BY f.grp
+        ORDER BY f.grp
+    """,
+        [*params, max_outliers],
+    ).df()
+
+
+# Queries of a dashboard run, prefetched by the dashboard and computed ahead by
+# `warm-caches`. Keep them in step with the loader calls in streamlit_app/app.py.
+
+# Columns the Customer Value tab requires to be present
+VALUE_COLUMNS = ("engagement_score", "churn_probability", "clv")
+
+
+def dashboard_queries(agenzia=None):
+    """Return the mart queries every dashboard run loads, as calls without the connection."""
+    return [
+        partial(load_customer_demographics, agenzia),
+        partial(load_policy_data, agenzia),
+        partial(load_geographic_data, agenzia),
+        partial(load_product_performance, agenzia),
+        partial(load_channel_performance, agenzia),
+        partial(load_interaction_summary, agenzia),
+        partial(load_cluster_summary, agenzia),
+        partial(load_benchmark_distribution, agenzia),
+        partial(load_segment_profiles, agenzia),
+    ]
+
+
+def default_chart_filters(agenzia, customers):
+    """Return the sidebar filters of a new session: every cluster, full age and income range."""
+    return {
+        "agenzia": agenzia,
+        "cluster": None,
+        "age_range": (int(customers["age"].min()), int(customers["age"].max())),
+        "income_range": (int(customers["income"].min()), int(customers["income"].max())),
+    }
+
+
+def chart_queries(filters):
+    """Return the chart queries of a dashboard run with the given sidebar filters."""
+    return [
+        partial(load_histogram, "age", 30, **filters),
+        partial(load_histogram, "income", 30, **filters),
+        partial(load_box_summary, "clv", "cluster", required=VALUE_COLUMNS, **filters),
+        partial(load_histogram, "clv", 50, required=VALUE_COLUMNS, **filters),
+        partial(load_histogram, "tenure_years", 20, **filters),
+        partial(load_box_summary, "churn_probability", "lifecycle_stage", **filters),
+    ]
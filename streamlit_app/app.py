@@ -2,18 +2,28 @@
 AIDA Challenge - Interactive Data Visualization Dashboard
 """
 
+import os
+
 import streamlit as st
 import pandas as pd
 import plotly.express as px
 from pathlib import Path
+from charts import box_figure, histogram_figure
 from data_loader import (
+    get_db_connection,
+    load_agencies,
     load_customer_demographics,
     load_policy_data,
     load_geographic_data,
     load_cluster_summary,
     load_channel_performance,
     load_product_performance,
+    load_benchmark_distribution,
+    load_box_summary,
+    load_histogram,
     load_interaction_summary,
+    load_segment_profiles,
+    prefetch,
     load_raw_clienti,
     load_raw_polizze,
     load_raw_sinistri,
@@ -23,6 +33,14 @@ from data_loader import (
     load_raw_competitor_prodotti,
 )
 
+from aida_challenge.serving import (
+    LIFECYCLE_STAGES,
+    VALUE_COLUMNS,
+    chart_queries,
+    dashboard_queries,
+    default_chart_filters,
+)
+
 # Page configuration
 st.set_page_config(
     page_title="AIDA Challenge Dashboard",
@@ -79,26 +97,42 @@ else:
 st.sidebar.image(str(logo_path), use_container_width=True)
 st.sidebar.title("🎛️ Filters")
 
+# Pick up a newly published database version before loading data
+get_db_connection()
+
+# Agency mode: a deployment for a single agency sets AIDA_AGENZIA (or opens the dashboard
+# with ?agenzia=...) and only ever reads that agency's slice of the marts
+locked_agency = st.query_params.get("agenzia") or os.environ.get("AIDA_AGENZIA")
+if locked_agency:
+    selected_agency = locked_agency
+    st.sidebar.markdown(f"**Agency:** {locked_agency}")
+else:
+    agency_choice = st.sidebar.selectbox("Agency", ["All"] + load_agencies())
+    selected_agency = None if agency_choice == "All" else agency_choice
+
+# Issue the independent mart queries concurrently, so every tab below reads from the cache
+prefetch(*dashboard_queries(selected_agency))
+
 # Load data
-df_customers = load_customer_demographics()
-df_policies = load_policy_data()
+df_customers = load_customer_demographics(selected_agency)
+df_policies = load_policy_data(selected_agency)
+
+if df_customers.empty:
+    st.warning(f"No customers found for agency '{selected_agency}'.")
+    st.stop()
 
 # Sidebar filters
 clusters = ["All"] + sorted(df_customers["cluster"].dropna().unique().tolist())
 selected_cluster = st.sidebar.selectbox("Customer Cluster", clusters)
 
+default_filters = default_chart_filters(selected_agency, df_customers)
+
 age_range = st.sidebar.slider(
-    "Age Range",
-    int(df_customers["age"].min()),
-    int(df_customers["age"].max()),
-    (int(df_customers["age"].min()), int(df_customers["age"].max())),
+    "Age Range", *default_filters["age_range"], default_filters["age_range"]
 )
 
 income_range = st.sidebar.slider(
-    "Income Range (€)",
-    int(df_customers["income"].min()),
-    int(df_customers["income"].max()),
-    (int(df_customers["income"].min()), int(df_customers["income"].max())),
+    "Income Range (€)", *default_filters["income_range"], default_filters["income_range"]
 )
 
 # Apply filters
@@ -112,6 +146,17 @@ filtered_customers = df_customers[
 if selected_cluster != "All":
     filtered_customers = filtered_customers[filtered_customers["cluster"] == selected_cluster]
 
+# The same filters, applied in DuckDB by the pre-aggregated chart loaders
+chart_filters = {
+    "agenzia": selected_agency,
+    "cluster": None if selected_cluster == "All" else selected_cluster,
+    "age_range": age_range,
+    "income_range": income_range,
+}
+
+# The chart queries depend on the sidebar filters, so they are prefetched once those are known
+prefetch(*chart_queries(chart_filters))
+
 # Key metrics
 st.sidebar.markdown("---")
 st.sidebar.markdown("### 📈 Key Metrics")
@@ -145,188 +190,196 @@ with tab0:
         """
     )
 
-    # Create sub-tabs for each raw table
-    subtab1, subtab2, subtab3, subtab4, subtab5, subtab6, subtab7 = st.tabs(
-        [
-            "Clienti",
-            "Polizze",
-            "Sinistri",
-            "Reclami",
-            "Abitazioni",
-            "Interazioni",
-            "Competitor",
-        ]
-    )
-
-    def explore_dataframe(df, table_name):
-        """Helper function to explore a dataframe."""
-        st.subheader(f"📊 {table_name} Overview")
-
-        col1, col2, col3, col4 = st.columns(4)
-        with col1:
-            st.metric("Total Rows", f"{len(df):,}")
-        with col2:
-            st.metric("Total Columns", f"{len(df.columns):,}")
-        with col3:
-            st.metric("Memory Usage", f"{df.memory_usage(deep=True).sum() / 1024**2:.2f} MB")
-        with col4:
-            duplicate_rows = df.duplicated().sum()
-            st.metric("Duplicate Rows", f"{duplicate_rows:,}")
-
-        # Data Types
-        st.subheader("📋 Column Data Types")
-        dtype_df = pd.DataFrame(
-            {
-                "Column": df.dtypes.index,
-                "Data Type": df.dtypes.values.astype(str),
-                "Non-Null Count": [df[col].count() for col in df.columns],
-                "Null Count": [df[col].isna().sum() for col in df.columns],
-                "Null %": [f"{df[col].isna().sum() / len(df) * 100:.1f}%" for col in df.columns],
-            }
+    if locked_agency:
+        # Raw tables are company-wide and not clustered by agency
+        st.info("Raw data exploration is not available in agency mode.")
+    else:
+        # Create sub-tabs for each raw table
+        subtab1, subtab2, subtab3, subtab4, subtab5, subtab6, subtab7 = st.tabs(
+            [
+                "Clienti",
+                "Polizze",
+                "Sinistri",
+                "Reclami",
+                "Abitazioni",
+                "Interazioni",
+                "Competitor",
+            ]
         )
-        st.dataframe(dtype_df, use_container_width=True, height=400)
-
-        # Null Value Heatmap
-        st.subheader("🔥 Null Values Heatmap")
-        null_data = df.isnull().sum()
-        null_data = null_data[null_data > 0].sort_values(ascending=False)
-
-        if len(null_data) > 0:
-            fig_null = px.bar(
-                x=null_data.values,
-                y=null_data.index,
-                orientation="h",
-                title="Columns with Missing Values",
-                labels={"x": "Number of Null Values", "y": "Column"},
-                color=null_data.values,
-                color_continuous_scale="Reds",
-            )
-            fig_null.update_layout(showlegend=False, height=max(400, len(null_data) * 25))
-            st.plotly_chart(fig_null, use_container_width=True, key=f"null_chart_{table_name}")
-        else:
-            st.success("✅ No missing values found in this table!")
-
-        # Sample Data
-        st.subheader("📄 Sample Data (First 100 rows)")
-        st.dataframe(df.head(100), use_container_width=True, height=400)
-
-        # Numeric Columns Distribution
-        numeric_cols = df.select_dtypes(include=["number"]).columns.tolist()
-        if numeric_cols:
-            st.subheader("📊 Numeric Columns - Descriptive Statistics")
-            st.dataframe(df[numeric_cols].describe(), use_container_width=True)
-
-            st.subheader("📈 Numeric Columns - Distributions")
-            selected_numeric = st.multiselect(
-                "Select numeric columns to visualize",
-                numeric_cols,
-                default=numeric_cols[:3] if len(numeric_cols) >= 3 else numeric_cols,
-                key=f"numeric_{table_name}",
-            )
 
-            if selected_numeric:
-                cols_per_row = 2
-                for i in range(0, len(selected_numeric), cols_per_row):
-                    cols = st.columns(cols_per_row)
-                    for j, col_name in enumerate(selected_numeric[i : i + cols_per_row]):
-                        with cols[j]:
-                            fig = px.histogram(
-                                df,
-                                x=col_name,
-                                title=f"{col_name} Distribution",
-                                labels={col_name: col_name},
-                                color_discrete_sequence=["#0173B2"],
-                            )
-                            fig.update_layout(showlegend=False, height=300)
-                            st.plotly_chart(
-                                fig, use_container_width=True, key=f"hist_{table_name}_{col_name}"
-                            )
-
-        # Categorical Columns
-        categorical_cols = df.select_dtypes(include=["object", "category"]).columns.tolist()
-        if categorical_cols:
-            st.subheader("🏷️ Categorical Columns - Value Counts")
-            selected_categorical = st.selectbox(
-                "Select a categorical column to explore",
-                categorical_cols,
-                key=f"cat_{table_name}",
+        def explore_dataframe(df, table_name):
+            """Helper function to explore a dataframe."""
+            st.subheader(f"📊 {table_name} Overview")
+
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Total Rows", f"{len(df):,}")
+            with col2:
+                st.metric("Total Columns", f"{len(df.columns):,}")
+            with col3:
+                st.metric("Memory Usage", f"{df.memory_usage(deep=True).sum() / 1024**2:.2f} MB")
+            with col4:
+                duplicate_rows = df.duplicated().sum()
+                st.metric("Duplicate Rows", f"{duplicate_rows:,}")
+
+            # Data Types
+            st.subheader("📋 Column Data Types")
+            dtype_df = pd.DataFrame(
+                {
+                    "Column": df.dtypes.index,
+                    "Data Type": df.dtypes.values.astype(str),
+                    "Non-Null Count": [df[col].count() for col in df.columns],
+                    "Null Count": [df[col].isna().sum() for col in df.columns],
+                    "Null %": [
+                        f"{df[col].isna().sum() / len(df) * 100:.1f}%" for col in df.columns
+                    ],
+                }
             )
-
-            if selected_categorical:
-                value_counts = df[selected_categorical].value_counts().head(20)
-
-                col1, col2 = st.columns([2, 1])
-                with col1:
-                    fig_cat = px.bar(
-                        x=value_counts.values,
-                        y=value_counts.index,
-                        orientation="h",
-                        title=f"Top 20 Values - {selected_categorical}",
-                        labels={"x": "Count", "y": selected_categorical},
-                        color=value_counts.values,
-                        color_continuous_scale="Viridis",
-                    )
-                    fig_cat.update_layout(showlegend=False, height=500)
-                    st.plotly_chart(
-                        fig_cat,
-                        use_container_width=True,
-                        key=f"cat_chart_{table_name}_{selected_categorical}",
-                    )
-
-                with col2:
-                    st.metric("Unique Values", f"{df[selected_categorical].nunique():,}")
-                    st.metric("Most Common", value_counts.index[0])
-                    st.metric("Most Common Count", f"{value_counts.values[0]:,}")
-                    st.metric("Most Common %", f"{value_counts.values[0] / len(df) * 100:.1f}%")
-
-        # Date Columns
-        date_cols = df.select_dtypes(include=["datetime64"]).columns.tolist()
-        if date_cols:
-            st.subheader("📅 Date Columns - Time Range")
-            for date_col in date_cols:
-                col1, col2, col3 = st.columns(3)
-                with col1:
-                    st.metric(f"{date_col} - Min", str(df[date_col].min())[:10])
-                with col2:
-                    st.metric(f"{date_col} - Max", str(df[date_col].max())[:10])
-                with col3:
-                    date_range = (df[date_col].max() - df[date_col].min()).days
-                    st.metric(f"{date_col} - Range", f"{date_range:,} days")
-
-    # Clienti table
-    with subtab1:
-        df_raw_clienti = load_raw_clienti()
-        explore_dataframe(df_raw_clienti, "Clienti")
-
-    # Polizze table
-    with subtab2:
-        df_raw_polizze = load_raw_polizze()
-        explore_dataframe(df_raw_polizze, "Polizze")
-
-    # Sinistri table
-    with subtab3:
-        df_raw_sinistri = load_raw_sinistri()
-        explore_dataframe(df_raw_sinistri, "Sinistri")
-
-    # Reclami table
-    with subtab4:
-        df_raw_reclami = load_raw_reclami()
-        explore_dataframe(df_raw_reclami, "Reclami")
-
-    # Abitazioni table
-    with subtab5:
-        df_raw_abitazioni = load_raw_abitazioni()
-        explore_dataframe(df_raw_abitazioni, "Abitazioni")
-
-    # Interazioni Clienti table
-    with subtab6:
-        df_raw_interazioni = load_raw_interazioni_clienti()
-        explore_dataframe(df_raw_interazioni, "Interazioni Clienti")
-
-    # Competitor Prodotti table
-    with subtab7:
-        df_raw_competitor = load_raw_competitor_prodotti()
-        explore_dataframe(df_raw_competitor, "Competitor Prodotti")
+            st.dataframe(dtype_df, use_container_width=True, height=400)
+
+            # Null Value Heatmap
+            st.subheader("🔥 Null Values Heatmap")
+            null_data = df.isnull().sum()
+            null_data = null_data[null_data > 0].sort_values(ascending=False)
+
+            if len(null_data) > 0:
+                fig_null = px.bar(
+                    x=null_data.values,
+                    y=null_data.index,
+                    orientation="h",
+                    title="Columns with Missing Values",
+                    labels={"x": "Number of Null Values", "y": "Column"},
+                    color=null_data.values,
+                    color_continuous_scale="Reds",
+                )
+                fig_null.update_layout(showlegend=False, height=max(400, len(null_data) * 25))
+                st.plotly_chart(fig_null, use_container_width=True, key=f"null_chart_{table_name}")
+            else:
+                st.success("✅ No missing values found in this table!")
+
+            # Sample Data
+            st.subheader("📄 Sample Data (First 100 rows)")
+            st.dataframe(df.head(100), use_container_width=True, height=400)
+
+            # Numeric Columns Distribution
+            numeric_cols = df.select_dtypes(include=["number"]).columns.tolist()
+            if numeric_cols:
+                st.subheader("📊 Numeric Columns - Descriptive Statistics")
+                st.dataframe(df[numeric_cols].describe(), use_container_width=True)
+
+                st.subheader("📈 Numeric Columns - Distributions")
+                selected_numeric = st.multiselect(
+                    "Select numeric columns to visualize",
+                    numeric_cols,
+                    default=numeric_cols[:3] if len(numeric_cols) >= 3 else numeric_cols,
+                    key=f"numeric_{table_name}",
+                )
+
+                if selected_numeric:
+                    cols_per_row = 2
+                    for i in range(0, len(selected_numeric), cols_per_row):
+                        cols = st.columns(cols_per_row)
+                        for j, col_name in enumerate(selected_numeric[i : i + cols_per_row]):
+                            with cols[j]:
+                                fig = px.histogram(
+                                    df,
+                                    x=col_name,
+                                    title=f"{col_name} Distribution",
+                                    labels={col_name: col_name},
+                                    color_discrete_sequence=["#0173B2"],
+                                )
+                                fig.update_layout(showlegend=False, height=300)
+                                st.plotly_chart(
+                                    fig,
+                                    use_container_width=True,
+                                    key=f"hist_{table_name}_{col_name}",
+                                )
+
+            # Categorical Columns
+            categorical_cols = df.select_dtypes(include=["object", "category"]).columns.tolist()
+            if categorical_cols:
+                st.subheader("🏷️ Categorical Columns - Value Counts")
+                selected_categorical = st.selectbox(
+                    "Select a categorical column to explore",
+                    categorical_cols,
+                    key=f"cat_{table_name}",
+                )
+
+                if selected_categorical:
+                    value_counts = df[selected_categorical].value_counts().head(20)
+
+                    col1, col2 = st.columns([2, 1])
+                    with col1:
+                        fig_cat = px.bar(
+                            x=value_counts.values,
+                            y=value_counts.index,
+                            orientation="h",
+                            title=f"Top 20 Values - {selected_categorical}",
+                            labels={"x": "Count", "y": selected_categorical},
+                            color=value_counts.values,
+                            color_continuous_scale="Viridis",
+                        )
+                        fig_cat.update_layout(showlegend=False, height=500)
+                        st.plotly_chart(
+                            fig_cat,
+                            use_container_width=True,
+                            key=f"cat_chart_{table_name}_{selected_categorical}",
+                        )
+
+                    with col2:
+                        st.metric("Unique Values", f"{df[selected_categorical].nunique():,}")
+                        st.metric("Most Common", value_counts.index[0])
+                        st.metric("Most Common Count", f"{value_counts.values[0]:,}")
+                        st.metric("Most Common %", f"{value_counts.values[0] / len(df) * 100:.1f}%")
+
+            # Date Columns
+            date_cols = df.select_dtypes(include=["datetime64"]).columns.tolist()
+            if date_cols:
+                st.subheader("📅 Date Columns - Time Range")
+                for date_col in date_cols:
+                    col1, col2, col3 = st.columns(3)
+                    with col1:
+                        st.metric(f"{date_col} - Min", str(df[date_col].min())[:10])
+                    with col2:
+                        st.metric(f"{date_col} - Max", str(df[date_col].max())[:10])
+                    with col3:
+                        date_range = (df[date_col].max() - df[date_col].min()).days
+                        st.metric(f"{date_col} - Range", f"{date_range:,} days")
+
+        # Clienti table
+        with subtab1:
+            df_raw_clienti = load_raw_clienti()
+            explore_dataframe(df_raw_clienti, "Clienti")
+
+        # Polizze table
+        with subtab2:
+            df_raw_polizze = load_raw_polizze()
+            explore_dataframe(df_raw_polizze, "Polizze")
+
+        # Sinistri table
+        with subtab3:
+            df_raw_sinistri = load_raw_sinistri()
+            explore_dataframe(df_raw_sinistri, "Sinistri")
+
+        # Reclami table
+        with subtab4:
+            df_raw_reclami = load_raw_reclami()
+            explore_dataframe(df_raw_reclami, "Reclami")
+
+        # Abitazioni table
+        with subtab5:
+            df_raw_abitazioni = load_raw_abitazioni()
+            explore_dataframe(df_raw_abitazioni, "Abitazioni")
+
+        # Interazioni Clienti table
+        with subtab6:
+            df_raw_interazioni = load_raw_interazioni_clienti()
+            explore_dataframe(df_raw_interazioni, "Interazioni Clienti")
+
+        # Competitor Prodotti table
+        with subtab7:
+            df_raw_competitor = load_raw_competitor_prodotti()
+            explore_dataframe(df_raw_competitor, "Competitor Prodotti")
 
 # Tab 1: Customer Demographics
 with tab1:
@@ -346,28 +399,22 @@ with tab1:
 
     with col1:
         # Age distribution
-        fig_age = px.histogram(
-            filtered_customers,
-            x="age",
-            nbins=30,
+        fig_age = histogram_figure(
+            load_histogram("age", 30, **chart_filters),
             title="Age Distribution",
-            labels={"age": "Age", "count": "Number of Customers"},
-            color_discrete_sequence=["#0173B2"],
+            x_label="Age",
+            color="#0173B2",
         )
-        fig_age.update_layout(showlegend=False)
         st.plotly_chart(fig_age, use_container_width=True)
 
     with col2:
         # Income distribution
-        fig_income = px.histogram(
-            filtered_customers,
-            x="income",
-            nbins=30,
+        fig_income = histogram_figure(
+            load_histogram("income", 30, **chart_filters),
             title="Income Distribution",
-            labels={"income": "Income (€)", "count": "Number of Customers"},
-            color_discrete_sequence=["#756bb1"],
+            x_label="Income (€)",
+            color="#756bb1",
         )
-        fig_income.update_layout(showlegend=False)
         st.plotly_chart(fig_income, use_container_width=True)
 
     # Top professions
@@ -411,7 +458,7 @@ with tab2:
     with col1:
         # Premium by Need Area
         need_area_premium = (
-            filtered_policies.groupby("need_area")["annual_premium"]
+            filtered_policies.groupby("need_area", observed=True)["annual_premium"]
             .sum()
             .sort_values(ascending=True)
         )
@@ -430,7 +477,7 @@ with tab2:
     with col2:
         # Top products by premium
         product_premium = (
-            filtered_policies.groupby("product")["annual_premium"]
+            filtered_policies.groupby("product", observed=True)["annual_premium"]
             .sum()
             .sort_values(ascending=False)
             .head(10)
@@ -464,7 +511,7 @@ with tab2:
 with tab3:
     st.header("Customer Value & Risk Analysis")
 
-    value_data = filtered_customers.dropna(subset=["engagement_score", "churn_probability", "clv"])
+    value_data = filtered_customers.dropna(subset=list(VALUE_COLUMNS))
 
     col1, col2, col3 = st.columns(3)
     with col1:
@@ -497,26 +544,22 @@ with tab3:
 
     with col2:
         # CLV by Cluster
-        fig_clv = px.box(
-            value_data,
-            x="cluster",
-            y="clv",
+        fig_clv = box_figure(
+            load_box_summary("clv", "cluster", required=VALUE_COLUMNS, **chart_filters),
+            group="cluster",
             title="Customer Lifetime Value by Cluster",
-            labels={"cluster": "Cluster", "clv": "CLV (€)"},
-            color="cluster",
+            x_label="Cluster",
+            y_label="CLV (€)",
         )
-        fig_clv.update_layout(showlegend=False)
         st.plotly_chart(fig_clv, use_container_width=True)
 
     # CLV Distribution
     st.subheader("CLV Distribution")
-    fig_clv_dist = px.histogram(
-        value_data,
-        x="clv",
-        nbins=50,
+    fig_clv_dist = histogram_figure(
+        load_histogram("clv", 50, required=VALUE_COLUMNS, **chart_filters),
         title="Customer Lifetime Value Distribution",
-        labels={"clv": "CLV (€)", "count": "Number of Customers"},
-        color_discrete_sequence=["#009E73"],
+        x_label="CLV (€)",
+        color="#009E73",
     )
     st.plotly_chart(fig_clv_dist, use_container_width=True)
 
@@ -524,7 +567,7 @@ with tab3:
 with tab4:
     st.header("Geographic Distribution")
 
-    df_geo = load_geographic_data()
+    df_geo = load_geographic_data(selected_agency)
 
     # Filter geographic data based on selected customers
     filtered_geo = df_geo[df_geo["customer_id"].isin(filtered_customers["customer_id"])]
@@ -592,7 +635,7 @@ with tab4:
 with tab5:
     st.header("Product Performance & Profitability")
 
-    df_products = load_product_performance()
+    df_products = load_product_performance(selected_agency)
 
     col1, col2, col3 = st.columns(3)
     with col1:
@@ -650,6 +693,62 @@ with tab5:
         use_container_width=True,
     )
 
+    # Per-policy positioning against competitors, precomputed in mart_benchmark_distribution
+    st.subheader("Competitive Price Positioning")
+    df_benchmark = load_benchmark_distribution(selected_agency)
+    # One agency's policies are broken down by product and zone only
+    dimensions = ["Prodotto", "Zona"] if selected_agency else ["Prodotto", "Agenzia", "Zona"]
+    dimension = st.radio("Break down by", dimensions, horizontal=True, key="benchmark_dim")
+    df_dimension = df_benchmark[df_benchmark["dimension"] == dimension]
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        # Box-style view of the gap distribution from the precomputed quantiles
+        fig_gap = px.bar(
+            df_dimension,
+            y="value",
+            x="gap_median",
+            orientation="h",
+            error_x=df_dimension["gap_p75"] - df_dimension["gap_median"],
+            error_x_minus=df_dimension["gap_median"] - df_dimension["gap_p25"],
+            title="Price Gap vs Market (median, interquartile range)",
+            labels={"gap_median": "Premium Gap vs Market", "value": dimension},
+        )
+        fig_gap.update_layout(xaxis_tickformat=".0%")
+        st.plotly_chart(fig_gap, use_container_width=True)
+
+    with col2:
+        fig_share = px.bar(
+            df_dimension,
+            y="value",
+            x=["share_above_market", "share_below_market"],
+            orientation="h",
+            barmode="group",
+            title="Policies Priced Above / Below Market",
+            labels={"value": dimension, "variable": "Positioning"},
+        )
+        fig_share.update_layout(xaxis_tickformat=".0%")
+        st.plotly_chart(fig_share, use_container_width=True)
+
+    st.dataframe(
+        df_dimension.drop(columns="dimension").style.format(
+            {
+                "policy_count": "{:,.0f}",
+                "gap_p10": "{:.1%}",
+                "gap_p25": "{:.1%}",
+                "gap_median": "{:.1%}",
+                "gap_p75": "{:.1%}",
+                "gap_p90": "{:.1%}",
+                "avg_premium_percentile": "{:.2f}",
+                "avg_coverage_percentile": "{:.2f}",
+                "share_above_market": "{:.1%}",
+                "share_below_market": "{:.1%}",
+            }
+        ),
+        use_container_width=True,
+    )
+
 # Tab 6: Customer Lifecycle
 with tab6:
     st.header("Customer Lifecycle & Retention")
@@ -659,7 +758,7 @@ with tab6:
     lifecycle_data["lifecycle_stage"] = pd.cut(
         lifecycle_data["tenure_years"],
         bins=[0, 2, 5, 10, float("inf")],
-        labels=["New (0-2y)", "Growing (2-5y)", "Mature (5-10y)", "Loyal (10y+)"],
+        labels=LIFECYCLE_STAGES,
     )
 
     col1, col2, col3, col4 = st.columns(4)
@@ -678,27 +777,24 @@ with tab6:
 
     with col1:
         # Tenure distribution
-        fig_tenure = px.histogram(
-            lifecycle_data,
-            x="tenure_years",
-            nbins=20,
+        fig_tenure = histogram_figure(
+            load_histogram("tenure_years", 20, **chart_filters),
             title="Customer Tenure Distribution",
-            labels={"tenure_years": "Years with Company", "count": "Number of Customers"},
-            color_discrete_sequence=["#0173B2"],
+            x_label="Years with Company",
+            color="#0173B2",
         )
         st.plotly_chart(fig_tenure, use_container_width=True)
 
     with col2:
         # Churn by Lifecycle Stage
-        fig_churn = px.box(
-            lifecycle_data.dropna(subset=["churn_probability"]),
-            x="lifecycle_stage",
-            y="churn_probability",
+        fig_churn = box_figure(
+            load_box_summary("churn_probability", "lifecycle_stage", **chart_filters),
+            group="lifecycle_stage",
             title="Churn Probability by Lifecycle Stage",
-            labels={"lifecycle_stage": "Lifecycle Stage", "churn_probability": "Churn Probability"},
-            color="lifecycle_stage",
+            x_label="Lifecycle Stage",
+            y_label="Churn Probability",
+            category_order=LIFECYCLE_STAGES,
         )
-        fig_churn.update_layout(showlegend=False)
         st.plotly_chart(fig_churn, use_container_width=True)
 
     # Engagement vs Tenure
@@ -722,8 +818,8 @@ with tab6:
 with tab7:
     st.header("Channel Performance & Acquisition")
 
-    df_channels = load_channel_performance()
-    df_interactions = load_interaction_summary()
+    df_channels = load_channel_performance(selected_agency)
+    df_interactions = load_interaction_summary(selected_agency)
 
     col1, col2, col3 = st.columns(3)
     with col1:
@@ -797,7 +893,7 @@ with tab7:
 with tab8:
     st.header("Customer Segmentation Deep Dive")
 
-    df_clusters = load_cluster_summary()
+    df_clusters = load_cluster_summary(selected_agency)
 
     col1, col2, col3 = st.columns(3)
     with col1:
@@ -891,6 +987,61 @@ with tab8:
         use_container_width=True,
     )
 
+    # Behavioural segments computed by the segmentation pipeline
+    st.subheader("Behavioural Segments")
+    df_segments = load_segment_profiles(selected_agency)
+    if df_segments is None:
+        st.info("No segmentation results yet. Run `uv run fit-segments` to create them.")
+    else:
+        col1, col2 = st.columns(2)
+
+        with col1:
+            fig_segment_size = px.bar(
+                df_segments,
+                x="segment",
+                y="customer_count",
+                title="Customers by Behavioural Segment",
+                labels={"customer_count": "Customers", "segment": "Segment"},
+                color="avg_clv",
+                color_continuous_scale="Viridis",
+            )
+            st.plotly_chart(fig_segment_size, use_container_width=True)
+
+        with col2:
+            fig_segment_risk = px.scatter(
+                df_segments,
+                x="avg_churn_risk",
+                y="avg_clv",
+                size="customer_count",
+                color="segment",
+                text="segment",
+                title="Segment Value vs Churn Risk",
+                labels={
+                    "avg_churn_risk": "Average Churn Probability",
+                    "avg_clv": "Average CLV (€)",
+                    "segment": "Segment",
+                },
+            )
+            fig_segment_risk.update_traces(textposition="top center")
+            st.plotly_chart(fig_segment_risk, use_container_width=True)
+
+        st.dataframe(
+            df_segments.style.format(
+                {
+                    "customer_count": "{:,.0f}",
+                    "avg_age": "{:.1f}",
+                    "avg_income": "€{:,.0f}",
+                    "avg_clv": "€{:,.0f}",
+                    "avg_engagement": "{:.2f}",
+                    "avg_churn_risk": "{:.1%}",
+                    "avg_satisfaction": "{:.2f}",
+                    "avg_active_policies": "{:.1f}",
+                    "avg_premium": "€{:,.0f}",
+                }
+            ),
+            use_container_width=True,
+        )
+
 # Footer
 st.markdown("---")
 st.markdown("**AIDA Challenge Dashboard** | Data sourced from DuckDB | Built with Streamlit")
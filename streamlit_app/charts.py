@@ -0,0 +1,64 @@
+"""
+Plotly figures drawn from pre-aggregated chart data.
+The histogram bins and box-plot statistics come from `data_loader`, so a figure only
+carries one bar per bin and one box per group instead of every customer.
+"""
+
+import plotly.express as px
+import plotly.graph_objects as go
+
+
+def histogram_figure(bins, title, x_label, color, y_label="Number of Customers"):
+    """Draw a histogram from bins with bin_start, bin_end and count columns."""
+    fig = go.Figure(
+        go.Bar(
+            x=(bins["bin_start"] + bins["bin_end"]) / 2,
+            y=bins["count"],
+            width=bins["bin_end"] - bins["bin_start"],
+            customdata=bins[["bin_start", "bin_end"]],
+            hovertemplate="%{customdata[0]:,} - %{customdata[1]:,}<br>%{y:,}<extra></extra>",
+            marker_color=color,
+        )
+    )
+    fig.update_layout(
+        title=title, xaxis_title=x_label, yaxis_title=y_label, bargap=0, showlegend=False
+    )
+    return fig
+
+
+def box_figure(summary, group, title, x_label, y_label, category_order=None):
+    """Draw one box per group from quartiles, whiskers and outlier samples."""
+    if category_order is not None:
+        summary = summary.set_index(group).reindex(category_order).dropna(subset=["q1"])
+        summary = summary.reset_index()
+
+    colors = px.colors.qualitative.Plotly
+    fig = go.Figure()
+    for i, row in enumerate(summary.itertuples(index=False)):
+        name = str(getattr(row, group))
+        color = colors[i % len(colors)]
+        fig.add_trace(
+            go.Box(
+                name=name,
+                x=[name],
+                q1=[row.q1],
+                median=[row.median],
+                q3=[row.q3],
+                lowerfence=[row.lower_whisker],
+                upperfence=[row.upper_whisker],
+                marker_color=color,
+                boxpoints=False,
+            )
+        )
+        if len(row.outliers):
+            fig.add_trace(
+                go.Scatter(
+                    x=[name] * len(row.outliers),
+                    y=list(row.outliers),
+                    mode="markers",
+                    marker={"color": color, "size": 4},
+                    name=f"{name} outliers ({row.outlier_count:,})",
+                )
+            )
+    fig.update_layout(title=title, xaxis_title=x_label, yaxis_title=y_label, showlegend=False)
+    return fig
@@ -4,185 +4,129 @@ The data is loaded from a DuckDB database and cached for performance.
 This is absolutely fine in this context, as the data is static, read-only, and easily fits in memory.
 """
 
+import inspect
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import duckdb
-from pathlib import Path
 import streamlit as st
+from hot_replica import ReplicaCursor, get_replica, replica_budget
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
+from aida_challenge import serving
+from aida_challenge.publishing import current_db_path
 
-@st.cache_resource
-def get_db_connection():
-    """Create and cache database connection."""
-    db_path = Path("data/aida_challenge.duckdb").absolute()
-    return duckdb.connect(str(db_path), read_only=True)
+# Database version the cached query results were loaded from
+_active_db_path = None
 
 
-@st.cache_data(ttl=3600)
-def load_customer_demographics():
-    """Load customer demographic data."""
-    con = get_db_connection()
-    return con.execute(
-        """
-        SELECT
-            codice_cliente as customer_id,
-            eta as age,
-            reddito as income,
-            professione as profession,
-            luogo_residenza as city,
-            cluster_risposta as cluster,
-            engagement_score,
-            churn_probability,
-            clv_stimato as clv,
-            satisfaction_score,
-            num_polizze as policy_count,
-            anzianita_compagnia as tenure_years,
-            visite_ultimo_anno as annual_visits
-        FROM aida_challenge.main_staging.stg_clienti
-    """
-    ).df()
+@st.cache_resource
+def _connect(db_path):
+    """Create and cache a read-only connection to one database version."""
+    return duckdb.connect(db_path, read_only=True)
 
 
-@st.cache_data(ttl=3600)
-def load_policy_data():
-    """Load policy and portfolio data."""
-    con = get_db_connection()
-    return con.execute(
-        """
-        SELECT
-            codice_cliente as customer_id,
-            prodotto as product,
-            area_bisogno as need_area,
-            premio_totale_annuo as annual_premium,
-            stato_polizza as policy_status,
-            canale_acquisizione as acquisition_channel,
-            loss_ratio,
-            margine_lordo as gross_margin,
-            data_emissione,
-            data_scadenza
-        FROM aida_challenge.main_staging.stg_polizze
-    """
-    ).df()
+def get_db_connection():
+    """Return a cursor on the currently published database version.
 
+    Each call gets its own cursor on the shared connection, so loaders can run on
+    separate threads. When `dbt-publish` swaps in a new version, cached query results
+    are dropped so every loader switches to the new version together.
 
-@st.cache_data(ttl=3600)
-def load_interaction_data():
-    """Load customer interaction data."""
-    con = get_db_connection()
-    return con.execute(
-        """
-        SELECT
-            codice_cliente as customer_id,
-            tipo_interazione as interaction_type,
-            durata_minuti as duration_minutes,
-            conversione as conversion,
-            data_interazione as interaction_date
-        FROM aida_challenge.main_staging.stg_interazioni_clienti
+    With AIDA_HOT_REPLICA_MB set, the cursor reads from the in-memory hot replica
+    (see `hot_replica.py`), which switches versions once the new replica has loaded.
     """
-    ).df()
-
-
-@st.cache_data(ttl=3600)
-def load_geographic_data():
-    """Load customer geographic data."""
-    con = get_db_connection()
-    return con.execute(
-        """
-        SELECT
-            codice_cliente as customer_id,
-            latitudine as lat,
-            longitudine as lon,
-            luogo_residenza as city,
-            clv_stimato as clv
-        FROM aida_challenge.main_staging.stg_clienti
-        WHERE latitudine IS NOT NULL
-            AND longitudine IS NOT NULL
+    global _active_db_path
+    db_path = str(current_db_path())
+    budget = replica_budget()
+    if budget is not None:
+        replica = get_replica(db_path, budget)
+        db_path = replica.db_path
+    if db_path != _active_db_path:
+        if _active_db_path is not None:
+            st.cache_data.clear()
+            _connect.clear()
+        _active_db_path = db_path
+    if budget is not None:
+        return ReplicaCursor(replica)
+    return _connect(db_path).cursor()
+
+
+def prefetch(*calls, max_workers=8):
+    """Run independent query calls concurrently to fill the caches of their loaders.
+
+    Takes calls like those of `dashboard_queries` (a `functools.partial` of a query of
+    `aida_challenge.serving`, without the connection), so the page can then call the same
+    loaders and get cache hits. Failures are left to the page's own call, where Streamlit
+    reports them.
     """
-    ).df()
+    # Switch to the published version once, before the threads read it
+    get_db_connection()
+    ctx = get_script_run_ctx()
 
+    def attach_context():
+        add_script_run_ctx(threading.current_thread(), ctx)
 
-@st.cache_data(ttl=3600)
-def load_cluster_summary():
-    """Load cluster characteristics summary."""
-    con = get_db_connection()
-    return con.execute(
-        """
-        SELECT
-            cluster_risposta as cluster,
-            COUNT(*) as customer_count,
-            AVG(eta) as avg_age,
-            AVG(reddito) as avg_income,
-            AVG(num_polizze) as avg_policies,
-            AVG(clv_stimato) as avg_clv,
-            AVG(engagement_score) as avg_engagement,
-            AVG(churn_probability) as avg_churn_risk,
-            AVG(satisfaction_score) as avg_satisfaction
-        FROM aida_challenge.main_staging.stg_clienti
-        WHERE cluster_risposta IS NOT NULL
-        GROUP BY cluster_risposta
-        ORDER BY cluster_risposta
-    """
-    ).df()
+    with ThreadPoolExecutor(max_workers=max_workers, initializer=attach_context) as pool:
+        futures = [pool.submit(_loaders[call.func], *call.args, **call.keywords) for call in calls]
+    for future in futures:
+        future.exception()
 
 
-@st.cache_data(ttl=3600)
-def load_channel_performance():
-    """Load channel acquisition and performance data."""
-    con = get_db_connection()
-    return con.execute(
-        """
-        SELECT
-            p.canale_acquisizione as channel,
-            COUNT(DISTINCT p.codice_cliente) as customer_count,
-            AVG(c.clv_stimato) as avg_clv,
-            AVG(c.engagement_score) as avg_engagement,
-            AVG(p.premio_totale_annuo) as avg_premium,
-            SUM(p.premio_totale_annuo) as total_revenue,
-            SUM(p.margine_lordo) as total_margin
-        FROM aida_challenge.main_staging.stg_polizze p
-        JOIN aida_challenge.main_staging.stg_clienti c
-            ON p.codice_cliente = c.codice_cliente
-        WHERE p.stato_polizza = 'Attiva'
-        GROUP BY p.canale_acquisizione
-        ORDER BY total_revenue DESC
-    """
-    ).df()
+# Cached loader of each query, to run the calls of `dashboard_queries` and `chart_queries`
+_loaders = {}
 
 
-@st.cache_data(ttl=3600)
-def load_product_performance():
-    """Load product performance metrics."""
-    con = get_db_connection()
-    return con.execute(
-        """
-        SELECT
-            prodotto as product,
-            area_bisogno as need_area,
-            AVG(loss_ratio) as avg_loss_ratio,
-            SUM(premio_totale_annuo) as total_premium,
-            SUM(margine_lordo) as total_margin,
-            COUNT(*) as policy_count,
-            AVG(premio_totale_annuo) as avg_premium
-        FROM aida_challenge.main_staging.stg_polizze
-        WHERE stato_polizza = 'Attiva'
-        GROUP BY prodotto, area_bisogno
-        ORDER BY total_premium DESC
+def serving_loader(query):
+    """Turn a query of `aida_challenge.serving` into a cached loader of the published database.
+
+    The loader takes the query's arguments without the connection. Its result is read
+    from the serving cache when `warm-caches` stored it, otherwise the query runs on
+    `get_db_connection()`.
     """
-    ).df()
+
+    def loader(*args, **kwargs):
+        try:
+            return serving.cached_result(current_db_path(), query, args, kwargs)
+        except KeyError:
+            return query(get_db_connection(), *args, **kwargs)
+
+    # Streamlit keys its cache by the function's name and hashes the named arguments
+    signature = inspect.signature(query)
+    loader.__name__ = loader.__qualname__ = query.__name__
+    loader.__doc__ = query.__doc__
+    loader.__signature__ = signature.replace(parameters=list(signature.parameters.values())[1:])
+    _loaders[query] = st.cache_data(ttl=3600)(loader)
+    return _loaders[query]
+
+
+load_agencies = serving_loader(serving.load_agencies)
+load_customer_demographics = serving_loader(serving.load_customer_demographics)
+load_policy_data = serving_loader(serving.load_policy_data)
+load_geographic_data = serving_loader(serving.load_geographic_data)
+load_cluster_summary = serving_loader(serving.load_cluster_summary)
+load_channel_performance = serving_loader(serving.load_channel_performance)
+load_product_performance = serving_loader(serving.load_product_performance)
+load_benchmark_distribution = serving_loader(serving.load_benchmark_distribution)
+load_interaction_summary = serving_loader(serving.load_interaction_summary)
+load_segment_profiles = serving_loader(serving.load_segment_profiles)
+load_histogram = serving_loader(serving.load_histogram)
+load_box_summary = serving_loader(serving.load_box_summary)
 
 
 @st.cache_data(ttl=3600)
-def load_interaction_summary():
-    """Load interaction type summary."""
+def load_interaction_data():
+    """Load customer interaction data."""
     con = get_db_connection()
     return con.execute(
         """
         SELECT
+            codice_cliente as customer_id,
             tipo_interazione as interaction_type,
-            COUNT(*) as interaction_count,
-            AVG(durata_minuti) as avg_duration,
-            SUM(CASE WHEN conversione THEN 1 ELSE 0 END)::FLOAT / COUNT(*) * 100 as conversion_rate
+            durata_minuti as duration_minutes,
+            conversione as conversion,
+            data_interazione as interaction_date
         FROM aida_challenge.main_staging.stg_interazioni_clienti
-        GROUP BY tipo_interazione
-        ORDER BY interaction_count DESC
     """
     ).df()
 
@@ -0,0 +1,165 @@
+"""
+In-memory hot replica of the marts, an optional serving mode for the dashboard.
+With AIDA_HOT_REPLICA_MB set, the columns the dashboard reads are copied into an in-memory
+DuckDB database of at most that many megabytes, so busy dashboards do not queue on disk
+reads. Every other table and column is still served from the database file.
+"""
+
+import os
+import threading
+import time
+
+import duckdb
+
+from aida_challenge.cache_warming import HOT_COLUMNS
+
+# Memory budget of the replica in megabytes; setting it enables the replica
+BUDGET_ENV = "AIDA_HOT_REPLICA_MB"
+
+# Replica currently served, the one it replaced (still read by sessions that started
+# before the switch), and the thread loading the replica of a newer version
+_replica = None
+_retired = None
+_refresh = None
+_lock = threading.Lock()
+
+
+def replica_budget():
+    """Return the replica memory budget in bytes, or None when the replica is disabled."""
+    budget = os.environ.get(BUDGET_ENV)
+    return int(budget) * 1024**2 if budget else None
+
+
+class HotReplica:
+    """In-memory copy of the dashboard columns of one database version.
+
+    The replica catalog is named like the database file's, so the dashboard queries
+    run on it unchanged: copied tables are in memory, every other table is a view on
+    the attached file.
+    """
+
+    def __init__(self, db_path, budget):
+        start = time.perf_counter()
+        self.db_path = db_path
+        self.disk = duckdb.connect(db_path, read_only=True)
+        self.con = duckdb.connect()
+        self.con.execute("ATTACH ':memory:' AS aida_challenge")
+        quoted_path = db_path.replace("'", "''")
+        self.con.execute(f"ATTACH '{quoted_path}' AS aida_disk (READ_ONLY)")
+        self.con.execute("USE aida_challenge")
+        self.hot, self.cold = self._load(budget)
+        print(
+            f"Hot replica of {db_path} loaded in {time.perf_counter() - start:.2f}s "
+            f"({self.memory_usage() / 1024**2:.1f} MB): {', '.join(self.hot) or 'no tables'}"
+            + (f"; left on disk: {', '.join(self.cold)}" if self.cold else "")
+        )
+
+    def close(self):
+        """Close the replica's connections and free its memory."""
+        self.con.close()
+        self.disk.close()
+
+    def memory_usage(self):
+        """Return the bytes held by the replica's in-memory tables."""
+        return self.con.execute(
+            """
+            SELECT coalesce(sum(memory_usage_bytes), 0)
+            FROM duckdb_memory()
+            WHERE tag = 'IN_MEMORY_TABLE'
+        """
+        ).fetchone()[0]
+
+    def _load(self, budget):
+        """Expose every table of the file, then copy the hot ones while they fit."""
+        relations = self.con.execute(
+            """
+            SELECT schema_name, table_name FROM duckdb_tables()
+            WHERE database_name = 'aida_disk'
+            UNION ALL
+            SELECT schema_name, view_name FROM duckdb_views()
+            WHERE database_name = 'aida_disk' AND NOT internal
+        """
+        ).fetchall()
+        for schema in {schema for schema, _ in relations}:
+            self.con.execute(f"CREATE SCHEMA IF NOT EXISTS {schema}")
+        # Views of the file name the aida_challenge catalog, so they read from the replica
+        # and can only be exposed once the relations they read are, hence the rounds
+        pending = relations
+        while pending:
+            remaining = []
+            for schema, name in pending:
+                try:
+                    self.con.execute(
+                        f"CREATE VIEW {schema}.{name} AS FROM aida_disk.{schema}.{name}"
+                    )
+                except duckdb.CatalogException:
+                    remaining.append((schema, name))
+            if len(remaining) == len(pending):
+                raise duckdb.CatalogException(f"Cannot expose {remaining} in the hot replica")
+            pending = remaining
+
+        hot, cold = [], []
+        # Tables that no longer fit the budget are left on disk
+        for table, columns in HOT_COLUMNS.items():
+            if tuple(table.split(".")) not in relations:
+                continue
+            available = [row[0] for row in self.con.execute(f"DESCRIBE {table}").fetchall()]
+            selected = ", ".join(c for c in columns or available if c in available)
+            self.con.execute(f"DROP VIEW {table}")
+            self.con.execute(f"CREATE TABLE {table} AS SELECT {selected} FROM aida_disk.{table}")
+            if self.memory_usage() <= budget:
+                hot.append(table)
+                continue
+            self.con.execute(f"DROP TABLE {table}")
+            self.con.execute(f"CREATE VIEW {table} AS FROM aida_disk.{table}")
+            cold.append(table)
+        return hot, cold
+
+
+class ReplicaCursor:
+    """Cursor on the hot replica; queries reading columns left on disk run on the file."""
+
+    def __init__(self, replica):
+        self.replica = replica
+        self._cursor = replica.con.cursor()
+        # Cursors start in the default catalog, unqualified names must resolve in the replica
+        self._cursor.execute("USE aida_challenge")
+
+    def execute(self, query, parameters=None):
+        try:
+            return self._cursor.execute(query, parameters)
+        except duckdb.BinderException:
+            return self.replica.disk.cursor().execute(query, parameters)
+
+
+def _load_replica(db_path, budget):
+    """Load the replica of a newly published version and switch to it when ready."""
+    global _replica, _retired
+    try:
+        replica = HotReplica(db_path, budget)
+    except duckdb.Error as e:
+        print(f"WARNING: Hot replica of {db_path} failed to load, keeping the previous one: {e}")
+        return
+    with _lock:
+        stale, _retired, _replica = _retired, _replica, replica
+    # The replica before the retired one has not been served since the previous switch
+    if stale is not None:
+        stale.close()
+
+
+def get_replica(db_path, budget):
+    """Return the hot replica to serve the published version from.
+
+    The first replica is loaded at startup. When a new version is published, the
+    previous replica is served until the new one has loaded in the background.
+    """
+    global _replica, _refresh
+    with _lock:
+        if _replica is None:
+            _replica = HotReplica(db_path, budget)
+        elif _replica.db_path != db_path and (_refresh is None or not _refresh.is_alive()):
+            _refresh = threading.Thread(
+                target=_load_replica, args=(db_path, budget), name="hot-replica", daemon=True
+            )
+            _refresh.start()
+        return _replica
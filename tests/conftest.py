@@ -0,0 +1,54 @@
+"""Shared fixtures: a sample of the raw data and dbt builds of it."""
+
+import os
+import subprocess
+
+import pytest
+
+from aida_challenge import dbt_commands
+from aida_challenge.publishing import ROOT, WORKING_DB_PATH
+
+DBT_PROJECT_DIR = ROOT / "dbt_project"
+
+# Share of the customers copied into the test database
+SAMPLE_FRACTION = 0.01
+
+
+@pytest.fixture
+def sample_db(tmp_path, monkeypatch):
+    """Path of a fresh database holding the raw tables of a sample of the customers."""
+    if not WORKING_DB_PATH.exists():
+        pytest.skip("The raw data is not loaded (uv run load-raw-data)")
+    # dbt names the catalog after the file, so the sample keeps the file name
+    path = tmp_path / WORKING_DB_PATH.name
+    monkeypatch.setattr(dbt_commands, "SAMPLE_DB_PATH", path)
+    dbt_commands.create_sample_database(SAMPLE_FRACTION, WORKING_DB_PATH)
+    return path
+
+
+@pytest.fixture
+def dbt(sample_db):
+    """Run a dbt command against the sample database, failing the test if dbt fails."""
+
+    def run(command, *args):
+        result = subprocess.run(
+            [
+                "dbt",
+                command,
+                "--project-dir",
+                str(DBT_PROJECT_DIR),
+                "--profiles-dir",
+                str(DBT_PROJECT_DIR),
+                "--target",
+                dbt_commands.SAMPLE_TARGET,
+                *args,
+            ],
+            check=False,
+            capture_output=True,
+            text=True,
+            env={**os.environ, "AIDA_SAMPLE_DB_PATH": str(sample_db)},
+        )
+        assert result.returncode == 0, result.stdout[-3000:]
+        return result
+
+    return run
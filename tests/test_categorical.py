@@ -0,0 +1,105 @@
+"""Categorical values added to the raw data after incremental models and snapshots ran."""
+
+import duckdb
+
+# Models that keep the rows of earlier runs, with their upstream models
+HISTORY_MODELS = [
+    "+int_interactions_daily",
+    "+int_reclami_documenti",
+    "+mart_claims_summary",
+    "+mart_renewal_feed",
+    "+dim_customers_snapshot",
+    "+fact_policies_snapshot",
+    "+sinistri_snapshot",
+]
+
+
+def _build(dbt):
+    dbt("build", "--select", *HISTORY_MODELS, "--exclude", "resource_type:test")
+
+
+def test_new_categorical_values_reach_stored_history(sample_db, dbt):
+    _build(dbt)
+    with duckdb.connect(str(sample_db)) as con:
+        con.execute(
+            """
+            INSERT INTO main.interazioni_clienti
+            SELECT * REPLACE ('Videochiamata' AS Tipo_Interazione)
+            FROM main.interazioni_clienti
+            ORDER BY Data_Interazione DESC
+            LIMIT 1
+        """
+        )
+        con.execute(
+            """
+            UPDATE main.sinistri SET Stato_Liquidazione = 'Riaperto'
+            WHERE rowid = (SELECT min(rowid) FROM main.sinistri WHERE Sinistro IS NOT NULL)
+        """
+        )
+        con.execute(
+            """
+            UPDATE main.polizze SET Prodotto = 'Polizza Nuova'
+            WHERE rowid = (SELECT min(rowid) FROM main.polizze WHERE Stato_Polizza = 'Attiva')
+        """
+        )
+    _build(dbt)
+
+    with duckdb.connect(str(sample_db), read_only=True) as con:
+        assert (
+            con.execute(
+                """
+            SELECT count(*) FROM main_intermediate.int_interactions_daily
+            WHERE list_contains(tipi_interazione, 'Videochiamata')
+        """
+            ).fetchone()
+            == (1,)
+        )
+        for table in ["main_snapshots.sinistri_snapshot", "main_marts.mart_claims_summary"]:
+            assert (
+                con.execute(
+                    f"SELECT count(*) FROM {table} WHERE stato_liquidazione = 'Riaperto'"
+                ).fetchone()[0]
+                > 0
+            )
+        assert (
+            con.execute(
+                """
+            SELECT count(*) FROM main_snapshots.fact_policies_snapshot
+            WHERE prodotto = 'Polizza Nuova' AND dbt_valid_to IS NULL
+        """
+            ).fetchone()
+            == (1,)
+        )
+
+
+def test_stored_enum_columns_are_converted(sample_db, dbt):
+    _build(dbt)
+    # As written by builds that stored the staging ENUMs as they are
+    with duckdb.connect(str(sample_db)) as con:
+        con.execute(
+            """
+            ALTER TABLE main_snapshots.sinistri_snapshot ALTER COLUMN stato_liquidazione
+            TYPE ENUM('In Lavorazione', 'Liquidato', 'Respinto')
+        """
+        )
+        con.execute(
+            """
+            UPDATE main.sinistri SET Stato_Liquidazione = 'Riaperto'
+            WHERE rowid = (SELECT min(rowid) FROM main.sinistri WHERE Sinistro IS NOT NULL)
+        """
+        )
+    _build(dbt)
+
+    with duckdb.connect(str(sample_db), read_only=True) as con:
+        assert (
+            con.execute(
+                """
+            SELECT data_type FROM information_schema.columns
+            WHERE table_name = 'sinistri_snapshot' AND column_name = 'stato_liquidazione'
+        """
+            ).fetchone()
+            == ("VARCHAR",)
+        )
+        assert con.execute(
+            "SELECT count(*) FROM main_snapshots.sinistri_snapshot WHERE stato_liquidazione = 'Riaperto'"
+        ).fetchone() == (1,)
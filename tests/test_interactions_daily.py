@@ -0,0 +1,73 @@
+"""Incremental rebuilds of the daily interaction rollups after changes to old events."""
+
+import duckdb
+
+ROLLUP_COLUMNS = "data_interazione, codice_cliente, num_interazioni, num_esiti_positivi"
+
+# The rollups as a full rebuild computes them
+EXPECTED_SQL = f"""
+    SELECT
+        data_interazione,
+        codice_cliente,
+        count(*) AS num_interazioni,
+        count(CASE WHEN esito = 'Positivo' THEN 1 END) AS num_esiti_positivi
+    FROM main_staging.stg_interazioni_clienti
+    GROUP BY ALL
+    EXCEPT
+    SELECT {ROLLUP_COLUMNS} FROM main_intermediate.int_interactions_daily
+"""
+
+STORED_SQL = f"""
+    SELECT {ROLLUP_COLUMNS} FROM main_intermediate.int_interactions_daily
+    EXCEPT
+    SELECT
+        data_interazione,
+        codice_cliente,
+        count(*),
+        count(CASE WHEN esito = 'Positivo' THEN 1 END)
+    FROM main_staging.stg_interazioni_clienti
+    GROUP BY ALL
+"""
+
+
+def test_changes_to_old_events_are_rolled_up(sample_db, dbt):
+    dbt("run", "--select", "+int_interactions_daily")
+    with duckdb.connect(str(sample_db)) as con:
+        oldest = con.execute(
+            """
+            SELECT DISTINCT "Data_Interazione" FROM main.interazioni_clienti
+            ORDER BY 1 LIMIT 3
+        """
+        ).fetchall()
+        (corrected,), (emptied,), (late,) = oldest
+        con.execute(
+            """
+            UPDATE main.interazioni_clienti
+            SET "Esito" = CASE WHEN "Esito" = 'Positivo' THEN 'Negativo' ELSE 'Positivo' END
+            WHERE "Data_Interazione" = ?
+        """,
+            [corrected],
+        )
+        con.execute('DELETE FROM main.interazioni_clienti WHERE "Data_Interazione" = ?', [emptied])
+        con.execute(
+            """
+            INSERT INTO main.interazioni_clienti
+            SELECT * FROM main.interazioni_clienti WHERE "Data_Interazione" = ? LIMIT 1
+        """,
+            [late],
+        )
+    dbt("run", "--select", "int_interactions_daily")
+
+    with duckdb.connect(str(sample_db), read_only=True) as con:
+        assert con.execute(EXPECTED_SQL).fetchall() == []
+        assert con.execute(STORED_SQL).fetchall() == []
+        assert (
+            con.execute(
+                """
+            SELECT count(*) FROM main_intermediate.int_interactions_daily
+            WHERE data_interazione = ?
+        """,
+                [emptied],
+            ).fetchone()
+            == (0,)
+        )
@@ -0,0 +1,102 @@
+"""Scenario filters and the lapse response of the pricing simulator."""
+
+import duckdb
+import numpy as np
+import pytest
+
+from aida_challenge.pricing_simulation import Scenario, _lapse_probability
+
+POLICIES = [
+    # prodotto, area_bisogno, agenzia, zona_residenza, loss_ratio
+    ("Polizza Casa Sicura", "Casa", "Agenzia_Roma_1", "Centro", 0.4),
+    ("Polizza Casa Plus", "Casa", "Agenzia_Milano_1", "Nord", 1.2),
+    ("Polizza Salute", "Salute", "Agenzia_Milano_1", "Nord", 1.5),
+    ("Polizza Auto", "Mobilita", "Agenzia_Napoli_1", "Sud", None),
+]
+
+
+@pytest.fixture
+def policies():
+    """An in-memory policy table with categorical columns, like fact_policies."""
+    con = duckdb.connect()
+    con.execute(
+        "CREATE TYPE prodotto AS ENUM (SELECT DISTINCT unnest(?))", [[p[0] for p in POLICIES]]
+    )
+    con.execute(
+        """
+        CREATE TABLE polizze (
+            id INTEGER, prodotto prodotto, area_bisogno VARCHAR, agenzia VARCHAR,
+            zona_residenza VARCHAR, loss_ratio DOUBLE
+        )
+    """
+    )
+    con.executemany(
+        "INSERT INTO polizze VALUES (?, ?, ?, ?, ?, ?)",
+        [(i, *policy) for i, policy in enumerate(POLICIES)],
+    )
+    yield con
+    con.close()
+
+
+def _in_scope(con, scenario):
+    condition, params = scenario.filter_sql()
+    rows = con.execute(f"SELECT id FROM polizze AS p WHERE {condition} ORDER BY id", params)
+    return [row[0] for row in rows.fetchall()]
+
+
+@pytest.mark.parametrize(
+    ("filters", "expected"),
+    [
+        ({}, [0, 1, 2, 3]),
+        ({"prodotto": "casa"}, [0, 1]),
+        ({"prodotto": "CASA PLUS"}, [1]),
+        ({"area_bisogno": "Casa"}, [0, 1]),
+        ({"area_bisogno": "casa"}, []),
+        ({"agenzia": "Agenzia_Milano_1"}, [1, 2]),
+        ({"zona_residenza": "Nord", "prodotto": "salute"}, [2]),
+        ({"min_loss_ratio": 1.2}, [1, 2]),
+        ({"prodotto": "casa", "min_loss_ratio": 1.0}, [1]),
+    ],
+)
+def test_filter_sql_selects_the_policies_matching_every_filter(policies, filters, expected):
+    assert _in_scope(policies, Scenario(change=0.05, **filters)) == expected
+
+
+def test_filter_sql_passes_values_as_parameters(policies):
+    scenario = Scenario(change=0.05, agenzia="x' OR true OR '")
+    condition, params = scenario.filter_sql()
+
+    assert params == ["x' OR true OR '"]
+    assert "OR true" not in condition
+    assert _in_scope(policies, scenario) == []
+
+
+def test_lapse_probability_is_unchanged_without_a_price_change():
+    base = np.array([0.05, 0.2, 0.5, 0.9])
+
+    np.testing.assert_allclose(_lapse_probability(base, np.zeros(4), 2.0), base)
+    np.testing.assert_allclose(_lapse_probability(base, np.full(4, 0.1), 0.0), base)
+
+
+def test_lapse_probability_follows_the_direction_of_the_price_change():
+    base = np.full(5, 0.2)
+    change = np.array([-0.2, -0.05, 0.0, 0.05, 0.2])
+
+    lapse = _lapse_probability(base, change, 2.0)
+
+    assert np.all(np.diff(lapse) > 0)
+    assert lapse[2] == pytest.approx(0.2)
+    # A larger elasticity moves the probability further
+    assert _lapse_probability(base, change, 5.0)[-1] > lapse[-1]
+    # The shift is on the logit scale
+    logit = np.log(lapse / (1 - lapse))
+    np.testing.assert_allclose(logit - np.log(0.2 / 0.8), 2.0 * change)
+
+
+def test_lapse_probability_stays_a_probability():
+    base = np.array([0.0, 1e-9, 0.5, 1.0])
+
+    for change in (-10.0, 10.0):
+        lapse = _lapse_probability(base, np.full(4, change), 2.0)
+        assert np.all(np.isfinite(lapse))
+        assert np.all((lapse >= 0) & (lapse <= 1))
@@ -0,0 +1,203 @@
+"""Build-then-swap publishing: versions, the CURRENT pointer and the history carried forward."""
+
+import sys
+
+import duckdb
+import pytest
+
+from aida_challenge import dbt_commands, publishing
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """A data directory holding a working database with models and history."""
+    monkeypatch.setattr(publishing, "WORKING_DB_PATH", tmp_path / publishing.DB_FILENAME)
+    monkeypatch.setattr(publishing, "VERSIONS_DIR", tmp_path / "versions")
+    monkeypatch.setattr(publishing, "CURRENT_POINTER", tmp_path / "CURRENT")
+    monkeypatch.delenv("AIDA_DB_PATH", raising=False)
+    _write(publishing.WORKING_DB_PATH, "working")
+    return tmp_path
+
+
+def _write(path, label):
+    """Write a model, a snapshot and the renewal feed, each holding one row of ``label``."""
+    with duckdb.connect(str(path)) as con:
+        for schema, table in [
+            ("main_marts", "dim_customers"),
+            ("main_marts", "mart_renewal_feed"),
+            ("main_snapshots", "dim_customers_snapshot"),
+        ]:
+            con.execute(f"CREATE SCHEMA IF NOT EXISTS {schema}")
+            con.execute(f"CREATE OR REPLACE TABLE {schema}.{table} AS SELECT ? AS label", [label])
+
+
+def _read(path, table):
+    with duckdb.connect(str(path), read_only=True) as con:
+        return con.execute(f"SELECT label FROM {table}").fetchone()[0]
+
+
+def _publish(label):
+    """Prepare a version, rebuild its models with ``label`` and publish it."""
+    version_path = publishing.prepare_version()
+    with duckdb.connect(str(version_path)) as con:
+        con.execute("UPDATE main_marts.dim_customers SET label = ?", [label])
+        con.execute("INSERT INTO main_snapshots.dim_customers_snapshot VALUES (?)", [label])
+    publishing.publish_version(version_path)
+    return version_path
+
+
+def test_readers_use_the_working_database_until_a_version_is_published(data_dir):
+    assert publishing.current_version() is None
+    assert publishing.current_db_path() == publishing.WORKING_DB_PATH
+
+    version_path = publishing.prepare_version()
+    # A version being built is not visible to readers
+    assert publishing.current_db_path() == publishing.WORKING_DB_PATH
+
+    publishing.publish_version(version_path)
+    assert publishing.current_version() == version_path.parent.name
+    assert publishing.current_db_path() == version_path
+    assert version_path.name == publishing.DB_FILENAME
+
+
+def test_publish_swaps_the_current_version(data_dir):
+    first = _publish("first")
+    second = _publish("second")
+
+    assert publishing.current_db_path() == second
+    assert _read(first, "main_marts.dim_customers") == "first"
+    assert _read(second, "main_marts.dim_customers") == "second"
+    assert not (data_dir / "CURRENT.tmp").exists()
+
+
+def test_first_version_keeps_the_working_history(data_dir):
+    version_path = publishing.prepare_version()
+
+    assert publishing.carry_forward_history(version_path) == []
+    assert _read(version_path, "main_snapshots.dim_customers_snapshot") == "working"
+
+
+def test_new_versions_take_the_history_of_the_published_version(data_dir):
+    published = _publish("published")
+    with duckdb.connect(str(published)) as con:
+        con.execute("UPDATE main_marts.mart_renewal_feed SET label = 'published'")
+    # The working database is rebuilt meanwhile, with a history of its own
+    _write(publishing.WORKING_DB_PATH, "rebuilt")
+
+    version_path = publishing.prepare_version()
+
+    with duckdb.connect(str(version_path), read_only=True) as con:
+        snapshot = con.execute(
+            "SELECT label FROM main_snapshots.dim_customers_snapshot ORDER BY label"
+        ).fetchall()
+    assert snapshot == [("published",), ("working",)]
+    assert _read(version_path, "main_marts.mart_renewal_feed") == "published"
+    # Models that are not history come from the working database
+    assert _read(version_path, "main_marts.dim_customers") == "rebuilt"
+
+
+def _write_scores(path, label):
+    with duckdb.connect(str(path)) as con:
+        con.execute("CREATE SCHEMA IF NOT EXISTS main_scoring")
+        con.execute(
+            "CREATE TABLE IF NOT EXISTS main_scoring.scores (id INTEGER PRIMARY KEY, label VARCHAR)"
+        )
+        con.execute("INSERT OR REPLACE INTO main_scoring.scores VALUES (1, ?)", [label])
+        con.execute(
+            "CREATE OR REPLACE VIEW main_scoring.scores_latest AS "
+            "SELECT * FROM aida_challenge.main_scoring.scores"
+        )
+
+
+def test_derived_tables_are_written_in_place_before_the_first_publish(data_dir):
+    with publishing.derived_version() as db_path:
+        _write_scores(db_path, "working")
+
+    assert db_path == publishing.WORKING_DB_PATH
+    assert publishing.list_versions() == []
+
+
+def test_derived_tables_are_published_in_a_new_version(data_dir):
+    published = _publish("published")
+
+    with publishing.derived_version() as db_path:
+        _write_scores(db_path, "scored")
+
+    assert publishing.current_db_path() == db_path != published
+    assert _read(db_path, "main_scoring.scores_latest") == "scored"
+    # The rest of the published version is unchanged
+    assert _read(db_path, "main_marts.dim_customers") == "published"
+
+
+def test_failed_derived_writes_are_not_published(data_dir):
+    published = _publish("published")
+
+    with pytest.raises(RuntimeError), publishing.derived_version() as db_path:
+        _write_scores(db_path, "partial")
+        raise RuntimeError("scoring failed")
+
+    assert publishing.current_db_path() == published
+    assert not db_path.parent.exists()
+
+
+def test_new_versions_take_the_derived_tables_of_the_published_version(data_dir):
+    _publish("published")
+    with publishing.derived_version() as db_path:
+        _write_scores(db_path, "published")
+    _write_scores(publishing.WORKING_DB_PATH, "stale")
+
+    version_path = publishing.prepare_version()
+
+    assert _read(version_path, "main_scoring.scores_latest") == "published"
+    # The keys are kept, so the tables can still be upserted
+    _write_scores(version_path, "rescored")
+    assert _read(version_path, "main_scoring.scores") == "rescored"
+
+
+def test_discard_refuses_the_published_version(data_dir):
+    published = _publish("published")
+    failed = publishing.prepare_version()
+
+    publishing.discard_version(failed)
+    assert not failed.parent.exists()
+    with pytest.raises(ValueError):
+        publishing.discard_version(published)
+    assert published.exists()
+
+
+def test_garbage_collection_keeps_the_newest_and_the_published_versions(data_dir):
+    versions = [_publish(str(i)) for i in range(4)]
+    # The published version is older than the newest one when a publish is in progress
+    publishing.publish_version(versions[1])
+
+    removed = publishing.collect_garbage(keep=2)
+
+    assert removed == [versions[0].parent.name]
+    assert publishing.list_versions() == [v.parent.name for v in versions[1:]]
+
+
+@pytest.mark.parametrize(
+    ("argv", "env", "published", "excluded"),
+    [
+        ([], {}, False, False),
+        ([], {}, True, True),
+        (["--target", "dev"], {}, True, True),
+        (["--target", "sample"], {}, True, False),
+        (["-t=sample"], {}, True, False),
+        ([], {"AIDA_DB_PATH": "elsewhere.duckdb"}, True, False),
+    ],
+)
+def test_history_is_left_out_of_working_database_builds_once_published(
+    data_dir, monkeypatch, argv, env, published, excluded
+):
+    if published:
+        _publish("published")
+    monkeypatch.setattr(sys, "argv", ["dbt-build", *argv])
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+
+    exclusion = dbt_commands._history_exclusion()
+
+    assert bool(exclusion) == excluded
+    if excluded:
+        assert exclusion[0] == "--exclude"
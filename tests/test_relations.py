@@ -0,0 +1,65 @@
+"""Resolution of dbt model names by the lazy relational API."""
+
+import duckdb
+import pytest
+
+from aida_challenge import relations
+
+
+@pytest.fixture
+def con(tmp_path):
+    """A read-only connection to a database laid out like the dbt layers."""
+    path = tmp_path / f"{relations.CATALOG}.duckdb"
+    with duckdb.connect(str(path)) as db:
+        for layer, schema in relations.LAYERS.items():
+            db.execute(f"CREATE SCHEMA {schema}")
+            # Every layer has a model of the same name, to check the lookup order
+            db.execute(f"CREATE TABLE {schema}.clienti AS SELECT '{layer}' AS layer")
+        db.execute("CREATE TABLE main_marts.dim_customers AS SELECT 1 AS codice_cliente")
+        db.execute(
+            "CREATE VIEW main_staging.stg_polizze AS SELECT 1 AS codice_cliente, 'Attiva' AS stato"
+        )
+        db.execute("CREATE TABLE main.clienti AS SELECT 'raw' AS layer")
+    connection = duckdb.connect(str(path), read_only=True)
+    yield connection
+    connection.close()
+
+
+def test_model_names_resolve_marts_first(con):
+    assert relations.model("clienti", con).fetchone() == ("marts",)
+
+
+@pytest.mark.parametrize("layer", ["marts", "intermediate", "staging"])
+def test_qualified_names_resolve_in_their_layer(con, layer):
+    assert relations.model(f"{layer}.clienti", con).fetchone() == (layer,)
+
+
+def test_views_resolve_as_relations(con):
+    policies = relations.model("stg_polizze", con)
+
+    assert policies.columns == ["codice_cliente", "stato"]
+    assert policies.alias == "stg_polizze"
+    assert policies.filter("stato = 'Attiva'").aggregate("count(*)").fetchone() == (1,)
+
+
+def test_resolved_models_compose_by_alias(con):
+    joined = relations.model("dim_customers", con).join(
+        relations.model("staging.stg_polizze", con), "codice_cliente"
+    )
+
+    assert joined.project("dim_customers.codice_cliente, stato").fetchall() == [(1, "Attiva")]
+
+
+@pytest.mark.parametrize("name", ["stg_sinistri", "marts.stg_polizze", "main.clienti"])
+def test_unknown_models_are_rejected(con, name):
+    with pytest.raises(ValueError):
+        relations.model(name, con)
+
+
+def test_list_models_lists_each_layer(con):
+    assert relations.list_models(con=con) == {
+        "marts": ["clienti", "dim_customers"],
+        "intermediate": ["clienti"],
+        "staging": ["clienti", "stg_polizze"],
+    }
+    assert relations.list_models("staging", con) == {"staging": ["clienti", "stg_polizze"]}
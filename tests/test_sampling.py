@@ -0,0 +1,66 @@
+"""Sample databases keep the same customers in every raw table."""
+
+import duckdb
+
+from aida_challenge import dbt_commands
+from aida_challenge.publishing import WORKING_DB_PATH
+
+# Raw tables holding one or more rows per customer
+CUSTOMER_TABLES = [
+    "clienti",
+    "polizze",
+    "sinistri",
+    "reclami",
+    "abitazioni",
+    "interazioni_clienti",
+]
+
+
+def _customers(con, table):
+    return {
+        row[0]
+        for row in con.execute(f"SELECT DISTINCT codice_cliente FROM main.{table}").fetchall()
+    }
+
+
+def test_every_raw_table_keeps_the_sampled_customers(sample_db):
+    with duckdb.connect(str(sample_db), read_only=True) as con:
+        con.execute(f"ATTACH '{WORKING_DB_PATH}' AS source (READ_ONLY)")
+        customers = _customers(con, "clienti")
+        assert customers
+
+        for table in CUSTOMER_TABLES:
+            assert _customers(con, table) <= customers, table
+            # Every row of a sampled customer is kept, none of the others
+            kept, expected = con.execute(
+                f"""
+                SELECT
+                    (SELECT count(*) FROM main.{table}),
+                    (SELECT count(*) FROM source.main.{table}
+                     WHERE codice_cliente IN (SELECT codice_cliente FROM main.clienti))
+            """
+            ).fetchone()
+            assert kept == expected, table
+
+        # Tables without customers are copied in full
+        sampled, source = con.execute(
+            """
+            SELECT
+                (SELECT count(*) FROM main.competitor_prodotti),
+                (SELECT count(*) FROM source.main.competitor_prodotti)
+        """
+        ).fetchone()
+        assert sampled == source
+
+
+def test_larger_samples_keep_a_superset_of_the_customers(sample_db, tmp_path, monkeypatch):
+    with duckdb.connect(str(sample_db), read_only=True) as con:
+        small = _customers(con, "clienti")
+
+    larger_db = tmp_path / "larger" / sample_db.name
+    monkeypatch.setattr(dbt_commands, "SAMPLE_DB_PATH", larger_db)
+    dbt_commands.create_sample_database(dbt_commands.DEFAULT_SAMPLE_FRACTION, WORKING_DB_PATH)
+    with duckdb.connect(str(larger_db), read_only=True) as con:
+        larger = _customers(con, "clienti")
+
+    assert small < larger
@@ -0,0 +1,60 @@
+"""The serving cache of the dashboard queries, computed ahead by ``warm-caches``."""
+
+from functools import partial
+
+import duckdb
+import pytest
+
+from aida_challenge import serving
+
+
+def load_labels(con, prefix="a", limit=None):
+    """A dashboard-like query: the labels starting with ``prefix``."""
+    return con.execute(
+        "SELECT label FROM labels WHERE starts_with(label, ?) ORDER BY label LIMIT ?",
+        [prefix, limit],
+    ).df()
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / "aida_challenge.duckdb"
+    with duckdb.connect(str(path)) as con:
+        con.execute("CREATE TABLE labels AS SELECT unnest(['a1', 'a2', 'b1']) AS label")
+    return path
+
+
+def test_warmed_calls_are_served_however_their_arguments_are_passed(db_path):
+    timings, cached = serving.warm_serving_cache(
+        db_path, [partial(load_labels), partial(load_labels, "b")], max_workers=2
+    )
+
+    assert sorted(name for name, _ in timings) == ["load_labels", "load_labels"]
+    assert cached == 0
+    assert serving.cached_result(db_path, load_labels)["label"].tolist() == ["a1", "a2"]
+    for args, kwargs in [(("b",), {}), ((), {"prefix": "b"}), (("b", None), {})]:
+        assert serving.cached_result(db_path, load_labels, args, kwargs)["label"].tolist() == ["b1"]
+    with pytest.raises(KeyError):
+        serving.cached_result(db_path, load_labels, ("a", 1))
+
+
+def test_stored_calls_are_not_computed_again(db_path):
+    serving.warm_serving_cache(db_path, [partial(load_labels)])
+
+    timings, cached = serving.warm_serving_cache(
+        db_path, [partial(load_labels), partial(load_labels, prefix="a", limit=1)]
+    )
+
+    assert [name for name, _ in timings] == ["load_labels"]
+    assert cached == 1
+
+
+def test_writing_the_database_discards_the_stored_calls(db_path):
+    serving.warm_serving_cache(db_path, [partial(load_labels)])
+    with duckdb.connect(str(db_path)) as con:
+        con.execute("INSERT INTO labels VALUES ('a3')")
+
+    with pytest.raises(KeyError):
+        serving.cached_result(db_path, load_labels)
+    serving.warm_serving_cache(db_path, [partial(load_labels)])
+    assert serving.cached_result(db_path, load_labels)["label"].tolist() == ["a1", "a2", "a3"]